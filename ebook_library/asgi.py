@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ebook_library.settings')
+# соединение на запрос: потоки sync_to_async не переиспользуют постоянные соединения (Django #33497);
+# явно заданное значение переменной окружения сохраняется
+os.environ.setdefault('LIBRARY_DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# счётчики популярности книг пишутся в БД пачками только в процессах сервера
+from library import stats  # noqa: E402
+
+stats.buffer.enable()
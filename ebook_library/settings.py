@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,6 +20,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первым: замер охватывает все остальные middleware (library/metrics.py)
+    'library.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,12 +50,58 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ebook_library.wsgi.application'
 
+# SQLite под конкурентной нагрузкой: busy_timeout — ждать блокировку, а не сразу падать
+# с "database is locked"; mmap и кэш страниц — меньше системных вызовов при чтении.
+# Эти прагмы действуют только на соединение и файл базы не меняют.
+SQLITE_INIT_COMMAND = ';'.join([
+    'PRAGMA busy_timeout=10000',
+    'PRAGMA mmap_size=268435456',  # 256 МиБ
+    'PRAGMA cache_size=-65536',  # 64 МиБ
+    'PRAGMA temp_store=MEMORY',
+])
+
+# Только для профиля production: WAL — читатели не ждут писателя и наоборот (режим
+# журнала записывается в сам файл базы); synchronous=NORMAL — fsync только при контрольной
+# точке WAL. BEGIN IMMEDIATE берёт блокировку записи в начале транзакции: иначе повышение
+# блокировки посреди транзакции падает без ожидания.
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;' + SQLITE_INIT_COMMAND,
+    'transaction_mode': 'IMMEDIATE',
+}
+
+# Профиль сервера под нагрузкой включается явно: LIBRARY_DB_PROFILE=production — постоянные
+# соединения (соединение и его прагмы переживают запрос) и BEGIN IMMEDIATE. Без него
+# (разработка, тесты, команды manage.py) — соединение на запрос, обычные транзакции и
+# журнал по умолчанию: файл db.sqlite3 в репозитории не переводится в WAL.
+# asgi.py по умолчанию задаёт LIBRARY_DB_CONN_MAX_AGE=0: под ASGI каждый запрос работает с ORM в новом
+# потоке sync_to_async, и постоянные соединения не переиспользуются и не закрываются.
+LIBRARY_DB_PROFILE = os.environ.get('LIBRARY_DB_PROFILE', 'development')
+SQLITE_PRODUCTION = LIBRARY_DB_PROFILE == 'production'
+SQLITE_CONN_MAX_AGE = int(os.environ.get('LIBRARY_DB_CONN_MAX_AGE', 600 if SQLITE_PRODUCTION else 0))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': dict(SQLITE_PRODUCTION_OPTIONS) if SQLITE_PRODUCTION else {'init_command': SQLITE_INIT_COMMAND},
+    },
+    # Отдельное соединение только для чтения (list/retrieve каталога, library/routers.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                SQLITE_PRODUCTION_OPTIONS['init_command'] if SQLITE_PRODUCTION else SQLITE_INIT_COMMAND
+            ) + ';PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['library.routers.ReadReplicaRouter']
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -70,11 +119,30 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Файлы книг и обложек хранятся по SHA-256 содержимого (одинаковые — один раз)
+STORAGES = {
+    'default': {
+        'BACKEND': 'library.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Бэкенд кэша ответов API можно заменить (Redis, Memcached), указав другой алиас.
+# С LocMem у каждого воркера свои копии ответов; устаревают они во всех процессах сразу:
+# версия каталога в ключе — номер изменения из БД (library/cache.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'library.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -82,6 +150,58 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'library.pagination.CatalogPagination',
     'PAGE_SIZE': 20,
 }
+
+# Каталог
+LIBRARY_AUTHOR_BOOKS_LIMIT = 10  # сколько книг встраивать в ответ об авторе
+LIBRARY_CACHE_ALIAS = 'default'
+LIBRARY_RESPONSE_CACHE_TIMEOUT = 300  # секунды; 0 отключает кэш ответов
+LIBRARY_AUTOCOMPLETE_LIMIT = 10  # подсказок по умолчанию в /api/autocomplete/ (не больше 50)
+LIBRARY_READ_ALIAS = 'replica'  # алиас для list/retrieve; None — всё через default
+
+# Отдача файлов книг: None — потоком из Django; 'x-accel-redirect' (nginx)
+# или 'x-sendfile' (Apache, lighttpd) — байты копирует обратный прокси
+LIBRARY_DOWNLOAD_OFFLOAD = None
+LIBRARY_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'  # internal location в nginx, указывающий на MEDIA_ROOT
+
+# Загрузка файлов книг по частям (/api/uploads/)
+LIBRARY_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+LIBRARY_UPLOAD_PART_LEASE = 300  # секунд; после этого захват части упавшим воркером снимается
+
+# Миниатюры обложек: число процессов для backfill_covers; 0 — без пула
+LIBRARY_THUMBNAIL_WORKERS = 2
+LIBRARY_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60  # Cache-Control для файлов с именами по хэшу
+
+# Поиск по тексту книг (/api/books/content-search/, library/content.py)
+LIBRARY_CONTENT_SEARCH_PAGES = 3  # сколько лучших страниц показывать для каждой книги
+LIBRARY_CONTENT_WORKERS = 2  # процессов для backfill_content; 0 — без пула
+
+# Популярность книг (library/stats.py): счётчики копятся в памяти процесса и пишутся пачками
+LIBRARY_STATS_FLUSH_INTERVAL = 10  # секунды между записями счётчиков процесса в BookStat
+LIBRARY_POPULARITY_DAYS = 30  # за сколько последних дней суммируется популярность
+LIBRARY_POPULARITY_DOWNLOAD_WEIGHT = 5  # скачивание весит как столько просмотров
+
+# Админка: точный COUNT(*) списка до этого числа строк, дальше — оценка (library/admin.py)
+LIBRARY_ADMIN_COUNT_LIMIT = 10000
+
+# Замеры запросов (library/metrics.py): Server-Timing, гистограммы /metrics, журнал library.slow
+LIBRARY_METRICS = True  # False — middleware отключается целиком
+LIBRARY_SERVER_TIMING = True
+LIBRARY_SLOW_REQUEST_MS = None  # порог журнала медленных запросов с SQL и стеком; None — не вести
+
+# Фоновые задания (library/jobs.py, manage.py run_workers)
+LIBRARY_JOB_WORKERS = 2
+LIBRARY_JOB_TIMEOUT = 15 * 60  # задание в работе дольше — считается брошенным и возвращается в очередь
+LIBRARY_JOB_RETRY_BASE = 10  # секунды; задержка перед повтором удваивается с каждой попыткой
+LIBRARY_JOB_RETRY_MAX = 60 * 60
+LIBRARY_JOB_SCHEDULE_INTERVAL = 5 * 60  # секунды; как часто run_workers ставит ежедневные задания (stats.rollup)
+LIBRARY_JOBS_EAGER = False  # True — выполнять задания сразу при постановке (для тестов и отладки)
+
+# Кэш токенов CachedTokenAuthentication
+LIBRARY_AUTH_CACHE_SIZE = 1024
+LIBRARY_AUTH_CACHE_TTL = 300  # секунды
+LIBRARY_AUTH_CACHE_ALIAS = None  # алиас из CACHES, общий для процессов (например, Redis); None — только в памяти процесса
+# без общего кэша отозванный токен принимается другими процессами до истечения записи
+LIBRARY_AUTH_CACHE_LOCAL_TTL = 5  # секунды
@@ -3,11 +3,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.authtoken import views as token_views
+from library.views import cover_file, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('library.urls')),
     path('api/token/', token_views.obtain_auth_token),
+    path('metrics', metrics_view),
+    # обложки отдаются с Cache-Control: immutable (за прокси — через LIBRARY_DOWNLOAD_OFFLOAD)
+    path(settings.MEDIA_URL.lstrip('/') + 'covers/<path:path>', cover_file),
 ]
 
 if settings.DEBUG:
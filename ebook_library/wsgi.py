@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ebook_library.settings')
 
 application = get_wsgi_application()
+
+# счётчики популярности книг пишутся в БД пачками только в процессах сервера
+from library import stats  # noqa: E402
+
+stats.buffer.enable()
@@ -1,14 +1,110 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Author, Book
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .facets import FACETS
+from .models import Author, Blob, Book, FacetCount, Job, Upload
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Точный COUNT(*) только до LIBRARY_ADMIN_COUNT_LIMIT строк: дальше считать
+    дорого, и число берётся из estimate(). Оценка не меньше настоящего числа
+    строк, иначе последние страницы списка станут недоступны.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.LIBRARY_ADMIN_COUNT_LIMIT
+        # COUNT по подзапросу с LIMIT: сканирование останавливается на пороге
+        counted = self.object_list.order_by()[:limit + 1].count()
+        if counted <= limit:
+            return counted
+        return max(self.estimate(), counted)
+
+    def estimate(self):
+        # id растут с каждой строкой, поэтому строк не больше наибольшего id — одно чтение индекса
+        model = self.object_list.model
+        return model._base_manager.using(self.object_list.db).aggregate(top=Max('pk'))['top'] or 0
+
+
+class BookPaginator(EstimatedCountPaginator):
+    def estimate(self):
+        # без фильтров размер каталога известен из счётчиков фасетов (library/facets.py)
+        if self.object_list.query.where:
+            return super().estimate()
+        return sum(FacetCount.objects.filter(facet='book_type').values_list('count', flat=True))
+
+
+class FacetListFilter(admin.SimpleListFilter):
+    """Значения фильтра из таблицы счётчиков фасетов вместо SELECT DISTINCT по книгам."""
+    facet = None
+    ordering = ['-count', 'value']
+
+    def lookups(self, request, model_admin):
+        rows = FacetCount.objects.filter(facet=self.facet, count__gt=0).order_by(*self.ordering)
+        return [(value, f'{value} ({count})') for value, count in rows.values_list('value', 'count')]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(**{FACETS[self.facet]: self.value()})
+
+
+class GenreListFilter(FacetListFilter):
+    title = 'жанр'
+    parameter_name = facet = 'genre'
+
+
+class YearListFilter(FacetListFilter):
+    title = 'год выпуска'
+    parameter_name = facet = 'year'
+    ordering = ['-value']
+
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'year', 'publisher', 'book_type', 'genre']
-    list_filter = ['book_type', 'genre', 'year']
-    search_fields = ['title', 'author__name', 'publisher', 'genre']
\ No newline at end of file
+    list_filter = ['book_type', GenreListFilter, YearListFilter]
+    search_fields = ['title', 'author__name', 'publisher', 'genre']
+    list_select_related = ['author']
+    # выбор автора поиском вместо <select> со всеми авторами
+    autocomplete_fields = ['author']
+    paginator = BookPaginator
+    # иначе при поиске и фильтрах — второй COUNT(*) по всей таблице
+    show_full_result_count = False
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'offset', 'size', 'book', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['user', 'book']
+    autocomplete_fields = ['book']
+    raw_id_fields = ['user']
+    readonly_fields = ['sha256', 'stored_name']
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'refcount', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'refcount']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['key']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
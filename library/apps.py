@@ -5,11 +5,17 @@ class LibraryConfig(AppConfig):
     name = 'library'
 
     def ready(self):
+        from . import signals, stats  # noqa: F401
+        from django.db.backends.signals import connection_created
         from django.db.models.signals import post_save
         from django.dispatch import receiver
         from django.conf import settings
         from rest_framework.authtoken.models import Token
 
+        if settings.LIBRARY_METRICS:
+            from . import metrics
+            connection_created.connect(metrics.install)
+
         @receiver(post_save, sender=settings.AUTH_USER_MODEL)
         def create_auth_token(sender, instance=None, created=False, **kwargs):
             if created:
@@ -0,0 +1,106 @@
+import functools
+import os
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import downloads, metrics, routers, stats
+from .models import Author, Book
+from .pagination import get_keyset
+from .rows import BookRows
+from .serializers import AuthorSerializer
+from .views import AuthorViewSet, BookViewSet
+
+# Асинхронное чтение каталога (/api/async/) для ASGI: запросы к БД через async ORM,
+# файлы — асинхронным потоком. Фильтры, поиск, пагинация и формат ответа — те же,
+# что у BookViewSet и AuthorViewSet; вьюсеты используются только как конфигурация.
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def error_response(exc):
+    if isinstance(exc, Http404):
+        exc = NotFound()
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return render(data, status=exc.status_code)
+
+
+def async_api(view):
+    # только чтение (через соединение для чтения, library/routers.py);
+    # ошибки DRF (ValidationError, NotFound) — в том же виде, что у синхронного API
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        try:
+            with routers.read_replica():
+                return await view(Request(request), *args, **kwargs)
+        except (APIException, Http404) as exc:
+            return error_response(exc)
+    return wrapper
+
+
+def configured_view(viewset, request, action, **kwargs):
+    return viewset(request=request, action=action, format_kwarg=None, args=(), kwargs=kwargs)
+
+
+@async_api
+async def book_list(request):
+    view = configured_view(BookViewSet, request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+    book_rows = BookRows(request, extra_columns=[name for name, _ in get_keyset(Book)])
+    page = await view.paginator.apaginate_queryset(book_rows.values(queryset), request, view)
+    with metrics.timed():
+        return render(view.paginator.get_paginated_data([book_rows.represent(row) for row in page]))
+
+
+@async_api
+async def book_detail(request, pk):
+    view = configured_view(BookViewSet, request, 'retrieve', pk=pk)
+    book_rows = BookRows(request)
+    row = await book_rows.values(view.filter_queryset(view.get_queryset())).filter(pk=pk).afirst()
+    if row is None:
+        raise Http404
+    stats.record(pk, 'views')
+    with metrics.timed():
+        return render(book_rows.represent(row))
+
+
+@async_api
+async def book_download(request, pk):
+    try:
+        book = await Book.objects.only('id', 'title', 'book_file').aget(pk=pk)
+    except Book.DoesNotExist:
+        raise Http404
+    filename = book.title + os.path.splitext(book.book_file.name or '')[1]
+    # размер, дата и открытие файла — в потоке; байты отдаются асинхронным итератором
+    response = await sync_to_async(downloads.serve_file, thread_sensitive=False)(
+        request._request, book.book_file, filename=filename, asynchronous=True
+    )
+    if stats.is_full_download(request, response):
+        stats.record(book.pk, 'downloads')
+    return response
+
+
+@async_api
+async def author_list(request):
+    view = configured_view(AuthorViewSet, request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await view.paginator.apaginate_queryset(queryset, request, view)
+    data = AuthorSerializer(page, many=True, context=view.get_serializer_context()).data
+    return render(view.paginator.get_paginated_data(data))
+
+
+@async_api
+async def author_detail(request, pk):
+    view = configured_view(AuthorViewSet, request, 'retrieve', pk=pk)
+    try:
+        author = await view.filter_queryset(view.get_queryset()).aget(pk=pk)
+    except Author.DoesNotExist:
+        raise Http404
+    return render(AuthorSerializer(author, context=view.get_serializer_context()).data)
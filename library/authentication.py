@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+SHARED_VERSION_KEY = 'library:auth:version'
+
+
+class TokenCache:
+    """
+    LRU ключей токенов с временем жизни: ключ -> (пользователь, токен).
+    Если задан LIBRARY_AUTH_CACHE_ALIAS, записи дополнительно хранятся в общем кэше,
+    а инвалидация увеличивает общую версию — устаревают записи во всех процессах.
+    Без общего кэша удаление токена видит только обработавший его процесс, поэтому
+    запись живёт не дольше LIBRARY_AUTH_CACHE_LOCAL_TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._user_keys = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        alias = settings.LIBRARY_AUTH_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    @property
+    def ttl(self):
+        if self.shared is None:
+            return min(settings.LIBRARY_AUTH_CACHE_TTL, settings.LIBRARY_AUTH_CACHE_LOCAL_TTL)
+        return settings.LIBRARY_AUTH_CACHE_TTL
+
+    def get(self, key):
+        version = self._shared_version()
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                value, expires, item_version = item
+                if expires > now and item_version == version:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+        shared = self.shared
+        if shared is not None:
+            value = shared.get(self._shared_key(key, version))
+            if value is not None:
+                self._store(key, value, version)
+                with self._lock:
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        version = self._shared_version()
+        self._store(key, value, version)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._shared_key(key, version), value, timeout=settings.LIBRARY_AUTH_CACHE_TTL)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+        self._bump_shared_version()
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+        self._bump_shared_version()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._user_keys.clear()
+            self.hits = self.misses = 0
+
+    def _store(self, key, value, version):
+        user_id = value[0].pk
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._remove(key)
+            self._items[key] = (value, expires, version)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._items) > settings.LIBRARY_AUTH_CACHE_SIZE:
+                self._remove(next(iter(self._items)))
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        user_id = item[0][0].pk
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def _shared_version(self):
+        shared = self.shared
+        if shared is None:
+            return None
+        version = shared.get(SHARED_VERSION_KEY)
+        if version is None:
+            shared.add(SHARED_VERSION_KEY, 1, timeout=None)
+            version = shared.get(SHARED_VERSION_KEY, 1)
+        return version
+
+    def _bump_shared_version(self):
+        shared = self.shared
+        if shared is None:
+            return
+        try:
+            shared.incr(SHARED_VERSION_KEY)
+        except ValueError:
+            shared.add(SHARED_VERSION_KEY, 2, timeout=None)
+
+    def _shared_key(self, key, version):
+        # в общем кэше ключ токена не хранится в открытом виде
+        return f'library:auth:{version}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса Token + User на каждый запрос: разрешённые токены
+    хранятся в token_cache (LIBRARY_AUTH_CACHE_SIZE, LIBRARY_AUTH_CACHE_TTL).
+    Записи сбрасываются сигналами при удалении токена и сохранении пользователя
+    (library/signals.py); изменения через QuerySet.update() учитываются по истечении TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            # копия: каждый запрос получает свой экземпляр пользователя
+            return copy.copy(user), token
+        # неверные и неактивные токены не кэшируются, ошибки — как у TokenAuthentication
+        user, token = super().authenticate_credentials(key)
+        token_cache.put(key, (user, token))
+        return copy.copy(user), token
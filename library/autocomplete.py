@@ -0,0 +1,115 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from . import cache
+from .models import Author, Book
+from .normalize import normalize
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив ключей для подсказок: нормализованное название книги
+    или имя автора и каждый его хвост с начала слова («маленький принц», «принц»).
+    Поиск — bisect по префиксу и просмотр подряд идущих ключей до limit результатов.
+    """
+
+    def __init__(self, entries=(), version=None):
+        # entries: (тип, id, подпись, нормализованный текст)
+        self.items = []
+        keyed = []
+        for kind, pk, label, text in entries:
+            if not text:
+                continue
+            ref = len(self.items)
+            self.items.append((kind, pk, label))
+            words = text.split(' ')
+            for start in range(len(words)):
+                keyed.append((' '.join(words[start:]), ref))
+        keyed.sort()
+        self.keys = [key for key, _ in keyed]
+        self.refs = [ref for _, ref in keyed]
+        self.version = version
+
+    def lookup(self, query, limit=10):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(results) < limit:
+            if not self.keys[position].startswith(prefix):
+                break
+            ref = self.refs[position]
+            if ref not in seen:
+                seen.add(ref)
+                results.append(self.items[ref])
+            position += 1
+        return results
+
+    def memory(self):
+        # приблизительный объём в байтах: списки, ключи, кортежи и подписи
+        size = sys.getsizeof(self.keys) + sys.getsizeof(self.refs) + sys.getsizeof(self.items)
+        size += sum(sys.getsizeof(key) for key in self.keys)
+        size += sum(sys.getsizeof(item) + sys.getsizeof(item[2]) for item in self.items)
+        return size
+
+
+def load_entries(using=DEFAULT_DB_ALIAS):
+    for pk, title, text in Book.objects.using(using).order_by().values_list('id', 'title', 'title_norm').iterator():
+        yield 'book', pk, title, text
+    for pk, name, text in Author.objects.using(using).order_by().values_list('id', 'name', 'name_norm').iterator():
+        yield 'author', pk, name, text
+
+
+class Autocomplete:
+    """
+    Индекс подсказок в памяти процесса. Перестраивается при первом запросе
+    после изменения каталога. Версия — номер последнего изменения из БД
+    (library/cache.py, changes.current_seq), поэтому правки, сделанные другим
+    процессом или воркером, видны без общего кэша.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index = PrefixIndex()
+        self.build_ms = None
+        self.built_at = None
+
+    def get_index(self):
+        # внутри транзакции видны незафиксированные изменения — такой индекс не сохраняется
+        if connection.in_atomic_block:
+            return PrefixIndex(load_entries())
+        version = cache.get_catalog_version()
+        index = self.index
+        if index.version == version:
+            return index
+        with self._lock:
+            # пока строил другой поток, версия могла уже совпасть
+            if self.index.version != version:
+                started = time.perf_counter()
+                self.index = PrefixIndex(load_entries(), version=version)
+                self.build_ms = (time.perf_counter() - started) * 1000
+                self.built_at = time.time()
+            return self.index
+
+    def lookup(self, query, limit=10):
+        return self.get_index().lookup(query, limit)
+
+    def stats(self):
+        index = self.index
+        return {
+            'version': index.version,
+            'items': len(index.items),
+            'keys': len(index.keys),
+            'memory_bytes': index.memory(),
+            'build_ms': self.build_ms,
+            'built_at': self.built_at,
+        }
+
+
+autocomplete = Autocomplete()
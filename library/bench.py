@@ -0,0 +1,202 @@
+import io
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS
+from django.test.utils import override_settings
+
+from . import changes, extraction, normalize
+from .models import Author, Book, BookPage
+
+# Словари для синтетического каталога
+MALE_NAMES = ['Александр', 'Борис', 'Григорий', 'Евгений', 'Иван', 'Константин', 'Лев', 'Михаил', 'Пётр', 'Сергей', 'Фёдор']
+FEMALE_NAMES = ['Анна', 'Вера', 'Дарья', 'Елена', 'Ирина', 'Мария', 'Наталья', 'Ольга', 'Татьяна']
+PATRONYMICS = ['Александров', 'Андреев', 'Борисов', 'Иванов', 'Михайлов', 'Николаев', 'Павлов', 'Петров', 'Сергеев', 'Фёдоров']
+SURNAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов',
+    'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев',
+    'Семёнов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев',
+]
+CITIES = ['Москве', 'Санкт-Петербурге', 'Казани', 'Нижнем Новгороде', 'Твери', 'Орле', 'Самаре', 'Томске', 'Одессе', 'Киеве']
+TITLE_NOUNS = ['тайна', 'история', 'путешествие', 'хроника', 'повесть', 'песня', 'легенда', 'возвращение', 'тень', 'дневник']
+TITLE_OBJECTS = [
+    'старого сада', 'северного моря', 'большого города', 'последней зимы', 'долгой дороги',
+    'капитана Грея', 'тихой реки', 'забытого письма', 'белой степи', 'одной ночи',
+]
+SUBJECTS = ['физики', 'алгебры', 'химии', 'геометрии', 'истории', 'литературы', 'биологии', 'географии']
+TEXTBOOK_TITLES = ['Основы', 'Учебник', 'Курс', 'Задачник', 'Практикум']
+GENRES = ['роман', 'повесть', 'рассказ', 'фантастика', 'детектив', 'поэзия', 'учебное пособие']
+CATEGORIES = ['художественная литература', 'учебник', 'справочник', 'публицистика']
+PUBLISHERS = ['Эксмо', 'АСТ', 'Азбука', 'Просвещение', 'Дрофа', 'Наука', 'Русский вестник']
+TEXT_WORDS = [
+    'утро', 'было', 'тихим', 'и', 'над', 'рекой', 'стоял', 'туман', 'старый', 'дом', 'на', 'краю',
+    'города', 'помнил', 'многое', 'письмо', 'пришло', 'только', 'вечером', 'когда', 'все', 'уже',
+    'спали', 'дорога', 'шла', 'через', 'степь', 'к', 'далёкому', 'морю', 'капитан', 'долго', 'смотрел',
+    'в', 'окно', 'зима', 'выдалась', 'снежной', 'ёлки', 'стояли', 'в', 'инее', 'сердце', 'билось',
+    'чаще', 'обычного', 'звёзды', 'горели', 'ярко', 'задача', 'решается', 'по', 'формуле', 'силы',
+]
+
+
+def person_name(rng):
+    if rng.random() < 0.5:
+        return f'{rng.choice(MALE_NAMES)} {rng.choice(PATRONYMICS)}ич {rng.choice(SURNAMES)}'
+    return f'{rng.choice(FEMALE_NAMES)} {rng.choice(PATRONYMICS)}на {rng.choice(SURNAMES)}а'
+
+
+def book_title(rng, book_type='fiction'):
+    if book_type == 'textbook':
+        return f'{rng.choice(TEXTBOOK_TITLES)} {rng.choice(SUBJECTS)}'
+    if rng.random() < 0.3:
+        first, second = rng.sample(TITLE_NOUNS, 2)
+        return f'{first.capitalize()} и {second}'
+    return f'{rng.choice(TITLE_NOUNS).capitalize()} {rng.choice(TITLE_OBJECTS)}'
+
+
+def sentence(rng, words=(6, 14)):
+    text = ' '.join(rng.choice(TEXT_WORDS) for _ in range(rng.randint(*words)))
+    return text[0].upper() + text[1:] + '.'
+
+
+def biography(rng, name):
+    born = 'Родилась' if name.split()[1].endswith('на') else 'Родился'
+    return ' '.join([f'{born} в {rng.randint(1800, 1990)} году в {rng.choice(CITIES)}.', sentence(rng), sentence(rng)])
+
+
+def build_epub(title, paragraphs):
+    # минимальный EPUB из одной главы; текст извлекается library/extraction.py
+    body = ''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip')
+        archive.writestr('META-INF/container.xml', (
+            '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="content.opf" media-type="application/oebps-package+xml"/></rootfiles></container>'
+        ))
+        archive.writestr('content.opf', (
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            '<manifest><item id="c0" href="c0.xhtml" media-type="application/xhtml+xml"/></manifest>'
+            '<spine><itemref idref="c0"/></spine></package>'
+        ))
+        archive.writestr('c0.xhtml', (
+            f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>{title}</title></head>'
+            f'<body><h1>{title}</h1>{body}</body></html>'
+        ))
+    return buffer.getvalue()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings):
+    return {
+        'min': min(timings),
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'mean': statistics.fmean(timings),
+    }
+
+
+def measure(func, repeat=20):
+    # Время выполнения func в миллисекундах
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings)
+
+
+@contextmanager
+def temporary_media():
+    # файлы синтетических книг — во временный каталог, который удаляется после замера
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(MEDIA_ROOT=directory):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def seed_catalog(authors, books, files=0, seed=0, using=DEFAULT_DB_ALIAS):
+    """
+    Синтетический каталог для замеров: авторы с биографиями и книги с русскими названиями.
+    files > 0 — книги ссылаются на пул из стольких файлов EPUB; их текст извлекается
+    один раз и сразу записывается в страницы книг, без заданий content.index.
+    Вставка — bulk_create; поиск, фасеты и счётчики файлов обновляет books_bulk_created.
+    Повторный запуск добавляет книги, не нарушая уникальности. Возвращает созданные книги.
+    """
+    from .signals import books_bulk_created
+
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < authors:
+        name = candidate = person_name(rng)
+        # сочетаний имён конечное число: в больших каталогах повторы различаются номером
+        number = 1
+        while candidate in seen:
+            number += 1
+            candidate = f'{name} ({number})'
+        seen.add(candidate)
+        names.append(candidate)
+    Author.objects.using(using).bulk_create(
+        changes.stamp((normalize.fill(Author(name=name, biography=biography(rng, name))) for name in names), using=using),
+        batch_size=1000, ignore_conflicts=True,
+    )
+    author_ids = list(Author.objects.using(using).filter(name__in=names).order_by('id').values_list('id', flat=True))
+
+    pool = []
+    for number in range(files):
+        title = book_title(rng)
+        data = build_epub(title, [sentence(rng) for _ in range(rng.randint(4, 8))])
+        # хранилище адресуется по содержимому: повторный запуск не плодит копий
+        stored = default_storage.save('books/seed.epub', ContentFile(data))
+        pool.append((stored, extraction.extract_pages(default_storage.path(stored))))
+
+    taken = set(
+        Book.objects.using(using).filter(author_id__in=author_ids).values_list('title', 'author_id', 'year', 'publisher')
+    )
+    fiction_genres = [genre for genre in GENRES if genre != 'учебное пособие']
+    fiction_categories = [category for category in CATEGORIES if category != 'учебник']
+    created = []
+    for _ in range(books):
+        book_type = 'textbook' if rng.random() < 0.2 else 'fiction'
+        fields = (book_title(rng, book_type), rng.choice(author_ids), rng.randint(1850, 2025), rng.choice(PUBLISHERS))
+        while fields in taken:
+            fields = (fields[0], fields[1], fields[2] + 1, fields[3])
+        taken.add(fields)
+        book = Book(
+            title=fields[0], author_id=fields[1], year=fields[2], publisher=fields[3], book_type=book_type,
+            genre='учебное пособие' if book_type == 'textbook' else rng.choice(fiction_genres),
+            category='учебник' if book_type == 'textbook' else rng.choice(fiction_categories),
+        )
+        if pool:
+            book.book_file, pages = rng.choice(pool)
+            book.content_index = {'source': book.book_file.name, 'pages': len(pages)}
+        created.append(normalize.fill(book))
+    created = Book.objects.using(using).bulk_create(changes.stamp(created, using=using), batch_size=1000)
+
+    if pool:
+        texts = dict(pool)
+        BookPage.objects.using(using).bulk_create(
+            (
+                normalize.fill(BookPage(book_id=book.pk, number=number, text=text))
+                for book in created
+                for number, text in enumerate(texts[book.book_file.name], start=1)
+            ),
+            batch_size=1000,
+        )
+    books_bulk_created.send(sender=Book, books=created, using=using)
+    return created
@@ -0,0 +1,83 @@
+from collections import Counter, defaultdict
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import thumbnails
+from .models import Blob, Upload
+from .storage import hashed_digest
+
+# Поля Book, файлы которых учитываются в подсчёте ссылок
+FILE_FIELDS = ('book_file', 'cover_image')
+
+
+def book_file_names(book):
+    return [getattr(book, field).name for field in FILE_FIELDS]
+
+
+def _counts(names):
+    # учитываются только адресные имена; файлы со старыми именами не удаляются никогда
+    return Counter(name for name in names if hashed_digest(name))
+
+
+def _by_count(counts):
+    groups = defaultdict(list)
+    for name, count in counts.items():
+        groups[count].append(name)
+    return groups.items()
+
+
+def acquire(names, using=None):
+    counts = _counts(names)
+    if not counts:
+        return
+    blobs = Blob.objects.using(using)
+    blobs.bulk_create([Blob(name=name) for name in counts], ignore_conflicts=True)
+    # один UPDATE на каждое различное число ссылок, а не на каждый файл
+    for count, group in _by_count(counts):
+        blobs.filter(name__in=group).update(refcount=F('refcount') + count)
+
+
+def pin(name, using=None):
+    """
+    Заводит строку Blob (пока без ссылок) до того, как файл займёт адресное место.
+    delete_orphans не удаляет файлы, у которых есть строка Blob.
+    """
+    Blob.objects.using(using).bulk_create([Blob(name=name)], ignore_conflicts=True)
+
+
+def release(names, using=None):
+    counts = _counts(names)
+    if not counts:
+        return
+    blobs = Blob.objects.using(using)
+    for count, group in _by_count(counts):
+        blobs.filter(name__in=group).update(refcount=Greatest(F('refcount') - count, 0))
+    orphans = list(blobs.filter(name__in=counts, refcount=0).values_list('name', flat=True))
+    if orphans:
+        blobs.filter(name__in=orphans, refcount=0).delete()
+        transaction.on_commit(lambda: delete_orphans(orphans, using=using), using=using)
+
+
+def delete_orphans(names, using=None):
+    # файл мог снова понадобиться между фиксацией транзакции и удалением. Проверка
+    # и удаление идут под блокировкой записи: первый оператор транзакции — UPDATE,
+    # поэтому pin() из store_hashed ждёт её конца и положит файл заново
+    with transaction.atomic(using=using):
+        blobs = Blob.objects.using(using)
+        blobs.filter(name__in=names).update(refcount=F('refcount'))
+        referenced = set(blobs.filter(name__in=names).values_list('name', flat=True))
+        referenced.update(Upload.objects.using(using).filter(
+            stored_name__in=names, status='complete', book__isnull=True
+        ).values_list('stored_name', flat=True))
+        for name in set(names) - referenced:
+            default_storage.delete(name)
+            thumbnails.delete_renditions(name)
+
+
+def diff(old, new):
+    # (добавленные, удалённые) имена с учётом кратности
+    old, new = Counter(old), Counter(new)
+    return list((new - old).elements()), list((old - new).elements())
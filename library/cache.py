@@ -0,0 +1,155 @@
+import hashlib
+import threading
+from functools import partial
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from . import changes
+
+RESPONSE_KEY_PREFIX = 'library:response:'
+
+
+def get_cache():
+    return caches[settings.LIBRARY_CACHE_ALIAS]
+
+
+# Версия каталога входит в ключ каждого закэшированного ответа. Это номер последнего
+# изменения каталога из БД (library/changes.py): он общий для всех воркеров и команд
+# manage.py, поэтому изменение в любом процессе делает старые записи недостижимыми везде.
+# Сами ответы хранятся в LIBRARY_CACHE_ALIAS — в LocMem у каждого процесса свои.
+def get_catalog_version():
+    # без явного алиаса: при чтении list/retrieve — через соединение для чтения
+    return changes.current_seq(using=None)
+
+
+def bump_catalog_version(using=DEFAULT_DB_ALIAS):
+    # для изменений, которые сохраняются update() без номера изменения (миниатюры, текст книги);
+    # номер выдаётся в транзакции самого изменения
+    return changes.next_seq(using=using)
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.not_modified = 0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified}
+
+
+stats = CacheStats()
+
+
+def make_key(request, version):
+    # нормализованный запрос: хост, путь, отсортированные непустые параметры, формат ответа
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    raw = '\n'.join([
+        request.get_host(),
+        request.path,
+        urlencode(params),
+        request.accepted_renderer.format,
+        str(version),
+    ])
+    return RESPONSE_KEY_PREFIX + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def make_etag(content):
+    return '"{}"'.format(hashlib.sha256(content).hexdigest()[:40])
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def is_cacheable(request):
+    # Ответы, прочитанные внутри открытой транзакции, могут не пережить откат —
+    # такие запросы идут мимо кэша
+    return (
+        settings.LIBRARY_RESPONSE_CACHE_TIMEOUT
+        and request.method in ('GET', 'HEAD')
+        and request.accepted_renderer.format == 'json'
+        and not connection.in_atomic_block
+    )
+
+
+def _store(key, response):
+    etag = make_etag(response.content)
+    response['ETag'] = etag
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': etag,
+    }
+    get_cache().set(key, entry, timeout=settings.LIBRARY_RESPONSE_CACHE_TIMEOUT)
+
+
+def _from_entry(request, entry):
+    if etag_matches(request, entry['etag']):
+        stats.record('not_modified')
+        response = HttpResponseNotModified()
+    else:
+        stats.record('hits')
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Кэширует публичные ответы list/retrieve вьюсета по нормализованному
+    запросу и версии каталога. Попадание в кэш и ответ 304 не обращаются к ORM.
+    """
+    cached_actions = ['list', 'retrieve']
+    # значения параметров запроса, ответ на которые зависит от данных без номера изменения
+    uncached_params = {}
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cached_actions or not is_cacheable(request) or self.bypasses_cache(request):
+            return handler(request, *args, **kwargs)
+
+        key = make_key(request, get_catalog_version())
+        entry = get_cache().get(key)
+        if entry is not None:
+            return _from_entry(request, entry)
+
+        stats.record('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(partial(_store, key))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def bypasses_cache(self, request):
+        return any(request.query_params.get(param) in values for param, values in self.uncached_params.items())
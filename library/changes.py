@@ -0,0 +1,98 @@
+import heapq
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+
+from .models import Author, Book, Sequence, Tombstone
+
+SEQUENCE = 'catalog'
+# Поля книги в ленте изменений — как в выгрузке (library/exporters.py)
+BOOK_FIELDS = {
+    'id': 'id', 'title': 'title', 'author': 'author__name', 'author_id': 'author_id', 'year': 'year',
+    'genre': 'genre', 'category': 'category', 'publisher': 'publisher', 'book_type': 'book_type',
+    'book_file': 'book_file', 'cover_image': 'cover_image', 'updated_at': 'updated_at',
+}
+AUTHOR_FIELDS = {'id': 'id', 'name': 'name', 'biography': 'biography', 'updated_at': 'updated_at'}
+
+
+def next_seq(count=1, using=DEFAULT_DB_ALIAS):
+    """
+    Резервирует count номеров изменений и возвращает последний.
+    Строка счётчика заблокирована до конца транзакции записи, поэтому номера
+    выдаются в порядке фиксации: все изменения с номером не больше прочитанного
+    значения счётчика уже зафиксированы.
+    """
+    sequences = Sequence.objects.using(using)
+    with transaction.atomic(using=using):
+        if not sequences.filter(name=SEQUENCE).update(value=F('value') + count):
+            try:
+                with transaction.atomic(using=using):
+                    sequences.create(name=SEQUENCE, value=count)
+                    return count
+            except IntegrityError:
+                # счётчик создан параллельно
+                sequences.filter(name=SEQUENCE).update(value=F('value') + count)
+        return sequences.get(name=SEQUENCE).value
+
+
+def current_seq(using=DEFAULT_DB_ALIAS):
+    return Sequence.objects.using(using).filter(name=SEQUENCE).values_list('value', flat=True).first() or 0
+
+
+def stamp(objects, using=DEFAULT_DB_ALIAS):
+    # номера изменений для bulk_create, где pre_save не срабатывает
+    objects = list(objects)
+    if objects:
+        last = next_seq(len(objects), using=using)
+        for seq, obj in enumerate(objects, start=last - len(objects) + 1):
+            obj.change_seq = seq
+    return objects
+
+
+def record_delete(kind, object_id, using=DEFAULT_DB_ALIAS):
+    Tombstone.objects.using(using).create(kind=kind, object_id=object_id, seq=next_seq(using=using))
+
+
+def _upserts(kind, queryset, fields, since, high, limit):
+    rows = (
+        queryset.filter(change_seq__gt=since, change_seq__lte=high)
+        .order_by('change_seq')
+        .values('change_seq', *fields.values())[:limit]
+    )
+    for row in rows:
+        data = {name: row[lookup] for name, lookup in fields.items()}
+        yield row['change_seq'], kind, 'upsert', data['id'], data
+
+
+def _deletes(using, since, high, limit):
+    rows = (
+        Tombstone.objects.using(using)
+        .filter(seq__gt=since, seq__lte=high)
+        .order_by('seq')
+        .values_list('seq', 'kind', 'object_id')[:limit]
+    )
+    for seq, kind, object_id in rows:
+        yield seq, kind, 'delete', object_id, None
+
+
+def feed(since=0, limit=100, using=DEFAULT_DB_ALIAS):
+    """
+    Изменения каталога после курсора since в порядке фиксации.
+    Для книги или автора отдаётся последнее состояние, для удалённых — запись
+    из Tombstone. Верхняя граница — значение счётчика на момент запроса:
+    изменения выше неё ещё могут фиксироваться и попадут в следующий ответ.
+    """
+    high = current_seq(using=using)
+    sources = [
+        _upserts('author', Author.objects.using(using), AUTHOR_FIELDS, since, high, limit + 1),
+        _upserts('book', Book.objects.using(using), BOOK_FIELDS, since, high, limit + 1),
+        _deletes(using, since, high, limit + 1),
+    ]
+    changes = []
+    for seq, kind, op, object_id, data in heapq.merge(*sources, key=lambda change: change[0]):
+        if len(changes) == limit:
+            return {'changes': changes, 'cursor': changes[-1]['seq'], 'has_more': True}
+        if kind == 'book' and data is not None:
+            data['cover_image'] = data['cover_image'] or ''
+        changes.append({'seq': seq, 'type': kind, 'op': op, 'id': object_id, 'data': data})
+    return {'changes': changes, 'cursor': max(high, since), 'has_more': False}
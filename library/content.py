@@ -0,0 +1,204 @@
+import html
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import cache, extraction, jobs, normalize
+from .models import Book, BookPage
+from .search import build_match_query
+
+# Индекс по страницам (миграция 0013): внешнее содержимое library_bookpage, колонка text_norm
+FTS_TABLE = 'library_bookpage_fts'
+SNIPPET_WORDS = 24
+
+_TOKEN_RE = re.compile(r'\w+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def is_indexed(book):
+    return (book.content_index or {}).get('source') == book.book_file.name
+
+
+def needs_indexing(book):
+    return bool(book.book_file) and not is_indexed(book)
+
+
+def enqueue(books, using=DEFAULT_DB_ALIAS):
+    # ключ включает имя файла: новый файл во время обработки ставит новое задание
+    for book in books:
+        jobs.enqueue_on_commit(
+            'content.index',
+            args={'book_id': book.pk, 'using': using},
+            key=f'content.index:{book.pk}:{book.book_file.name}',
+            using=using,
+        )
+
+
+def store_pages(book_id, pages, using=DEFAULT_DB_ALIAS):
+    """
+    Заменяет текст страниц книги. Меняются только страницы с другим текстом:
+    при повторной загрузке исправленного файла индекс обновляется постранично.
+    Возвращает число изменённых страниц.
+    """
+    stored = {
+        number: (pk, text)
+        for pk, number, text in BookPage.objects.using(using).filter(book_id=book_id).values_list('id', 'number', 'text')
+    }
+    created, updated = [], []
+    for number, text in enumerate(pages, start=1):
+        if number not in stored:
+            created.append(normalize.fill(BookPage(book_id=book_id, number=number, text=text)))
+        elif stored[number][1] != text:
+            updated.append(normalize.fill(BookPage(pk=stored[number][0], book_id=book_id, number=number, text=text)))
+    removed = [pk for number, (pk, _) in stored.items() if number > len(pages)]
+
+    objects = BookPage.objects.using(using)
+    objects.filter(pk__in=removed).delete()
+    objects.bulk_update(updated, ['text', 'text_norm'], batch_size=500)
+    objects.bulk_create(created, batch_size=500)
+    return len(created) + len(updated) + len(removed)
+
+
+def record(book_id, source_name, pages=(), error='', using=DEFAULT_DB_ALIAS):
+    # файл мог смениться, пока шло извлечение: тогда результат не нужен
+    with transaction.atomic(using=using):
+        state = {'source': source_name, 'pages': len(pages)}
+        if error:
+            state['error'] = error
+        if not Book.objects.using(using).filter(pk=book_id, book_file=source_name).update(content_index=state):
+            return None
+        changed = store_pages(book_id, pages, using=using)
+        if changed:
+            cache.bump_catalog_version(using=using)
+    return changed
+
+
+@jobs.task('content.index')
+def index_content(book_id, using=DEFAULT_DB_ALIAS, force=False):
+    book = Book.objects.using(using).filter(pk=book_id).only('id', 'book_file', 'content_index').first()
+    if book is None or not book.book_file:
+        return
+    if not force and is_indexed(book):
+        return
+    source_name = book.book_file.name
+    try:
+        pages = extraction.extract_pages(default_storage.path(source_name))
+    except extraction.ExtractionError as exc:
+        # повтор не поможет: файл повреждён или формат не поддерживается
+        return record(book_id, source_name, error=str(exc), using=using)
+    return record(book_id, source_name, pages, using=using)
+
+
+def search_terms(query):
+    return [word for term in query.split() for word in normalize.normalize(term).split()]
+
+
+class ContentHits:
+    """
+    Поиск по тексту книг: книги по лучшей странице (bm25), в каждой — до
+    LIBRARY_CONTENT_SEARCH_PAGES лучших страниц с фрагментами текста.
+    Срез выполняет запрос, поэтому объект листается UncountedPageNumberPagination.
+    """
+
+    def __init__(self, query, using=DEFAULT_DB_ALIAS):
+        self.terms = search_terms(query)
+        self.match = build_match_query(self.terms)
+        self.using = using
+
+    def _hits_sql(self):
+        # rank вычисляется только в самом запросе FTS5, поэтому совпадения материализуются
+        page_table = BookPage._meta.db_table
+        return (
+            f'WITH hits AS MATERIALIZED (SELECT rowid AS id, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s), '
+            f'pages AS MATERIALIZED ('
+            f'SELECT p.id, p.book_id, p.number, MIN(hits.rank) OVER (PARTITION BY p.book_id) AS score, '
+            f'ROW_NUMBER() OVER (PARTITION BY p.book_id ORDER BY hits.rank, p.number) AS n '
+            f'FROM hits INNER JOIN {page_table} p ON p.id = hits.id) '
+        )
+
+    def count(self):
+        if not self.match:
+            return 0
+        # без rank: подсчёт не требует вычисления bm25
+        page_table = BookPage._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(DISTINCT p.book_id) FROM {FTS_TABLE} INNER JOIN {page_table} p '
+                f'ON p.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step is not None:
+            raise TypeError('Поддерживаются только срезы без шага.')
+        start, stop = item.start or 0, item.stop
+        if not self.match or (stop is not None and stop <= start):
+            return []
+        # один проход по совпадениям: книги страницы выдачи и их лучшие страницы
+        page_table = BookPage._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'{self._hits_sql()}, '
+                f'books AS (SELECT book_id, score FROM pages WHERE n = 1 ORDER BY score, book_id LIMIT %s OFFSET %s) '
+                f'SELECT pages.book_id, books.score, pages.number, p.text FROM pages '
+                f'INNER JOIN books ON books.book_id = pages.book_id INNER JOIN {page_table} p ON p.id = pages.id '
+                f'WHERE pages.n <= %s ORDER BY books.score, pages.book_id, pages.n',
+                [self.match, -1 if stop is None else stop - start, start, settings.LIBRARY_CONTENT_SEARCH_PAGES],
+            )
+            scores, pages = {}, {}
+            for book_id, score, number, text in cursor.fetchall():
+                scores[book_id] = score
+                pages.setdefault(book_id, []).append({'page': number, 'snippet': snippet(text, self.terms)})
+        if not scores:
+            return []
+
+        books = Book.objects.using(self.using).filter(pk__in=scores).values('id', 'title', 'author__name', 'year')
+        books = {book['id']: book for book in books}
+        return [
+            {
+                'id': book_id,
+                'title': books[book_id]['title'],
+                'author_name': books[book_id]['author__name'],
+                'year': books[book_id]['year'],
+                'score': round(-score, 6),
+                'pages': pages.get(book_id, []),
+            }
+            for book_id, score in scores.items() if book_id in books
+        ]
+
+
+def snippet(text, terms, words=SNIPPET_WORDS):
+    """
+    Фрагмент страницы вокруг наибольшего скопления совпадений, совпадения — в <mark>.
+    Слова сравниваются после normalize, как в индексе; текст экранируется для HTML.
+    """
+    tokens = list(_TOKEN_RE.finditer(text))
+    if not tokens:
+        return ''
+    matched = [
+        index for index, token in enumerate(tokens)
+        if any(normalize.normalize(token.group()).startswith(term) for term in terms)
+    ]
+    if matched:
+        best = max(matched, key=lambda index: sum(1 for other in matched if index <= other < index + words))
+        first = max(0, min(best - words // 4, len(tokens) - words))
+    else:
+        first = 0
+    last = min(len(tokens), first + words) - 1
+    marked = set(matched)
+    parts = ['…' if first > 0 else '']
+    position = tokens[first].start()
+    for index in range(first, last + 1):
+        token = tokens[index]
+        parts.append(html.escape(_SPACE_RE.sub(' ', text[position:token.start()])))
+        if index in marked:
+            parts.append(f'<mark>{html.escape(token.group())}</mark>')
+        else:
+            parts.append(html.escape(token.group()))
+        position = token.end()
+    if last < len(tokens) - 1:
+        parts.append('…')
+    return ''.join(parts)
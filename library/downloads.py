@@ -0,0 +1,213 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_etags,
+    parse_http_date_safe,
+)
+from rest_framework.negotiation import BaseContentNegotiation
+
+from .storage import hashed_digest
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    # Для отдачи файлов заголовок Accept клиента (например, application/pdf) не важен
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном байтов.
+    Возвращает (start, end) включительно или None, если диапазон нужно
+    проигнорировать и отдать файл целиком (в том числе для нескольких диапазонов).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # суффиксный диапазон: последние N байт
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+class RangeFile:
+    # Файловый объект, ограниченный диапазоном [start, start + length)
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class BookFileResponse(FileResponse):
+    block_size = CHUNK_SIZE
+
+
+async def aiter_file(file, chunk_size=CHUNK_SIZE):
+    # чтение в потоке из пула: цикл событий не ждёт диска, пока медленный клиент принимает байты
+    try:
+        while True:
+            data = await sync_to_async(file.read, thread_sensitive=False)(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+def async_file_response(file, length, content_type, status=200):
+    # StreamingHttpResponse с асинхронным итератором: под ASGI не занимает поток на всё скачивание
+    response = StreamingHttpResponse(aiter_file(file), status=status, content_type=content_type)
+    response['Content-Length'] = str(length)
+    return response
+
+
+def make_etag(size, modified):
+    return '"{:x}-{:x}"'.format(size, int(modified.timestamp() * 1_000_000))
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # слабое сравнение: W/"x" совпадает с "x"
+        etags = [value.removeprefix('W/') for value in parse_etags(if_none_match)]
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def range_allowed(request, etag, last_modified):
+    # If-Range: диапазон применяется, только если файл не менялся
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and last_modified <= date
+
+
+def serve_file(request, fieldfile, filename=None, asynchronous=False):
+    """
+    Отдаёт файл с поддержкой Range/206 и условных запросов. При включённом
+    LIBRARY_DOWNLOAD_OFFLOAD копирование байтов перекладывается на обратный прокси.
+    asynchronous=True — тело ответа читается асинхронным итератором (для ASGI).
+    """
+    if not fieldfile:
+        raise Http404
+    return serve_name(request, fieldfile.storage, fieldfile.name, filename=filename, asynchronous=asynchronous)
+
+
+def serve_name(request, storage, name, filename=None, asynchronous=False):
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except OSError:
+        raise Http404
+    last_modified = int(modified.timestamp())
+    # адресное имя уже однозначно задаёт содержимое
+    digest = hashed_digest(name)
+    etag = f'"{digest}"' if digest else make_etag(size, modified)
+    filename = filename or os.path.basename(name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    if not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+        _set_validators(response, etag, last_modified)
+        return response
+
+    offload = settings.LIBRARY_DOWNLOAD_OFFLOAD
+    if offload:
+        response = _offload_response(offload, storage, name, content_type)
+    else:
+        response = _stream_response(request, storage, name, size, content_type, etag, last_modified, asynchronous)
+    _set_validators(response, etag, last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(False, filename)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+
+def _stream_response(request, storage, name, size, content_type, etag, last_modified, asynchronous=False):
+    byte_range = None
+    header = request.headers.get('Range')
+    if header and range_allowed(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = storage.open(name, 'rb')
+    if byte_range is None:
+        if asynchronous:
+            return async_file_response(file, size, content_type)
+        return BookFileResponse(file, content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    if asynchronous:
+        response = async_file_response(RangeFile(file, start, length), length, content_type, status=206)
+    else:
+        response = BookFileResponse(RangeFile(file, start, length), status=206, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def _offload_response(mode, storage, name, content_type):
+    # Тело ответа отправит nginx (X-Accel-Redirect) или Apache/lighttpd (X-Sendfile),
+    # они же обрабатывают Range
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.LIBRARY_DOWNLOAD_ACCEL_PREFIX + quote(name)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = storage.path(name)
+    else:
+        raise ValueError(f'Неизвестный режим LIBRARY_DOWNLOAD_OFFLOAD: {mode!r}')
+    return response
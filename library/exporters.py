@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import zlib
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Book
+
+# Поля выгрузки совпадают с полями импорта (library/importers.py), плюс id книги
+FIELDS = ['id', 'title', 'author', 'year', 'genre', 'category', 'publisher', 'book_type', 'book_file', 'cover_image']
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Размер порции, отдаваемой клиенту: строки копятся в буфере до этого размера
+BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(chunk_size=2000, using=DEFAULT_DB_ALIAS):
+    """
+    Все книги каталога словарями по FIELDS: один запрос с JOIN автора,
+    строки читаются курсором порциями по chunk_size, экземпляры моделей не создаются.
+    """
+    rows = (
+        Book.objects.using(using)
+        .order_by('id')
+        .values_list('id', 'title', 'author__name', 'year', 'genre', 'category',
+                     'publisher', 'book_type', 'book_file', 'cover_image')
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        row = dict(zip(FIELDS, row))
+        row['cover_image'] = row['cover_image'] or ''
+        yield row
+
+
+def render_ndjson(rows):
+    buffer = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def render_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= BUFFER_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def gzip_chunks(chunks, level=6):
+    # сжатие на лету: в памяти только текущая порция и состояние zlib
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_catalog(fmt, compress=False, chunk_size=2000, using=DEFAULT_DB_ALIAS):
+    # порции байтов выгрузки в формате fmt ('csv' или 'ndjson')
+    chunks = RENDERERS[fmt](export_rows(chunk_size=chunk_size, using=using))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,142 @@
+# Извлечение текста книг по страницам. Выполняется и в процессах пула
+# (manage.py backfill_content): модуль не импортирует Django
+import logging
+import posixpath
+import re
+import zipfile
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+
+# pypdf пишет в лог каждое отклонение от стандарта; ошибки чтения и так попадают в content_index
+logging.getLogger('pypdf').setLevel(logging.ERROR)
+
+# В EPUB нет печатных страниц: текст глав режется на «страницы» примерно такого размера
+EPUB_PAGE_CHARS = 2000
+
+_SPACES_RE = re.compile(r'[ \t\r\f\v\u00a0]+')
+_NEWLINES_RE = re.compile(r'\n{3,}')
+_CONTROL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# перенос слова по слогам в конце строки: "библио-\nтека"
+_HYPHENATION_RE = re.compile(r'(\w)-\n(\w)')
+
+_CONTAINER_NS = {'c': 'urn:oasis:names:tc:opendocument:xmlns:container'}
+_OPF_NS = {'opf': 'http://www.idpf.org/2007/opf'}
+_HTML_TYPES = {'application/xhtml+xml', 'text/html'}
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def clean(text):
+    text = _CONTROL_RE.sub('', text)
+    text = _HYPHENATION_RE.sub(r'\1\2', text)
+    lines = [_SPACES_RE.sub(' ', line).strip() for line in text.split('\n')]
+    return _NEWLINES_RE.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def extract_pages(path):
+    """
+    Текст книги постранично: список строк, номер страницы — индекс + 1.
+    Пустые страницы (иллюстрации, сканы без текстового слоя) остаются пустыми строками.
+    """
+    extension = posixpath.splitext(path)[1].lower()
+    if extension == '.pdf':
+        return pdf_pages(path)
+    if extension == '.epub':
+        return epub_pages(path)
+    raise ExtractionError(f'Неподдерживаемый формат: {extension or "без расширения"}')
+
+
+def pdf_pages(path):
+    try:
+        reader = PdfReader(path)
+        if reader.is_encrypted and not reader.decrypt(''):
+            raise ExtractionError('PDF защищён паролем')
+        return [clean(page.extract_text() or '') for page in reader.pages]
+    except (PyPdfError, ValueError, KeyError, TypeError) as exc:
+        raise ExtractionError(f'Не удалось прочитать PDF: {exc}') from exc
+
+
+def epub_pages(path):
+    try:
+        with zipfile.ZipFile(path) as archive:
+            pages = []
+            for name in epub_spine(archive):
+                pages.extend(split_pages(html_text(archive.read(name).decode('utf-8', 'replace'))))
+            return pages
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as exc:
+        raise ExtractionError(f'Не удалось прочитать EPUB: {exc}') from exc
+
+
+def epub_spine(archive):
+    # порядок чтения: META-INF/container.xml -> OPF -> spine
+    container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+    rootfile = container.find('.//c:rootfile', _CONTAINER_NS)
+    if rootfile is None:
+        raise ExtractionError('В EPUB нет описания пакета (OPF)')
+    opf_path = rootfile.get('full-path')
+    package = ElementTree.fromstring(archive.read(opf_path))
+    base = posixpath.dirname(opf_path)
+    manifest = {
+        item.get('id'): item for item in package.iterfind('opf:manifest/opf:item', _OPF_NS)
+    }
+    names = []
+    for itemref in package.iterfind('opf:spine/opf:itemref', _OPF_NS):
+        item = manifest.get(itemref.get('idref'))
+        if item is not None and item.get('media-type') in _HTML_TYPES:
+            names.append(posixpath.normpath(posixpath.join(base, item.get('href'))))
+    return names
+
+
+def split_pages(text, size=EPUB_PAGE_CHARS):
+    # по абзацам; абзац длиннее страницы не делится
+    pages, current, length = [], [], 0
+    for paragraph in text.split('\n\n'):
+        if current and length + len(paragraph) > size:
+            pages.append('\n\n'.join(current))
+            current, length = [], 0
+        current.append(paragraph)
+        length += len(paragraph) + 2
+    if current and any(current):
+        pages.append('\n\n'.join(current))
+    return pages
+
+
+def html_text(markup):
+    parser = _TextParser()
+    parser.feed(markup)
+    parser.close()
+    return clean(''.join(parser.parts))
+
+
+class _TextParser(HTMLParser):
+    BLOCK_TAGS = {
+        'p', 'div', 'br', 'li', 'tr', 'section', 'article', 'blockquote', 'pre',
+        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'title',
+    }
+    SKIP_TAGS = {'head', 'script', 'style'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n\n')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data.replace('\n', ' '))
@@ -0,0 +1,122 @@
+from collections import Counter, defaultdict
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Author, Book, FacetCount
+
+# Фасет -> поле Book
+FACETS = {
+    'genre': 'genre',
+    'category': 'category',
+    'book_type': 'book_type',
+    'year': 'year',
+    'author': 'author_id',
+}
+INTEGER_FACETS = {'year', 'author'}
+BATCH_SIZE = 200
+FIELDS = list(FACETS.values())
+
+
+def book_values(values):
+    # пары (фасет, значение) книги; values — экземпляр Book или словарь полей
+    get = values.get if isinstance(values, dict) else lambda field: getattr(values, field)
+    return [(facet, str(get(field))) for facet, field in FACETS.items()]
+
+
+def apply(deltas, using=DEFAULT_DB_ALIAS):
+    """
+    Применяет изменения счётчиков {(фасет, значение): ±n}: недостающие строки
+    создаются одним INSERT, затем по одному UPDATE на каждое различное n.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    counts = FacetCount.objects.using(using)
+    counts.bulk_create(
+        [FacetCount(facet=facet, value=value) for (facet, value), delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+    groups = defaultdict(list)
+    for (facet, value), delta in deltas.items():
+        groups[delta].append(Q(facet=facet, value=value))
+    for delta, conditions in groups.items():
+        # условия пачками — в пределах лимита параметров SQLite
+        for start in range(0, len(conditions), BATCH_SIZE):
+            condition = Q()
+            for item in conditions[start:start + BATCH_SIZE]:
+                condition |= item
+            counts.filter(condition).update(count=Greatest(F('count') + delta, 0))
+    if any(delta < 0 for delta in deltas.values()):
+        counts.filter(count=0).delete()
+
+
+def diff(old, new):
+    deltas = Counter(new)
+    deltas.subtract(Counter(old))
+    return deltas
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    # полный пересчёт: по одному GROUP BY на фасет
+    counts = FacetCount.objects.using(using)
+    counts.all().delete()
+    rows = []
+    books = Book.objects.using(using).order_by()
+    for facet, field in FACETS.items():
+        for value, count in books.values_list(field).annotate(count=Count('id')):
+            rows.append(FacetCount(facet=facet, value=str(value), count=count))
+    counts.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def stored_counts(limit, using=DEFAULT_DB_ALIAS):
+    # счётчики всего каталога из таблицы фасетов
+    counts = FacetCount.objects.using(using)
+    result = {}
+    for facet in FACETS:
+        rows = counts.filter(facet=facet).order_by('-count', 'value').values_list('value', 'count')
+        # у типа книги всего два значения: его строки заодно дают размер каталога
+        result[facet] = list(rows if facet == 'book_type' else rows[:limit])
+    total = sum(count for _, count in result['book_type'])
+    result['book_type'] = result['book_type'][:limit]
+    return total, result
+
+
+def narrowed_counts(queryset, limit):
+    # счётчики по найденным книгам: GROUP BY по отфильтрованному набору
+    queryset = queryset.order_by()
+    result = {}
+    for facet, field in FACETS.items():
+        rows = queryset.values_list(field).annotate(count=Count('id')).order_by('-count', field)
+        rows = [(str(value), count) for value, count in (rows if facet == 'book_type' else rows[:limit])]
+        result[facet] = rows
+    total = sum(count for _, count in result['book_type'])
+    result['book_type'] = result['book_type'][:limit]
+    return total, result
+
+
+def facet_counts(queryset=None, limit=20, using=DEFAULT_DB_ALIAS):
+    """
+    {'count': число книг, 'facets': {фасет: [{'value', 'count'}, ...]}}.
+    Без queryset — из таблицы счётчиков, иначе по набору книг queryset.
+    """
+    if queryset is None:
+        total, result = stored_counts(limit, using=using)
+    else:
+        total, result = narrowed_counts(queryset, limit)
+        using = queryset.db
+
+    facets = {}
+    for facet, rows in result.items():
+        facets[facet] = [
+            {'value': int(value) if facet in INTEGER_FACETS else value, 'count': count}
+            for value, count in rows
+        ]
+    names = dict(Author.objects.using(using).filter(
+        id__in=[item['value'] for item in facets['author']]
+    ).values_list('id', 'name'))
+    for item in facets['author']:
+        item['name'] = names.get(item['value'])
+    return {'count': total, 'facets': facets}
@@ -0,0 +1,92 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Book
+from .normalize import normalize
+
+
+def parse_int(name, value, minimum=None, maximum=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: ["Ожидается целое число."]})
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise ValidationError({name: [f"Допустимы значения от {minimum} до {maximum}."]})
+    return number
+
+
+MIN_YEAR, MAX_YEAR = 1000, 9999
+
+
+def parse_year(name, value):
+    return parse_int(name, value, MIN_YEAR, MAX_YEAR)
+
+
+def parse_book_type(name, value):
+    if value not in dict(Book.TYPE_CHOICES):
+        raise ValidationError({name: [f"Допустимые значения: {', '.join(dict(Book.TYPE_CHOICES))}."]})
+    return value
+
+
+def parse_author(name, value):
+    return parse_int(name, value, 1)
+
+
+def parse_text(name, value):
+    # сравнение с теневой колонкой *_norm: без учёта регистра и ё
+    return normalize(value)
+
+
+class BookFilter(BaseFilterBackend):
+    """
+    Точные и диапазонные фильтры книг. Каждому параметру соответствует индекс
+    (см. Book.Meta.indexes), так что фильтр — поиск по индексу, а не просмотр таблицы.
+    """
+    # параметр запроса -> (поиск ORM, разбор значения)
+    params = {
+        'year': ('year', parse_year),
+        'year__gte': ('year__gte', parse_year),
+        'year__lte': ('year__lte', parse_year),
+        'book_type': ('book_type', parse_book_type),
+        'genre': ('genre_norm', parse_text),
+        'category': ('category_norm', parse_text),
+        'publisher': ('publisher_norm', parse_text),
+        'author': ('author_id', parse_author),
+    }
+
+    def get_filters(self, request):
+        filters = {}
+        for param, (lookup, parse) in self.params.items():
+            value = request.query_params.get(param, '').strip()
+            if value:
+                filters[lookup] = parse(param, value)
+        # при одной границе SQLite предпочитает просмотреть индекс сортировки целиком;
+        # вторая граница из допустимого диапазона лет делает условие поиском по индексу года
+        if ('year__gte' in filters) != ('year__lte' in filters):
+            filters.setdefault('year__gte', MIN_YEAR)
+            filters.setdefault('year__lte', MAX_YEAR)
+        return filters
+
+    def filter_queryset(self, request, queryset, view):
+        filters = self.get_filters(request)
+        return queryset.filter(**filters) if filters else queryset
+
+
+class BookOrdering(BaseFilterBackend):
+    """
+    ?ordering=-popularity — самые читаемые книги. Popularity — готовая сумма за последние
+    дни (library/stats.py) с индексом (-popularity, id), сортировка не агрегирует статистику.
+    Такие выдачи листаются постранично (CatalogPagination).
+    """
+    param = 'ordering'
+    orderings = {
+        '-popularity': ['-popularity', 'id'],
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        value = request.query_params.get(self.param, '').strip()
+        if not value:
+            return queryset
+        if value not in self.orderings:
+            raise ValidationError({self.param: [f"Допустимые значения: {', '.join(self.orderings)}."]})
+        return queryset.order_by(*self.orderings[value])
@@ -0,0 +1,53 @@
+# Выполняется в процессах пула миниатюр: модуль не импортирует Django
+import os
+
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+
+def render(source_path, outputs):
+    """
+    Создаёт уменьшенные копии изображения.
+    outputs — {ширина: [(формат, путь), ...]}; меньшие копии делаются из больших,
+    изображение не увеличивается. Возвращает {ширина: (ширина, высота)}.
+    """
+    sizes = sorted(outputs, reverse=True)
+    with Image.open(source_path) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе, если это позволяет наибольший размер
+        image.draft('RGB', (sizes[0], sizes[0] * 4))
+        current = _flatten(ImageOps.exif_transpose(image))
+
+    result = {}
+    for width in sizes:
+        if current.width > width:
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt, path in outputs[width]:
+            _save(current, fmt, path)
+        result[width] = current.size
+    return result
+
+
+def _flatten(image):
+    # прозрачность заливается белым: JPEG её не поддерживает, а WebP и JPEG должны совпадать
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save(image, fmt, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        image.save(tmp_path, **SAVE_OPTIONS[fmt])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import os
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from rest_framework import serializers
+
+from . import changes, normalize
+from .models import Author, Book
+from .serializers import validate_book_file_name
+from .signals import books_bulk_created
+
+FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+def detect_format(filename, default=None):
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower(), default)
+
+
+def read_rows(stream, fmt):
+    """
+    Построчно читает бинарный поток CSV или NDJSON.
+    Выдаёт (номер строки, словарь или None, ошибка или None).
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'ndjson':
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_num, None, f"Некорректный JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, "Ожидался JSON-объект."
+                continue
+            yield line_num, row, None
+    else:
+        raise ValueError(f"Неподдерживаемый формат: {fmt}")
+
+
+class BookImportRowSerializer(serializers.Serializer):
+    # Автор задаётся именем; файл книги — путём в хранилище (например, books/prince.pdf)
+    title = serializers.CharField(max_length=100)
+    author = serializers.CharField(max_length=200)
+    year = serializers.IntegerField()
+    genre = serializers.CharField(max_length=100)
+    category = serializers.CharField(max_length=100)
+    publisher = serializers.CharField(max_length=100)
+    book_type = serializers.ChoiceField(choices=Book.TYPE_CHOICES, default='fiction')
+    book_file = serializers.CharField(max_length=100)
+    cover_image = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate_year(self, value):
+        if not (1000 <= value <= 9999):
+            raise serializers.ValidationError("Год должен быть в диапазоне от 1000 до 9999.")
+        return value
+
+    def validate_book_file(self, value):
+        validate_book_file_name(value)
+        return value
+
+
+class BookImporter:
+    """
+    Потоковый импорт книг пачками: авторы находятся или создаются одним-двумя
+    запросами на пачку, уникальность (название, автор, год, издательство)
+    проверяется одним запросом, книги вставляются bulk_create в транзакции пачки.
+    Память ограничена размером пачки и числом сохраняемых ошибок.
+    """
+
+    def __init__(self, batch_size=500, max_errors=1000, using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.using = using
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        # один экземпляр на весь импорт: создание сериализатора на каждую строку копирует все поля
+        self.row_serializer = BookImportRowSerializer()
+
+    def run(self, rows):
+        batch = []
+        for line_num, data, error in rows:
+            if error:
+                self.add_error(line_num, {'non_field_errors': [error]})
+                continue
+            batch.append((line_num, data))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def add_error(self, line_num, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': line_num, 'errors': errors})
+
+    def import_batch(self, batch):
+        valid = []
+        for line_num, data in batch:
+            try:
+                valid.append((line_num, self.row_serializer.run_validation(data)))
+            except serializers.ValidationError as exc:
+                self.add_error(line_num, serializers.as_serializer_error(exc))
+        if not valid:
+            return
+
+        pending = []
+        try:
+            with transaction.atomic(using=self.using):
+                pending = self.build_books(valid)
+                books = changes.stamp([book for _, book in pending], using=self.using)
+                Book.objects.using(self.using).bulk_create(books)
+                books_bulk_created.send(sender=Book, books=books, using=self.using)
+        except IntegrityError as exc:
+            # запись, вставленная параллельно, нарушила уникальность — пачка откатывается целиком
+            for line_num, _ in pending:
+                self.add_error(line_num, {'non_field_errors': [f"Ошибка целостности: {exc}"]})
+            return
+        self.created += len(pending)
+
+    def build_books(self, valid):
+        authors = self.resolve_authors({data['author'] for _, data in valid})
+
+        keys = {
+            (data['title'], authors[data['author']], data['year'], data['publisher'])
+            for _, data in valid
+        }
+        # один запрос на пачку; IN по каждой колонке даёт надмножество, точное сравнение — по кортежам
+        existing = set(
+            Book.objects.using(self.using).filter(
+                title__in={key[0] for key in keys},
+                author_id__in={key[1] for key in keys},
+                year__in={key[2] for key in keys},
+                publisher__in={key[3] for key in keys},
+            ).values_list('title', 'author_id', 'year', 'publisher')
+        )
+
+        pending = []
+        for line_num, data in valid:
+            key = (data['title'], authors[data['author']], data['year'], data['publisher'])
+            if key in existing:
+                self.add_error(line_num, {'non_field_errors': [
+                    f"Запись с таким сочетанием «{data['title']}», автор «{data['author']}», "
+                    f"год «{data['year']}», издательство «{data['publisher']}» уже существует."
+                ]})
+                continue
+            existing.add(key)
+            pending.append((line_num, normalize.fill(Book(
+                title=data['title'],
+                author_id=key[1],
+                year=data['year'],
+                genre=data['genre'],
+                category=data['category'],
+                publisher=data['publisher'],
+                book_type=data['book_type'],
+                book_file=data['book_file'],
+                cover_image=data.get('cover_image') or None,
+            ))))
+        return pending
+
+    def resolve_authors(self, names):
+        authors = Author.objects.using(self.using)
+        found = dict(authors.filter(name__in=names).values_list('name', 'id'))
+        missing = names - found.keys()
+        if missing:
+            new_authors = changes.stamp([normalize.fill(Author(name=name)) for name in missing], using=self.using)
+            authors.bulk_create(new_authors, ignore_conflicts=True)
+            found.update(authors.filter(name__in=missing).values_list('name', 'id'))
+        return found
@@ -0,0 +1,186 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, close_old_connections, connections, transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: имя -> (функция, максимум попыток)
+registry = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name, max_attempts=5):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы передаются именованными
+    и должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        registry[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, args=None, key='', delay=0, using=DEFAULT_DB_ALIAS):
+    """
+    Ставит задание в очередь. Если незавершённое задание с тем же ключом уже есть,
+    возвращается оно. При LIBRARY_JOBS_EAGER задание сразу выполняется в текущем процессе.
+    """
+    if name not in registry:
+        raise UnknownTask(name)
+    jobs = Job.objects.using(using)
+    if key:
+        existing = jobs.filter(key=key, status__in=['queued', 'running']).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic(using=using):
+            job = jobs.create(
+                name=name,
+                args=args or {},
+                key=key,
+                max_attempts=registry[name][1],
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # такое же задание создано параллельно
+        existing = jobs.filter(key=key, status__in=['queued', 'running']).first()
+        if existing is None:
+            raise
+        return existing
+    if settings.LIBRARY_JOBS_EAGER:
+        claimed = claim(f'eager-{os.getpid()}', limit=1, using=using, ids=[job.pk])
+        if claimed:
+            run(claimed[0], using=using)
+            job.refresh_from_db()
+    return job
+
+
+def enqueue_on_commit(name, args=None, key='', using=DEFAULT_DB_ALIAS):
+    # задание появляется только если транзакция, изменившая данные, зафиксирована
+    transaction.on_commit(lambda: enqueue(name, args=args, key=key, using=using), using=using)
+
+
+def backoff(attempts):
+    # экспоненциальная задержка со случайным разбросом, чтобы повторы не совпадали
+    delay = min(settings.LIBRARY_JOB_RETRY_BASE * 2 ** (attempts - 1), settings.LIBRARY_JOB_RETRY_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(worker, limit=1, using=DEFAULT_DB_ALIAS, ids=None):
+    """
+    Забирает до limit готовых заданий одним UPDATE ... WHERE id IN (SELECT ... LIMIT).
+    Условие на статус не даёт выдать задание двум обработчикам, а единственный
+    оператор не требует SELECT ... FOR UPDATE и не держит транзакцию SQLite между запросами.
+    """
+    now = timezone.now()
+    jobs = Job.objects.using(using)
+    # задания обработчиков, которые упали, не завершив работу. Попытка уже
+    # засчитана при захвате, поэтому задание, роняющее обработчик, не крутится вечно
+    stale = jobs.filter(status='running', locked_at__lt=now - timedelta(seconds=settings.LIBRARY_JOB_TIMEOUT))
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=now,
+        last_error="Обработчик не завершил задание за LIBRARY_JOB_TIMEOUT.",
+    )
+    stale.update(status='queued', locked_by='', locked_at=None)
+
+    due = jobs.filter(status='queued', run_after__lte=now)
+    if ids is not None:
+        due = due.filter(pk__in=ids)
+    due = due.order_by('run_after', 'id').values('pk')[:limit]
+    claimed = jobs.filter(pk__in=due, status='queued').update(
+        status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return []
+    return list(jobs.filter(status='running', locked_by=worker, locked_at=now).order_by('run_after', 'id'))
+
+
+def run(job, using=DEFAULT_DB_ALIAS):
+    # job.attempts уже увеличен при захвате (claim)
+    func, _ = registry.get(job.name, (None, None))
+    try:
+        if func is None:
+            raise UnknownTask(job.name)
+        func(**job.args)
+    except Exception as exc:
+        job.last_error = ''.join(traceback.format_exception(exc))[-5000:]
+        if isinstance(exc, UnknownTask) or job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error('Задание %s #%s завершилось ошибкой: %s', job.name, job.pk, exc)
+        else:
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning('Задание %s #%s: попытка %s не удалась: %s', job.name, job.pk, job.attempts, exc)
+    else:
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(using=using, update_fields=[
+        'status', 'attempts', 'run_after', 'locked_by', 'locked_at', 'last_error', 'finished_at'
+    ])
+    return job
+
+
+def retry(job, using=DEFAULT_DB_ALIAS):
+    # повтор завершившегося ошибкой задания с новым счётчиком попыток
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_after = timezone.now()
+    job.finished_at = None
+    job.save(using=using, update_fields=['status', 'attempts', 'run_after', 'finished_at'])
+    return job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def work(stop, poll_interval=1.0, once=False, using=DEFAULT_DB_ALIAS):
+    """
+    Цикл одного обработчика: забирает задания по одному и выполняет их.
+    Завершается по событию stop, а при once — когда готовых заданий не осталось.
+    Возвращает число выполненных заданий.
+    """
+    name = worker_name()
+    processed = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                jobs = claim(name, using=using)
+                for job in jobs:
+                    run(job, using=using)
+                    processed += 1
+            except DatabaseError as exc:
+                # например, SQLite занята другим процессом; незавершённое задание
+                # вернётся в очередь по LIBRARY_JOB_TIMEOUT
+                logger.warning('Ошибка базы данных в обработчике заданий: %s', exc)
+                connections[using].close()
+                stop.wait(poll_interval)
+                continue
+            if not jobs:
+                if once:
+                    break
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+    return processed
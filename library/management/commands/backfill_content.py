@@ -0,0 +1,104 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from library import content, extraction
+from library.models import Book
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Извлекает текст файлов книг (media/books/) в индекс поиска по содержимому '
+        'для книг, у которых его нет или файл сменился.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Число процессов (по умолчанию LIBRARY_CONTENT_WORKERS, 0 — без пула)')
+        parser.add_argument('--force', action='store_true', help='Извлечь текст заново даже для проиндексированных книг')
+        parser.add_argument('--enqueue', action='store_true', help='Поставить задания в очередь run_workers вместо обработки здесь')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        self.using = options['database']
+        self.done = self.failed = self.pages = 0
+        workers = settings.LIBRARY_CONTENT_WORKERS if options['workers'] is None else options['workers']
+        books = (
+            Book.objects.using(self.using)
+            .exclude(book_file='')
+            .only('id', 'book_file', 'content_index')
+            .order_by('id')
+        )
+        books = (book for book in books.iterator() if options['force'] or not content.is_indexed(book))
+
+        if options['enqueue']:
+            # задания ставятся сразу: вне транзакции enqueue_on_commit выполняется немедленно
+            queued = 0
+            for book in books:
+                content.enqueue([book], using=self.using)
+                queued += 1
+            self.stdout.write(self.style.SUCCESS(f'Поставлено в очередь: {queued}'))
+            return
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+        pending = {}
+        try:
+            for book in books:
+                path = default_storage.path(book.book_file.name)
+                if pool is None:
+                    self.extract(book, path)
+                    continue
+                # в очереди не больше нескольких файлов на процесс — память не растёт с каталогом
+                if len(pending) >= workers * 4:
+                    self.collect(pending, wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[pool.submit(extraction.extract_pages, path)] = book
+            self.collect(pending, wait(pending).done)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано книг: {self.done}, изменено страниц: {self.pages}, ошибок: {self.failed}'
+        ))
+
+    def extract(self, book, path):
+        try:
+            pages = extraction.extract_pages(path)
+        except Exception as exc:
+            self.fail(book, exc)
+            return
+        self.finish(book, pages)
+
+    def collect(self, pending, done):
+        for future in done:
+            book = pending.pop(future)
+            try:
+                pages = future.result()
+            except Exception as exc:
+                self.fail(book, exc)
+                continue
+            self.finish(book, pages)
+
+    def finish(self, book, pages):
+        self.pages += content.record(book.pk, book.book_file.name, pages, using=self.using) or 0
+        self.done += 1
+
+    def fail(self, book, exc):
+        # ошибка одной книги не прерывает обход каталога
+        self.failed += 1
+        self.stderr.write(f'Книга {book.pk}, файл {book.book_file.name}: {exc}')
+        if isinstance(exc, (OSError, BrokenExecutor)):
+            # файл недоступен или упал процесс пула — при следующем запуске книга обработается снова
+            return
+        if isinstance(exc, extraction.ExtractionError):
+            # как в задании content.index: повреждённый файл больше не обрабатывается
+            error = str(exc)
+        else:
+            logger.error('Извлечение текста книги %s завершилось ошибкой', book.pk, exc_info=exc)
+            error = f'{type(exc).__name__}: {exc}'
+        content.record(book.pk, book.book_file.name, error=error, using=self.using)
@@ -0,0 +1,84 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from library import imaging, thumbnails
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры обложек для книг, у которых их нет или обложка сменилась.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Число процессов (по умолчанию LIBRARY_THUMBNAIL_WORKERS, 0 — без пула)')
+        parser.add_argument('--force', action='store_true', help='Пересоздать миниатюры даже для актуальных обложек')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        self.using = options['database']
+        self.done = self.failed = 0
+        workers = settings.LIBRARY_THUMBNAIL_WORKERS if options['workers'] is None else options['workers']
+        books = (
+            Book.objects.using(self.using)
+            .exclude(cover_image='').exclude(cover_image=None)
+            .only('id', 'cover_image', 'cover_renditions')
+        )
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+        pending = {}
+        try:
+            for book in books.iterator():
+                if not options['force'] and thumbnails.renditions_are_current(book):
+                    continue
+                try:
+                    digest, outputs, files = thumbnails.plan(book.cover_image.name, force=options['force'])
+                except OSError as exc:
+                    self.fail(book, exc)
+                    continue
+                task = (book, digest, files)
+                if not outputs:
+                    self.finish(task)
+                elif pool is None:
+                    self.render(task, outputs)
+                else:
+                    # в очереди не больше нескольких заданий на процесс — память не растёт с каталогом
+                    if len(pending) >= workers * 4:
+                        self.collect(pending, wait(pending, return_when=FIRST_COMPLETED).done)
+                    path = default_storage.path(book.cover_image.name)
+                    pending[pool.submit(imaging.render, path, outputs)] = task
+            self.collect(pending, wait(pending).done)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано обложек: {self.done}, ошибок: {self.failed}'))
+
+    def render(self, task, outputs):
+        try:
+            imaging.render(default_storage.path(task[0].cover_image.name), outputs)
+        except (OSError, ValueError) as exc:
+            self.fail(task[0], exc)
+            return
+        self.finish(task)
+
+    def collect(self, pending, done):
+        for future in done:
+            task = pending.pop(future)
+            try:
+                future.result()
+            except (OSError, ValueError) as exc:
+                self.fail(task[0], exc)
+                continue
+            self.finish(task)
+
+    def finish(self, task):
+        book, digest, files = task
+        thumbnails.record(book.pk, book.cover_image.name, digest, files, using=self.using)
+        self.done += 1
+
+    def fail(self, book, exc):
+        self.failed += 1
+        self.stderr.write(f'Книга {book.pk}, обложка {book.cover_image.name}: {exc}')
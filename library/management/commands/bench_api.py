@@ -0,0 +1,208 @@
+import copy
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from library import bench, routers
+from library.management.commands.stress_db import connect
+from library.models import Author, Book
+
+SEARCH_TERMS = ['тайна', 'история сада', 'основы физики', 'Эксмо', 'Иванов', 'моря']
+# Медленнее базы на долю --tolerance плюс эта величина (мс) — регресс; ниже — шум
+NOISE_MS = 0.5
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер API через тестовый клиент: список, поиск и карточка книги, список авторов, создание книги. '
+        'Результат — JSON с p50/p95/p99, запросами в секунду и числом SQL; --baseline сравнивает '
+        'с сохранённым результатом и завершается ошибкой при регрессе. Замер идёт на временной БД '
+        '(при --books 0 — на копии текущей) вне транзакции, как на сервере: с кэшем ответов и '
+        'чтением через алиас для чтения; рабочая БД не блокируется и не меняется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--books', type=int, default=5000,
+                            help='Сколько синтетических книг добавить (0 — замер на копии текущего каталога)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на каждый сценарий')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=self.scenario_names(),
+                            help='Сценарий (можно несколько; по умолчанию все)')
+        parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+        parser.add_argument('--save-baseline', help='Сохранить результат в файл')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление p50/p95, доля')
+
+    @staticmethod
+    def scenario_names():
+        return ['book_list', 'book_search', 'book_retrieve', 'author_list', 'book_create']
+
+    def handle(self, *args, **options):
+        # загружаемые файлы — во временный каталог, кэш ответов — свой, не общий с сервером
+        private_caches = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-api-{alias}'}
+            for alias in settings.CACHES
+        }
+        with tempfile.TemporaryDirectory() as directory, bench.temporary_media():
+            path = os.path.join(directory, 'bench.sqlite3')
+            with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=private_caches), \
+                    throwaway_database(path, copy_catalog=not options['books']):
+                if options['books']:
+                    bench.seed_catalog(options['authors'], options['books'], seed=options['seed'])
+                result = self.run(options)
+
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        self.stdout.write(output)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline.get('catalog') != result['catalog']:
+                self.stderr.write(f'Каталог отличается от базового: {baseline.get("catalog")} и {result["catalog"]}')
+            problems = list(regressions(result, baseline, options['tolerance']))
+            if problems:
+                raise CommandError('Регресс относительно базы:\n' + '\n'.join(problems))
+            self.stderr.write(self.style.SUCCESS('Регресса нет'))
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        self.client = APIClient()
+        admin = User.objects.create_superuser(username='bench-api-admin', password='bench')
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(admin)
+        book_ids = list(Book.objects.order_by('id').values_list('id', flat=True))
+        author_ids = list(Author.objects.order_by('id').values_list('id', flat=True))
+        if not book_ids:
+            raise CommandError('Каталог пуст: задайте --books или заполните его командой seed_catalog.')
+        rng.shuffle(book_ids)
+        upload = bench.build_epub('Бенчмарк', [bench.sentence(rng) for _ in range(5)])
+
+        requests = {
+            'book_list': lambda i: self.client.get('/api/books/'),
+            'book_search': lambda i: self.client.get('/api/books/', {'search': SEARCH_TERMS[i % len(SEARCH_TERMS)]}),
+            'book_retrieve': lambda i: self.client.get(f'/api/books/{book_ids[i % len(book_ids)]}/'),
+            'author_list': lambda i: self.client.get('/api/authors/'),
+            'book_create': lambda i: self.admin_client.post('/api/books/', {
+                'title': f'{bench.book_title(rng)} (выпуск {i})',
+                'author': rng.choice(author_ids),
+                'year': rng.randint(1850, 2025),
+                'genre': rng.choice(bench.GENRES),
+                'category': rng.choice(bench.CATEGORIES),
+                'publisher': rng.choice(bench.PUBLISHERS),
+                'book_file': SimpleUploadedFile('bench.epub', upload, content_type='application/epub+zip'),
+            }, format='multipart'),
+        }
+        counter = QueryCounter()
+        scenarios = {}
+        with counter.installed():
+            for name in options['scenarios'] or self.scenario_names():
+                scenarios[name] = self.measure(name, requests[name], options, counter)
+        return {
+            'catalog': {'authors': len(author_ids), 'books': len(book_ids)},
+            'requests': options['requests'],
+            'scenarios': scenarios,
+        }
+
+    def measure(self, name, send, options, counter):
+        for i in range(options['warmup']):
+            self.check_response(name, send(-1 - i))
+        timings, queries = [], []
+        for i in range(options['requests']):
+            before = counter.count
+            started = time.perf_counter()
+            response = send(i)
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count - before)
+            self.check_response(name, response)
+        stats = bench.summarize(timings)
+        return {
+            'p50': round(stats['p50'], 3),
+            'p95': round(stats['p95'], 3),
+            'p99': round(stats['p99'], 3),
+            'mean': round(stats['mean'], 3),
+            'rps': round(1000 * len(timings) / sum(timings), 1),
+            'queries': max(queries),
+        }
+
+    def check_response(self, name, response):
+        if response.status_code >= 400:
+            raise CommandError(f'{name}: ответ {response.status_code}: {response.content[:500]!r}')
+
+
+@contextmanager
+def throwaway_database(path, copy_catalog=False):
+    """
+    На время замера соединения default и алиаса для чтения указывают на файл path:
+    пустую БД или копию текущей (copy_catalog), к которой применяются миграции.
+    Рабочая БД не меняется, и её блокировка записи не удерживается.
+    """
+    if copy_catalog:
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
+
+    aliases = [DEFAULT_DB_ALIAS] + [alias for alias in [routers.read_alias()] if alias]
+    originals = {alias: connections[alias] for alias in aliases}
+    for alias in aliases:
+        db = copy.deepcopy(settings.DATABASES[alias])
+        db.update(NAME=path, TEST={}, CONN_MAX_AGE=0)
+        connect(db, alias)
+    try:
+        call_command('migrate', database=DEFAULT_DB_ALIAS, interactive=False, verbosity=0)
+        yield
+    finally:
+        for alias, connection in originals.items():
+            connections[alias].close()
+            connections[alias] = connection
+        # типы содержимого кэшируются по алиасу: их id во временной БД другие
+        ContentType.objects.clear_cache()
+
+
+class QueryCounter:
+    # SQL-запросы всех соединений, без сохранения текста, как у CaptureQueriesContext
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def installed(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+def regressions(result, baseline, tolerance):
+    for name, current in result['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        for key in ('p50', 'p95'):
+            limit = base[key] * (1 + tolerance) + NOISE_MS
+            if current[key] > limit:
+                yield f'{name}: {key} {current[key]:.2f} мс, допустимо до {limit:.2f} мс (база {base[key]:.2f} мс)'
+        if current['queries'] > base['queries']:
+            yield f'{name}: SQL-запросов {current["queries"]}, в базе {base["queries"]}'
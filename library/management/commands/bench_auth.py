@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from library import bench
+from library.authentication import CachedTokenAuthentication, token_cache
+from library.views import JobViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает TokenAuthentication и CachedTokenAuthentication: время аутентификации '
+        'и запроса к /api/jobs/ с токеном администратора. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Запросов на каждый вариант')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_superuser(username='bench-auth-admin', password='bench')
+            token, _ = Token.objects.get_or_create(user=user)
+            self.run(token.key, options['requests'])
+            transaction.set_rollback(True)
+
+    def run(self, key, count):
+        factory = APIRequestFactory()
+        self.stdout.write(
+            f'{"вариант":<28} {"запросов/с":>11} {"p50":>9} {"p95":>9} {"SQL на запрос":>14}'
+        )
+        for label, auth_class in [('TokenAuthentication', TokenAuthentication),
+                                  ('CachedTokenAuthentication', CachedTokenAuthentication)]:
+            token_cache.clear()
+            view = JobViewSet.as_view({'get': 'list'}, authentication_classes=[auth_class])
+
+            def call():
+                request = factory.get('/api/jobs/', SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Token {key}')
+                response = view(request)
+                assert response.status_code == 200, response.status_code
+
+            call()  # прогрев
+            with CaptureQueriesContext(connection) as queries:
+                call()
+            stats = bench.measure(call, count)
+            self.stdout.write(
+                f'{label:<28} {1000 / stats["mean"]:>11.0f} {stats["p50"]:>8.3f}ms '
+                f'{stats["p95"]:>8.3f}ms {len(queries):>14}'
+            )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+
+from library import bench, search
+from library.models import Book
+from library.views import BookViewSet
+
+DEFAULT_TERMS = ['капитан', 'тайна сад', 'Эксмо', 'учебное', 'Иванов']
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск SearchFilter (LIKE) с полнотекстовым индексом FTS5. '
+        'Синтетические книги создаются внутри транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=500)
+        parser.add_argument('--books', type=int, default=20000, help='Сколько синтетических книг добавить')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--term', action='append', dest='terms', help='Поисковый запрос (можно несколько)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['books']:
+                # индекс FTS5 обновляется вместе с добавлением книг
+                bench.seed_catalog(options['authors'], options['books'])
+            self.run(options['terms'] or DEFAULT_TERMS, options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, terms, repeat):
+        like = SearchFilter()
+        queryset = Book.objects.select_related('author')
+        self.stdout.write(f'Книг в каталоге: {queryset.count()}')
+        self.stdout.write(f'{"запрос":<20} {"LIKE p50":>10} {"FTS p50":>10} {"LIKE p95":>10} {"FTS p95":>10} {"найдено":>9}')
+        for term in terms:
+            words = term.split()
+            like_qs = like.filter_queryset(_SearchRequest(term), queryset, BookViewSet)
+            fts_qs = search.search_books(queryset, words)
+            like_stats = bench.measure(lambda: (like_qs.count(), list(like_qs[:20])), repeat)
+            fts_stats = bench.measure(lambda: (fts_qs.count(), list(fts_qs[:20])), repeat)
+            self.stdout.write(
+                f'{term:<20} {like_stats["p50"]:>9.2f}ms {fts_stats["p50"]:>9.2f}ms '
+                f'{like_stats["p95"]:>9.2f}ms {fts_stats["p95"]:>9.2f}ms {fts_qs.count():>9}'
+            )
+
+
+class _SearchRequest:
+    # Минимальная замена запроса DRF для SearchFilter
+    def __init__(self, term):
+        self.query_params = {SearchFilter.search_param: term}
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from library import bench
+from library.models import Book
+from library.rows import BookRows
+from library.serializers import BookSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает BookSerializer с быстрым чтением из values() (library/rows.py) '
+        'на странице книг. Синтетические книги создаются внутри транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--books', type=int, default=2000, help='Сколько синтетических книг добавить')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    # ссылки на файлы строятся от хоста запроса; синтетический запрос идёт на localhost
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def handle(self, *args, **options):
+        # у книг есть файлы: ссылки на них входят в замер представления
+        with bench.temporary_media(), transaction.atomic():
+            if options['books']:
+                bench.seed_catalog(options['authors'], options['books'], files=1)
+            self.run(options['page_size'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, page_size, repeat):
+        request = Request(APIRequestFactory().get('/api/books/', SERVER_NAME='localhost'))
+        queryset = Book.objects.select_related('author').order_by('title', 'year', 'id')
+        renderer = JSONRenderer()
+
+        def serializer_page(books):
+            return BookSerializer(books, many=True, context={'request': request}).data
+
+        def rows_page(rows):
+            book_rows = BookRows(request)
+            return [book_rows.represent(row) for row in rows]
+
+        book_rows = BookRows(request)
+        books = list(queryset[:page_size])
+        rows = list(book_rows.values(queryset)[:page_size])
+        if renderer.render(serializer_page(books)) != renderer.render(rows_page(rows)):
+            self.stderr.write(self.style.ERROR('Ответы различаются!'))
+
+        cases = [
+            ('только представление', lambda: serializer_page(books), lambda: rows_page(rows)),
+            ('запрос + представление',
+             lambda: serializer_page(list(queryset[:page_size])),
+             lambda: rows_page(list(book_rows.values(queryset)[:page_size]))),
+            ('запрос + JSON',
+             lambda: renderer.render(serializer_page(list(queryset[:page_size]))),
+             lambda: renderer.render(rows_page(list(book_rows.values(queryset)[:page_size])))),
+        ]
+        self.stdout.write(f'Книг на странице: {page_size}')
+        self.stdout.write(f'{"замер":<24} {"DRF p50":>10} {"rows p50":>10} {"DRF p95":>10} {"rows p95":>10} {"ускорение":>10}')
+        for name, slow, fast in cases:
+            slow_stats = bench.measure(slow, repeat)
+            fast_stats = bench.measure(fast, repeat)
+            self.stdout.write(
+                f'{name:<24} {slow_stats["p50"]:>9.3f}ms {fast_stats["p50"]:>9.3f}ms '
+                f'{slow_stats["p95"]:>9.3f}ms {fast_stats["p95"]:>9.3f}ms '
+                f'{slow_stats["p50"] / fast_stats["p50"]:>9.1f}x'
+            )
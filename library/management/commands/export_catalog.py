@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from library.exporters import RENDERERS, export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Выгружает каталог книг в CSV или NDJSON (в формате import_books) потоком, без загрузки в память.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(RENDERERS), default='ndjson')
+        parser.add_argument('--output', '-o', help='Путь к файлу; по умолчанию — стандартный вывод')
+        parser.add_argument('--gzip', action='store_true', help='Сжать выгрузку gzip')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Строк на одно чтение из БД')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        chunks = export_catalog(
+            options['format'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+            using=options['database'],
+        )
+        try:
+            if options['output']:
+                with open(options['output'], 'wb') as out:
+                    written = self.write(chunks, out)
+            else:
+                written = self.write(chunks, sys.stdout.buffer)
+        except OSError as exc:
+            raise CommandError(exc)
+        self.stderr.write(self.style.SUCCESS(f'Выгружено байт: {written}'))
+
+    def write(self, chunks, out):
+        written = 0
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+        out.flush()
+        return written
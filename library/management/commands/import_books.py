@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from library.importers import BookImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Импортирует книги из CSV или NDJSON (поля: title, author, year, genre, category, publisher, book_type, book_file, cover_image).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='По умолчанию определяется по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-errors', type=int, default=1000, help='Сколько ошибок сохранять в отчёте')
+        parser.add_argument('--report', help='Путь для отчёта об ошибках в формате JSON')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if not fmt:
+            raise CommandError('Не удалось определить формат файла, укажите --format.')
+
+        importer = BookImporter(
+            batch_size=options['batch_size'],
+            max_errors=options['max_errors'],
+            using=options['database'],
+        )
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = importer.run(read_rows(stream, fmt))
+        except OSError as exc:
+            raise CommandError(exc)
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as out:
+                json.dump(report, out, ensure_ascii=False, indent=2)
+        for error in report['errors'][:20]:
+            self.stderr.write(f"строка {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано книг: {report['created']}, ошибок: {report['failed']}"
+        ))
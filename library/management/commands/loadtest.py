@@ -0,0 +1,134 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library import bench
+
+DEFAULT_PATHS = ['/api/books/', '/api/async/books/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест уже запущенного сервера: N соединений с keep-alive в течение '
+        'заданного времени на каждый путь. Для сравнения WSGI и ASGI запустите, например, '
+        '"gunicorn -w 1 --threads 8 ebook_library.wsgi" и "uvicorn --workers 1 ebook_library.asgi:application" '
+        'и прогоните команду против обоих; --read-delay имитирует медленных мобильных клиентов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help=f'Пути или URL (по умолчанию: {" ".join(DEFAULT_PATHS)})')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=50, help='Одновременных соединений')
+        parser.add_argument('--duration', type=float, default=10.0, help='Секунд на каждый путь')
+        parser.add_argument('--read-delay', type=float, default=0.0,
+                            help='Пауза клиента (с) на каждые 16 КиБ ответа — медленная сеть')
+        parser.add_argument('--header', action='append', default=[], help='Дополнительный заголовок "Имя: значение"')
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['base_url'])
+        if base.scheme != 'http' or not base.hostname:
+            raise CommandError('Поддерживается только http://хост[:порт].')
+        headers = []
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f'Неверный заголовок: {header}')
+            headers.append((name.strip(), value.strip()))
+
+        self.stdout.write(
+            f'{options["base_url"]}: соединений {options["concurrency"]}, {options["duration"]:g} с на путь'
+        )
+        self.stdout.write(f'{"путь":<32} {"запросов":>9} {"ошибок":>7} {"req/s":>9} {"p50":>10} {"p95":>10}')
+        for path in options['paths'] or DEFAULT_PATHS:
+            result = asyncio.run(run_load(
+                base.hostname, base.port or 80, urlsplit(path)._replace(scheme='', netloc='').geturl() or '/',
+                headers, options['concurrency'], options['duration'], options['read_delay'],
+            ))
+            self.stdout.write(
+                f'{path:<32} {result["requests"]:>9} {result["errors"]:>7} {result["rps"]:>9.1f} '
+                f'{result["p50"]:>8.1f}ms {result["p95"]:>8.1f}ms'
+            )
+
+
+async def run_load(host, port, path, headers, concurrency, duration, read_delay):
+    request = build_request(host, port, path, headers)
+    timings, errors = [], [0]
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                status, keep_alive = await read_response(reader, read_delay)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors[0] += 1
+                status, keep_alive = None, False
+            else:
+                if status < 400:
+                    timings.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors[0] += 1
+            if not keep_alive and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(timings),
+        'errors': errors[0],
+        'rps': len(timings) / elapsed,
+        'p50': bench.percentile(timings, 50),
+        'p95': bench.percentile(timings, 95),
+    }
+
+
+def build_request(host, port, path, headers):
+    lines = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}', 'Accept: application/json', 'Connection: keep-alive']
+    lines += [f'{name}: {value}' for name, value in headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def read_response(reader, read_delay=0.0):
+    # Минимальный разбор ответа HTTP/1.1: Content-Length или chunked
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    status = int(status_line.split()[1])
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        if name:
+            headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await read_body(reader, size + 2, read_delay)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await read_body(reader, int(headers['content-length']), read_delay)
+    elif status not in (204, 304):
+        # тело до закрытия соединения
+        while await reader.read(16 * 1024):
+            if read_delay:
+                await asyncio.sleep(read_delay)
+        return status, False
+    return status, headers.get('connection') != 'close'
+
+
+async def read_body(reader, size, read_delay):
+    while size > 0:
+        chunk = await reader.readexactly(min(size, 16 * 1024))
+        size -= len(chunk)
+        if read_delay:
+            await asyncio.sleep(read_delay)
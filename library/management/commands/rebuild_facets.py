@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from library import cache, facets
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу счётчиков фасетов книг.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            total = facets.rebuild(using=using)
+            cache.bump_catalog_version(using=using)
+        self.stdout.write(self.style.SUCCESS(f'Значений фасетов: {total}'))
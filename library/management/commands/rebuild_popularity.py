@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from library import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярность книг по дневной статистике за LIBRARY_POPULARITY_DAYS дней '
+        '(то же делает ежедневное задание stats.rollup).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        updated = stats.rollup(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Обновлено книг: {updated}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from library import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовые индексы книг и авторов (FTS5).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            total = search.rebuild_index(using=using)
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано книг: {total}'))
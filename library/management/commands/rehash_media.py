@@ -0,0 +1,63 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from library import blobs, changes, content, thumbnails
+from library.models import Book
+from library.storage import hashed_digest
+
+
+class Command(BaseCommand):
+    help = 'Переносит файлы книг и обложек со старыми именами в адресное хранилище (по SHA-256).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--keep-old', action='store_true', help='Не удалять файлы со старыми именами')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not hasattr(default_storage, 'store_hashed'):
+            raise CommandError('Хранилище по умолчанию не адресное (см. STORAGES).')
+
+        renamed = {}
+        moved = missing = 0
+        books = Book.objects.using(using).only('id', *blobs.FILE_FIELDS)
+        for book in books.iterator():
+            names = {}
+            for field in blobs.FILE_FIELDS:
+                name = getattr(book, field).name
+                if not name or hashed_digest(name):
+                    continue
+                if name not in renamed:
+                    if not default_storage.exists(name):
+                        missing += 1
+                        self.stderr.write(f'Файл не найден: {name} (книга {book.pk})')
+                        continue
+                    with default_storage.open(name, 'rb') as f:
+                        renamed[name] = default_storage.save(name, f)
+                names[field] = renamed[name]
+            if names:
+                # update() без сигналов: ссылки, номер изменения (он же версия кэша ответов)
+                # и задания по новым именам файлов учитываются явно
+                with transaction.atomic(using=using):
+                    Book.objects.using(using).filter(pk=book.pk).update(
+                        **names, updated_at=timezone.now(), change_seq=changes.next_seq(using=using)
+                    )
+                    blobs.acquire(names.values(), using=using)
+                    for field, name in names.items():
+                        setattr(book, field, name)
+                    if 'cover_image' in names:
+                        thumbnails.enqueue([book], using=using)
+                    if 'book_file' in names:
+                        content.enqueue([book], using=using)
+                moved += 1
+
+        if not options['keep_old']:
+            for name, new_name in renamed.items():
+                default_storage.delete(name)
+                # миниатюры старой обложки лежат рядом с ней под хэшем содержимого
+                thumbnails.delete_renditions(name, hashed_digest(new_name))
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено книг: {moved}, уникальных файлов: {len(set(renamed.values()))}, не найдено: {missing}'
+        ))
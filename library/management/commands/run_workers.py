@@ -0,0 +1,83 @@
+import logging
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def process_main(stop, poll_interval, once, using):
+    # точка входа процесса-обработчика (spawn): Django настраивается заново
+    import django
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from library import jobs
+    jobs.work(stop, poll_interval=poll_interval, once=once, using=using)
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчики фоновых заданий (library.jobs) в потоках или процессах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Число обработчиков (по умолчанию LIBRARY_JOB_WORKERS)')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задания и завершиться')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or settings.LIBRARY_JOB_WORKERS
+        worker_args = (options['poll_interval'], options['once'], options['database'])
+        if options['mode'] == 'process':
+            context = multiprocessing.get_context('spawn')
+            stop = context.Event()
+            workers = [context.Process(target=process_main, args=(stop, *worker_args)) for _ in range(concurrency)]
+        else:
+            stop = threading.Event()
+            workers = [threading.Thread(target=self.thread_main, args=(stop, *worker_args)) for _ in range(concurrency)]
+
+        def shutdown(signum, frame):
+            self.stdout.write('Остановка: текущие задания будут завершены...')
+            stop.set()
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, shutdown)
+            signal.signal(signal.SIGTERM, shutdown)
+
+        # ежедневные задания ставятся до запуска обработчиков, чтобы --once их тоже выполнил
+        self.schedule(options['database'])
+        if not options['once']:
+            workers.append(threading.Thread(
+                target=self.scheduler_main, args=(stop, options['database']), name='library-scheduler'
+            ))
+
+        self.stdout.write(f"Обработчиков: {concurrency} ({options['mode']})")
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Обработчики остановлены'))
+
+    def thread_main(self, stop, poll_interval, once, using):
+        from library import jobs
+        jobs.work(stop, poll_interval=poll_interval, once=once, using=using)
+
+    def schedule(self, using):
+        from library import stats
+        try:
+            stats.schedule_rollup(using=using)
+        except DatabaseError as exc:
+            # например, SQLite занята; следующая проверка через LIBRARY_JOB_SCHEDULE_INTERVAL
+            logger.warning('Не удалось поставить ежедневные задания: %s', exc)
+
+    def scheduler_main(self, stop, using):
+        # пересчёт популярности не зависит от того, были ли в этот день просмотры
+        try:
+            while not stop.wait(settings.LIBRARY_JOB_SCHEDULE_INTERVAL):
+                self.schedule(using)
+        finally:
+            connections.close_all()
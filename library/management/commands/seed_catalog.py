@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from library import bench
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет каталог синтетическими авторами и книгами (русские имена, названия, биографии) '
+        'для замеров bench_api. Книги получают файлы EPUB из небольшого пула с уже извлечённым текстом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--books', type=int, default=20000)
+        parser.add_argument('--files', type=int, default=20, help='Размер пула файлов книг; 0 — книги без файлов')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора: одинаковое зерно — одинаковый каталог')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic(using=options['database']):
+            books = bench.seed_catalog(
+                options['authors'], options['books'], files=options['files'],
+                seed=options['seed'], using=options['database'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов: {options["authors"]}, добавлено книг: {len(books)}, файлов: {options["files"]} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,150 @@
+import copy
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.utils import ConnectionHandler
+
+from library import bench, routers
+
+# Отдельный алиас на время проверки; в settings.DATABASES его нет
+ALIAS = 'stress'
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS stress_sequence (id integer PRIMARY KEY, value integer NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS stress_book (id integer PRIMARY KEY AUTOINCREMENT, title text NOT NULL, seq integer NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS stress_book_seq ON stress_book (seq)',
+    'INSERT OR IGNORE INTO stress_sequence (id, value) VALUES (1, 0)',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентная проверка SQLite: писатели (чтение счётчика и запись в одной транзакции, '
+        'как при сохранении книги) и читатели в потоках на временном файле БД. '
+        'Профиль settings — настройки из settings.DATABASES (default и алиас для чтения) '
+        'с параметрами профиля LIBRARY_DB_PROFILE=production, '
+        'baseline — SQLite без настроек. Ошибка, если в профиле settings были "database is locked".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=['settings', 'baseline', 'both'], default='both')
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=5.0, help='Секунд на профиль')
+
+    def handle(self, *args, **options):
+        profiles = ['baseline', 'settings'] if options['profile'] == 'both' else [options['profile']]
+        self.stdout.write(f'Писателей: {options["writers"]}, читателей: {options["readers"]}, {options["duration"]:g} с')
+        self.stdout.write(
+            f'{"профиль":<10} {"записей/с":>10} {"чтений/с":>10} {"запись p50":>11} {"запись p95":>11} '
+            f'{"ошибок блокировки":>18}'
+        )
+        failed = False
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                write_db, read_db = profile_settings(profile, os.path.join(directory, 'stress.sqlite3'))
+                result = run_stress(write_db, read_db, options['writers'], options['readers'], options['duration'])
+            self.stdout.write(
+                f'{profile:<10} {result["writes"] / result["elapsed"]:>10.0f} {result["reads"] / result["elapsed"]:>10.0f} '
+                f'{result["write_p50"]:>9.1f}ms {result["write_p95"]:>9.1f}ms {result["lock_errors"]:>18}'
+            )
+            failed |= profile == 'settings' and result['lock_errors'] > 0
+        if failed:
+            raise CommandError('С настройками из settings.DATABASES были ошибки "database is locked".')
+
+
+def profile_settings(profile, path):
+    # настройки соединений писателей и читателей для файла path
+    if profile == 'baseline':
+        bare = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+        return bare, dict(bare)
+    write_db = copy.deepcopy(settings.DATABASES[DEFAULT_DB_ALIAS])
+    read_db = copy.deepcopy(settings.DATABASES[routers.read_alias() or DEFAULT_DB_ALIAS])
+    # писатели и читатели — как на сервере с профилем production, даже если он не включён
+    write_db['OPTIONS'] = dict(settings.SQLITE_PRODUCTION_OPTIONS)
+    query_only = ';PRAGMA query_only=ON' if 'query_only' in read_db['OPTIONS'].get('init_command', '') else ''
+    read_db['OPTIONS'] = {'init_command': settings.SQLITE_PRODUCTION_OPTIONS['init_command'] + query_only}
+    for db in (write_db, read_db):
+        db.update(NAME=path, TEST={})
+    return write_db, read_db
+
+
+def connect(db, alias=ALIAS):
+    # отдельное соединение потока под алиасом alias, чтобы работал transaction.atomic
+    connection = ConnectionHandler({DEFAULT_DB_ALIAS: db})[DEFAULT_DB_ALIAS]
+    connection.alias = alias
+    connections[alias] = connection
+    return connection
+
+
+def run_stress(write_db, read_db, writers, readers, duration):
+    setup = connect(copy.deepcopy(write_db))
+    with setup.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+    setup.close()
+    del connections[ALIAS]
+
+    lock = threading.Lock()
+    result = {'writes': 0, 'reads': 0, 'lock_errors': 0}
+    write_timings = []
+    deadline = time.perf_counter() + duration
+
+    def count(key, timings=None, timing=None):
+        with lock:
+            result[key] += 1
+            if timings is not None:
+                timings.append(timing)
+
+    def write(connection, rng):
+        with transaction.atomic(using=ALIAS), connection.cursor() as cursor:
+            cursor.execute('SELECT value FROM stress_sequence WHERE id = 1')
+            value = cursor.fetchone()[0] + 1
+            cursor.execute('UPDATE stress_sequence SET value = %s WHERE id = 1', [value])
+            cursor.execute('INSERT INTO stress_book (title, seq) VALUES (%s, %s)', [f'Книга {rng.random()}', value])
+
+    def read(connection, rng):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM stress_book')
+            cursor.execute(
+                'SELECT id, title, seq FROM stress_book ORDER BY seq DESC LIMIT 20 OFFSET %s', [rng.randint(0, 200)]
+            )
+            cursor.fetchall()
+
+    def worker(db, operation, key, timings, seed):
+        connection = connect(copy.deepcopy(db))
+        rng = random.Random(seed)
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    operation(connection, rng)
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    count('lock_errors')
+                else:
+                    count(key, timings, (time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+            del connections[ALIAS]
+
+    threads = [
+        threading.Thread(target=worker, args=(write_db, write, 'writes', write_timings, i)) for i in range(writers)
+    ] + [
+        threading.Thread(target=worker, args=(read_db, read, 'reads', None, writers + i)) for i in range(readers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result['elapsed'] = time.perf_counter() - started
+    result['write_p50'] = bench.percentile(write_timings, 50)
+    result['write_p95'] = bench.percentile(write_timings, 95)
+    return result
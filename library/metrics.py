@@ -0,0 +1,304 @@
+import bisect
+import contextlib
+import contextvars
+import logging
+import sys
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+from . import cache
+
+slow_logger = logging.getLogger('library.slow')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SLOW_SQL_LENGTH = 2000
+
+# Замер текущего запроса; виден и в потоках sync_to_async асинхронных представлений
+_current = contextvars.ContextVar('library_request_metrics', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: счётчики по верхним границам корзин, сумма и число наблюдений."""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            pairs = list(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{_labels(pairs + [("le", bound)])}}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{_labels(pairs)}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{_labels(pairs)}}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{{{_labels(zip(self.label_names, labels))}}} {value}')
+        return lines
+
+
+request_duration = Histogram(
+    'library_request_duration_seconds', 'Полное время обработки запроса.', DURATION_BUCKETS, ['view', 'method'],
+)
+request_db = Histogram('library_request_db_seconds', 'Время SQL-запросов за запрос.', DURATION_BUCKETS, ['view'])
+request_serialize = Histogram(
+    'library_request_serialize_seconds', 'Время сериализации ответа.', DURATION_BUCKETS, ['view'],
+)
+request_queries = Histogram('library_request_queries', 'Число SQL-запросов за запрос.', QUERY_BUCKETS, ['view'])
+responses = Counter('library_responses_total', 'Ответы по представлению и коду статуса.', ['view', 'status'])
+METRICS = [request_duration, request_db, request_serialize, request_queries, responses]
+
+
+def reset():
+    for metric in METRICS:
+        metric.reset()
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    # счётчики кэша ответов (library/cache.py)
+    lines.append('# HELP library_response_cache_total Обращения к кэшу ответов API.')
+    lines.append('# TYPE library_response_cache_total counter')
+    for result, value in cache.stats.snapshot().items():
+        lines.append(f'library_response_cache_total{{result="{result}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: SQL (число и время), сериализация; при включённом журнале — сами запросы."""
+
+    def __init__(self, capture=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+        self.captured = [] if capture else None
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if self.captured is not None:
+                # параметры не сохраняются: в них могут быть токены и пароли
+                self.captured.append((elapsed, sql, project_stack(sys._getframe(1))))
+
+
+def record_query(execute, sql, params, many, context):
+    # обёртка каждого соединения (install); вне замеряемого запроса — только вызов
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """
+    Подключает замер SQL к соединению (сигнал connection_created). Обёртка постоянная,
+    а не на время запроса: асинхронные представления выполняют SQL в других потоках,
+    у которых свои объекты соединений; замер запроса до них доходит через contextvar.
+    """
+    if record_query not in connection.execute_wrappers:
+        # в начало списка: connection.execute_wrapper() снимает свою обёртку через pop()
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextlib.contextmanager
+def timed():
+    # время сериализации текущего запроса; вложенные замеры не суммируются повторно
+    metrics = _current.get()
+    if metrics is None or metrics.serialize_depth:
+        yield
+        return
+    metrics.serialize_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+        metrics.serialize_depth -= 1
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Время .data попадает в метрики запроса; для many=True — Meta.list_serializer_class = TimedListSerializer."""
+
+    @property
+    def data(self):
+        with timed():
+            return super().data
+
+
+def project_stack(frame):
+    # только кадры кода проекта: библиотеки и Django в журнале не нужны
+    root = str(settings.BASE_DIR)
+    stack = []
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and 'site-packages' not in filename and filename != __file__:
+            stack.append(f'{filename[len(root) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def view_label(request):
+    # имя вьюсета и действия (BookViewSet.list) или модуль и функция; неизвестные пути — одной меткой
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    # @api_view оборачивает функцию в класс WrappedAPIView с её именем и модулем
+    if view_class is not None and view_class.__qualname__.endswith('WrappedAPIView'):
+        return f'{view_class.__module__}.{view_class.__name__}'
+    if view_class is not None:
+        method = request.method.lower()
+        action = (getattr(func, 'actions', None) or {}).get(method, method)
+        return f'{view_class.__name__}.{action}'
+    return f'{func.__module__}.{func.__name__}'
+
+
+class MetricsMiddleware:
+    """
+    Замер каждого запроса: число и время SQL, время сериализации и полное время.
+    Результат — заголовок Server-Timing, гистограммы для /metrics и журнал
+    медленных запросов (LIBRARY_SLOW_REQUEST_MS) с SQL и стеком вызова.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.LIBRARY_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # соединения, открытые до подключения сигнала в LibraryConfig.ready
+        for connection in connections.all():
+            install(connection)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics(capture=settings.LIBRARY_SLOW_REQUEST_MS is not None)
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(capture=settings.LIBRARY_SLOW_REQUEST_MS is not None)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        view = view_label(request)
+        request_duration.observe((view, request.method), total)
+        request_db.observe((view,), metrics.db_time)
+        request_serialize.observe((view,), metrics.serialize_time)
+        request_queries.observe((view,), metrics.queries)
+        responses.inc((view, str(response.status_code)))
+
+        if settings.LIBRARY_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.1f};desc="SQL: {metrics.queries}"',
+                f'serialize;dur={metrics.serialize_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        threshold = settings.LIBRARY_SLOW_REQUEST_MS
+        if threshold is not None and total * 1000 >= threshold:
+            log_slow_request(request, view, total, metrics)
+        return response
+
+
+def log_slow_request(request, view, total, metrics):
+    lines = [
+        f'Медленный запрос {request.method} {request.get_full_path()} ({view}): {total * 1000:.0f} мс, '
+        f'SQL: {metrics.queries} за {metrics.db_time * 1000:.0f} мс, сериализация {metrics.serialize_time * 1000:.0f} мс'
+    ]
+    for elapsed, sql, stack in metrics.captured or ():
+        if len(sql) > SLOW_SQL_LENGTH:
+            sql = sql[:SLOW_SQL_LENGTH] + '…'
+        lines.append(f'  {elapsed * 1000:7.1f} мс  {sql}')
+        lines.extend(f'             {frame}' for frame in stack)
+    slow_logger.warning('\n'.join(lines))
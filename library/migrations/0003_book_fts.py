@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_alter_book_genre_delete_genre'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE library_book_fts USING fts5("
+                "title, genre, category, publisher, author_name, "
+                "tokenize = 'unicode61 remove_diacritics 2')",
+                "INSERT INTO library_book_fts (rowid, title, genre, category, publisher, author_name) "
+                "SELECT b.id, b.title, b.genre, b.category, b.publisher, a.name "
+                "FROM library_book b INNER JOIN library_author a ON a.id = b.author_id",
+            ],
+            reverse_sql=["DROP TABLE library_book_fts"],
+        ),
+    ]
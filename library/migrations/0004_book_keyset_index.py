@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_book_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'year', 'id'], name='library_book_keyset_idx'),
+        ),
+    ]
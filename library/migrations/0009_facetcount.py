@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+FACETS = {
+    'genre': 'genre',
+    'category': 'category',
+    'book_type': 'book_type',
+    'year': 'year',
+    'author': 'author_id',
+}
+
+
+def fill_counts(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    FacetCount = apps.get_model('library', 'FacetCount')
+    db = schema_editor.connection.alias
+    books = Book.objects.using(db).order_by()
+    rows = [
+        FacetCount(facet=facet, value=str(value), count=count)
+        for facet, field in FACETS.items()
+        for value, count in books.values_list(field).annotate(count=Count('id'))
+    ]
+    FacetCount.objects.using(db).bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20, verbose_name='Фасет')),
+                ('value', models.CharField(max_length=200, verbose_name='Значение')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Книг')),
+            ],
+            options={
+                'verbose_name': 'Счётчик фасета',
+                'verbose_name_plural': 'Счётчики фасетов',
+                'indexes': [models.Index(fields=['facet', '-count'], name='library_facet_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='library_facetcount_unique')],
+            },
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+from library.normalize import normalize
+
+NORMALIZED_FIELDS = {
+    'Author': {'name': 'name_norm'},
+    'Book': {
+        'title': 'title_norm',
+        'genre': 'genre_norm',
+        'category': 'category_norm',
+        'publisher': 'publisher_norm',
+    },
+}
+
+FTS_INSERT = (
+    "INSERT INTO library_book_fts (rowid, title, genre, category, publisher, author_name) "
+    "SELECT b.id, {} FROM library_book b INNER JOIN library_author a ON a.id = b.author_id"
+)
+
+
+def fill_normalized(apps, schema_editor):
+    db = schema_editor.connection.alias
+    for model_name, fields in NORMALIZED_FIELDS.items():
+        model = apps.get_model('library', model_name)
+        objects = list(model.objects.using(db).only(*fields))
+        for obj in objects:
+            for field, norm_field in fields.items():
+                max_length = model._meta.get_field(norm_field).max_length
+                setattr(obj, norm_field, normalize(getattr(obj, field))[:max_length])
+        model.objects.using(db).bulk_update(objects, list(fields.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='library_book_genre_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='library_book_cat_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='library_book_pub_year_idx',
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='name_norm',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200, verbose_name='Имя для поиска'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='category_norm',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Категория для поиска'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='genre_norm',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Жанр для поиска'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='publisher_norm',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Издательство для поиска'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='title_norm',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='Название для поиска'),
+        ),
+        migrations.RunPython(fill_normalized, migrations.RunPython.noop),
+        # полнотекстовый индекс строится по нормализованным значениям (ё и е совпадают)
+        migrations.RunSQL(
+            sql=[
+                "DELETE FROM library_book_fts",
+                FTS_INSERT.format("b.title_norm, b.genre_norm, b.category_norm, b.publisher_norm, a.name_norm"),
+            ],
+            reverse_sql=[
+                "DELETE FROM library_book_fts",
+                FTS_INSERT.format("b.title, b.genre, b.category, b.publisher, a.name"),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre_norm', 'year'], name='library_book_genre_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category_norm', 'year'], name='library_book_cat_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publisher_norm', 'year'], name='library_book_pub_year_idx'),
+        ),
+    ]
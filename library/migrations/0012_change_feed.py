@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def number_existing(apps, schema_editor):
+    # существующие авторы и книги получают номера изменений по порядку id
+    db = schema_editor.connection.alias
+    seq = 0
+    for model_name in ['Author', 'Book']:
+        model = apps.get_model('library', model_name)
+        objects = list(model.objects.using(db).order_by('id').only('id'))
+        for obj in objects:
+            seq += 1
+            obj.change_seq = seq
+        model.objects.using(db).bulk_update(objects, ['change_seq'], batch_size=500)
+    apps.get_model('library', 'Sequence').objects.using(db).create(name='catalog', value=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_normalized_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Счётчик')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счётчик',
+                'verbose_name_plural': 'Счётчики',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('book', 'Книга'), ('author', 'Автор')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField(unique=True, verbose_name='Номер изменения')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Удалён')),
+            ],
+            options={
+                'verbose_name': 'Удаление',
+                'verbose_name_plural': 'Удаления',
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+    ]
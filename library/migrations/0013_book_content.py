@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_change_feed'),
+    ]
+
+    # Внешнее содержимое: FTS5 хранит только индекс, текст читается из library_bookpage.
+    # Триггеры держат индекс в согласии с таблицей, в том числе при каскадном удалении книги
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='content_index',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Индекс текста'),
+        ),
+        migrations.CreateModel(
+            name='BookPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Страница')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('text_norm', models.TextField(default='', editable=False, verbose_name='Текст для поиска')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='library.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Страница книги',
+                'verbose_name_plural': 'Страницы книг',
+                'ordering': ['book', 'number'],
+                'unique_together': {('book', 'number')},
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE library_bookpage_fts USING fts5("
+                "text_norm, content='library_bookpage', content_rowid='id', "
+                "tokenize = 'unicode61 remove_diacritics 2')",
+                "CREATE TRIGGER library_bookpage_fts_ai AFTER INSERT ON library_bookpage BEGIN "
+                "INSERT INTO library_bookpage_fts (rowid, text_norm) VALUES (new.id, new.text_norm); END",
+                "CREATE TRIGGER library_bookpage_fts_ad AFTER DELETE ON library_bookpage BEGIN "
+                "INSERT INTO library_bookpage_fts (library_bookpage_fts, rowid, text_norm) "
+                "VALUES ('delete', old.id, old.text_norm); END",
+                "CREATE TRIGGER library_bookpage_fts_au AFTER UPDATE ON library_bookpage BEGIN "
+                "INSERT INTO library_bookpage_fts (library_bookpage_fts, rowid, text_norm) "
+                "VALUES ('delete', old.id, old.text_norm); "
+                "INSERT INTO library_bookpage_fts (rowid, text_norm) VALUES (new.id, new.text_norm); END",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER library_bookpage_fts_au",
+                "DROP TRIGGER library_bookpage_fts_ad",
+                "DROP TRIGGER library_bookpage_fts_ai",
+                "DROP TABLE library_bookpage_fts",
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_book_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотров')),
+                ('downloads', models.PositiveIntegerField(default=0, verbose_name='Скачиваний')),
+            ],
+            options={
+                'verbose_name': 'Статистика книги',
+                'verbose_name_plural': 'Статистика книг',
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-popularity', 'id'], name='library_book_popularity_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookstat',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='library.book', verbose_name='Книга'),
+        ),
+        migrations.AddIndex(
+            model_name='bookstat',
+            index=models.Index(fields=['day', 'book'], name='library_bookstat_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookstat',
+            constraint=models.UniqueConstraint(fields=('book', 'day'), name='library_bookstat_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_book_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='writing_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Часть записывается до'),
+        ),
+    ]
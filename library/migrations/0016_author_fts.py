@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+from library.normalize import normalize
+
+
+def fill_biography_norm(apps, schema_editor):
+    Author = apps.get_model('library', 'Author')
+    db = schema_editor.connection.alias
+    authors = list(Author.objects.using(db).exclude(biography='').only('biography'))
+    for author in authors:
+        author.biography_norm = normalize(author.biography)
+    Author.objects.using(db).bulk_update(authors, ['biography_norm'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_upload_writing_until'),
+    ]
+
+    # Поиск авторов (/api/authors/?search=) по началу слова без LIKE '%…': внешнее
+    # содержимое из library_author, индекс поддерживают триггеры (как в 0013), поэтому
+    # bulk_create импорта и update() тоже попадают в индекс
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='biography_norm',
+            field=models.TextField(default='', editable=False, verbose_name='Биография для поиска'),
+        ),
+        migrations.RunPython(fill_biography_norm, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE library_author_fts USING fts5("
+                "name_norm, biography_norm, content='library_author', content_rowid='id', "
+                "tokenize = 'unicode61 remove_diacritics 2')",
+                "INSERT INTO library_author_fts (library_author_fts) VALUES ('rebuild')",
+                "CREATE TRIGGER library_author_fts_ai AFTER INSERT ON library_author BEGIN "
+                "INSERT INTO library_author_fts (rowid, name_norm, biography_norm) "
+                "VALUES (new.id, new.name_norm, new.biography_norm); END",
+                "CREATE TRIGGER library_author_fts_ad AFTER DELETE ON library_author BEGIN "
+                "INSERT INTO library_author_fts (library_author_fts, rowid, name_norm, biography_norm) "
+                "VALUES ('delete', old.id, old.name_norm, old.biography_norm); END",
+                "CREATE TRIGGER library_author_fts_au AFTER UPDATE ON library_author BEGIN "
+                "INSERT INTO library_author_fts (library_author_fts, rowid, name_norm, biography_norm) "
+                "VALUES ('delete', old.id, old.name_norm, old.biography_norm); "
+                "INSERT INTO library_author_fts (rowid, name_norm, biography_norm) "
+                "VALUES (new.id, new.name_norm, new.biography_norm); END",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER library_author_fts_au",
+                "DROP TRIGGER library_author_fts_ad",
+                "DROP TRIGGER library_author_fts_ai",
+                "DROP TABLE library_author_fts",
+            ],
+        ),
+    ]
@@ -1,9 +1,47 @@
-from django.db import models
+import uuid
+
+from django.conf import settings
+from django.db import models, router, transaction
+
+from . import normalize
+
+
+# Общее для книг и авторов: теневые колонки поиска и отметки для ленты изменений (library/changes.py)
+class CatalogModel(models.Model):
+    created_at = models.DateTimeField("Дата добавления", auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True, db_index=True)
+    # номер из общего счётчика каталога, присваивается при каждом сохранении
+    change_seq = models.PositiveBigIntegerField("Номер изменения", default=0, db_index=True, editable=False)
+
+    # исходное поле -> теневая колонка; bulk_create обходит save(), там вызывается normalize.fill
+    NORMALIZED_FIELDS = {}
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        normalize.fill(self)
+        update_fields = normalize.update_fields(self, kwargs.get('update_fields'))
+        if update_fields is not None:
+            update_fields |= {'updated_at', 'change_seq'}
+        kwargs['update_fields'] = update_fields
+        # номер изменения (pre_save, library/signals.py) и запись строки — в одной транзакции,
+        # иначе изменение с меньшим номером могло бы зафиксироваться позже
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
 
 # Модель автора, уникальна по наименованию
-class Author(models.Model):
+class Author(CatalogModel):
     name = models.CharField("Имя автора", max_length=200, unique=True)
     biography = models.TextField("Биография", blank=True)
+    # нормализованное имя для поиска (см. library/normalize.py)
+    name_norm = models.CharField("Имя для поиска", max_length=200, db_index=True, editable=False, default='')
+    biography_norm = models.TextField("Биография для поиска", editable=False, default='')
+
+    # имя и биография в нормализованном виде индексируются FTS5 (library_author_fts, миграция 0016)
+    NORMALIZED_FIELDS = {'name': 'name_norm', 'biography': 'biography_norm'}
 
     def __str__(self):
         return self.name
@@ -14,7 +52,7 @@ class Author(models.Model):
         ordering = ['name']
 
 # Модель книги. Уникальна по многим критериям. Два типа
-class Book(models.Model):
+class Book(CatalogModel):
     TYPE_CHOICES = [
         ('fiction', 'Художественное произведение'),
         ('textbook', 'Учебник'),
@@ -48,12 +86,233 @@ class Book(models.Model):
         choices=TYPE_CHOICES,
         default='fiction'
     )
+    # миниатюры обложки (см. library/thumbnails.py): источник, его SHA-256 и файлы по размерам
+    cover_renditions = models.JSONField("Миниатюры обложки", default=dict, blank=True, editable=False)
+    # текст файла книги по страницам (см. library/content.py): источник и число страниц или ошибка
+    content_index = models.JSONField("Индекс текста", default=dict, blank=True, editable=False)
+    # просмотры и скачивания за последние дни (см. library/stats.py), для ?ordering=-popularity
+    popularity = models.PositiveIntegerField("Популярность", default=0, editable=False)
+    # нормализованные значения для поиска и фильтров (см. library/normalize.py)
+    title_norm = models.CharField("Название для поиска", max_length=100, editable=False, default='')
+    genre_norm = models.CharField("Жанр для поиска", max_length=100, editable=False, default='')
+    category_norm = models.CharField("Категория для поиска", max_length=100, editable=False, default='')
+    publisher_norm = models.CharField("Издательство для поиска", max_length=100, editable=False, default='')
+
+    NORMALIZED_FIELDS = {
+        'title': 'title_norm',
+        'genre': 'genre_norm',
+        'category': 'category_norm',
+        'publisher': 'publisher_norm',
+    }
 
     class Meta:
         verbose_name = "Книга"
         verbose_name_plural = "Книги"
         unique_together = ('title', 'author', 'year', 'publisher')
         ordering = ['title', 'year']
+        # ключ курсорной пагинации (см. library/pagination.py)
+        indexes = [
+            models.Index(fields=['title', 'year', 'id'], name='library_book_keyset_idx'),
+            # фильтры BookFilter (library/filters.py): равенство по полю и диапазон по году
+            models.Index(fields=['year'], name='library_book_year_idx'),
+            models.Index(fields=['book_type', 'year'], name='library_book_type_year_idx'),
+            models.Index(fields=['genre_norm', 'year'], name='library_book_genre_year_idx'),
+            models.Index(fields=['category_norm', 'year'], name='library_book_cat_year_idx'),
+            models.Index(fields=['publisher_norm', 'year'], name='library_book_pub_year_idx'),
+            models.Index(fields=['-popularity', 'id'], name='library_book_popularity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.year}) — {self.author.name}"
+
+# Загрузка файла книги по частям (см. library/uploads.py)
+class Upload(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Загружается'),
+        ('complete', 'Завершена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='book_uploads',
+        verbose_name="Пользователь"
+    )
+    filename = models.CharField("Имя файла", max_length=255)
+    size = models.PositiveBigIntegerField("Размер, байт")
+    offset = models.PositiveBigIntegerField("Получено, байт", default=0)
+    content_type = models.CharField("Тип содержимого", max_length=50, blank=True)
+    sha256 = models.CharField("SHA-256", max_length=64, blank=True)
+    status = models.CharField("Статус", max_length=10, choices=STATUS_CHOICES, default='pending')
+    stored_name = models.CharField("Файл в хранилище", max_length=255, blank=True)
+    # аренда записи части: пока не истекла, другие запросы к загрузке получают 409
+    writing_until = models.DateTimeField("Часть записывается до", null=True, blank=True, editable=False)
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='uploads',
+        verbose_name="Книга"
+    )
+    created_at = models.DateTimeField("Создана", auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлена", auto_now=True)
+
+    class Meta:
+        verbose_name = "Загрузка"
+        verbose_name_plural = "Загрузки"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+# Файл в адресном хранилище (library/storage.py) и число книг, которые на него ссылаются
+class Blob(models.Model):
+    name = models.CharField("Файл в хранилище", max_length=255, unique=True)
+    refcount = models.PositiveIntegerField("Ссылок", default=0)
+    created_at = models.DateTimeField("Создан", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+# Фоновое задание (см. library/jobs.py и manage.py run_workers)
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField("Задача", max_length=100)
+    args = models.JSONField("Аргументы", default=dict, blank=True)
+    key = models.CharField("Ключ идемпотентности", max_length=255, blank=True)
+    status = models.CharField("Статус", max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+    max_attempts = models.PositiveIntegerField("Максимум попыток", default=5)
+    run_after = models.DateTimeField("Не раньше")
+    locked_by = models.CharField("Обработчик", max_length=100, blank=True)
+    locked_at = models.DateTimeField("Взято в работу", null=True, blank=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+    finished_at = models.DateTimeField("Завершено", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Задание"
+        verbose_name_plural = "Задания"
+        ordering = ['-id']
+        indexes = [
+            # выборка готовых к запуску заданий
+            models.Index(fields=['status', 'run_after'], name='library_job_due_idx'),
+        ]
+        constraints = [
+            # пока задание с ключом не завершено, второе такое же не создаётся
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status__in=['queued', 'running']) & ~models.Q(key=''),
+                name='library_job_active_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+# Число книг по значению фасета (см. library/facets.py); обновляется сигналами Book
+class FacetCount(models.Model):
+    facet = models.CharField("Фасет", max_length=20)
+    value = models.CharField("Значение", max_length=200)
+    count = models.PositiveIntegerField("Книг", default=0)
+
+    class Meta:
+        verbose_name = "Счётчик фасета"
+        verbose_name_plural = "Счётчики фасетов"
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='library_facetcount_unique'),
+        ]
+        indexes = [
+            # самые частые значения фасета
+            models.Index(fields=['facet', '-count'], name='library_facet_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+# Счётчик номеров изменений (см. library/changes.py)
+class Sequence(models.Model):
+    name = models.CharField("Счётчик", max_length=50, unique=True)
+    value = models.PositiveBigIntegerField("Значение", default=0)
+
+    class Meta:
+        verbose_name = "Счётчик"
+        verbose_name_plural = "Счётчики"
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+# Удалённая книга или автор для ленты изменений /api/changes/
+class Tombstone(models.Model):
+    KIND_CHOICES = [
+        ('book', 'Книга'),
+        ('author', 'Автор'),
+    ]
+
+    kind = models.CharField("Тип", max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField("ID")
+    seq = models.PositiveBigIntegerField("Номер изменения", unique=True)
+    deleted_at = models.DateTimeField("Удалён", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Удаление"
+        verbose_name_plural = "Удаления"
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} ({self.seq})"
+
+
+# Текст страницы файла книги для поиска по содержимому (см. library/content.py).
+# Полнотекстовый индекс library_bookpage_fts (миграция 0013) строится по text_norm
+class BookPage(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='pages', verbose_name="Книга")
+    number = models.PositiveIntegerField("Страница")
+    text = models.TextField("Текст")
+    text_norm = models.TextField("Текст для поиска", editable=False, default='')
+
+    NORMALIZED_FIELDS = {'text': 'text_norm'}
+
+    class Meta:
+        verbose_name = "Страница книги"
+        verbose_name_plural = "Страницы книг"
+        unique_together = ('book', 'number')
+        ordering = ['book', 'number']
+
+    def __str__(self):
+        return f"{self.book_id}, с. {self.number}"
+
+
+# Просмотры и скачивания книги за день; пишутся пачками из счётчиков процесса (library/stats.py)
+class BookStat(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='stats', verbose_name="Книга")
+    day = models.DateField("День")
+    views = models.PositiveIntegerField("Просмотров", default=0)
+    downloads = models.PositiveIntegerField("Скачиваний", default=0)
+
+    class Meta:
+        verbose_name = "Статистика книги"
+        verbose_name_plural = "Статистика книг"
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'day'], name='library_bookstat_unique'),
+        ]
+        indexes = [
+            # пересчёт популярности за последние дни
+            models.Index(fields=['day', 'book'], name='library_bookstat_day_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.title} ({self.year}) — {self.author.name}"
\ No newline at end of file
+        return f"{self.book_id}, {self.day}: {self.views}/{self.downloads}"
@@ -0,0 +1,36 @@
+import re
+import unicodedata
+
+# Знаки ударения и прочие отдельные комбинируемые диакритики (за́мок -> замок)
+_COMBINING_RE = re.compile(r'[\u0300-\u036f]')
+# Всё, кроме букв и цифр, — разделитель слов
+_SEPARATOR_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """
+    Текст для поиска: NFKC, свёртка регистра (casefold), ё -> е,
+    знаки препинания и пробелы сводятся к одному пробелу.
+    «Ёлка — зелёная!» -> 'елка зеленая'.
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).casefold().replace('ё', 'е')
+    text = _COMBINING_RE.sub('', text)
+    return _SEPARATOR_RE.sub(' ', text).strip()
+
+
+def fill(instance):
+    # заполняет теневые колонки экземпляра по NORMALIZED_FIELDS модели: поле -> колонка *_norm
+    for field, norm_field in instance.NORMALIZED_FIELDS.items():
+        max_length = instance._meta.get_field(norm_field).max_length
+        setattr(instance, norm_field, normalize(getattr(instance, field))[:max_length])
+    return instance
+
+
+def update_fields(model, fields):
+    # save(update_fields=...) с исходным полем сохраняет и его теневую колонку
+    if fields is None:
+        return None
+    fields = set(fields)
+    return fields | {norm for field, norm in model.NORMALIZED_FIELDS.items() if field in fields}
@@ -0,0 +1,270 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+
+def get_keyset(model):
+    # Ключ курсора — сортировка модели по умолчанию плюс id для однозначности
+    keyset = []
+    for field in model._meta.ordering:
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        if name == 'pk':
+            name = model._meta.pk.attname
+        keyset.append((name, descending))
+    if model._meta.pk.attname not in [name for name, _ in keyset]:
+        keyset.append((model._meta.pk.attname, False))
+    return keyset
+
+
+def keyset_ordering(keyset, reverse=False):
+    return [f'-{name}' if descending != reverse else name for name, descending in keyset]
+
+
+def keyset_filter(keyset, values, reverse=False):
+    # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z);
+    # избыточное условие a >= x позволяет SQLite начать с поиска по индексу, а не сканировать его
+    first_name, first_descending = keyset[0]
+    bound = 'lte' if first_descending != reverse else 'gte'
+    condition = Q()
+    for index, (name, descending) in enumerate(keyset):
+        lookup = 'lt' if descending != reverse else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[index]})
+        for (prev_name, _), prev_value in zip(keyset[:index], values[:index]):
+            branch &= Q(**{prev_name: prev_value})
+        condition |= branch
+    return Q(**{f'{first_name}__{bound}': values[0]}) & condition
+
+
+def row_key(row, keyset):
+    if isinstance(row, dict):
+        return [row[name] for name, _ in keyset]
+    return [getattr(row, name) for name, _ in keyset]
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'k': values, 'r': int(reverse)}, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, keyset):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values, reverse = payload['k'], bool(payload['r'])
+    except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+        raise NotFound(KeysetPagination.invalid_cursor_message)
+    if not isinstance(values, list) or len(values) != len(keyset):
+        raise NotFound(KeysetPagination.invalid_cursor_message)
+    return values, reverse
+
+
+def has_default_ordering(queryset):
+    query = queryset.query
+    return not query.order_by and not query.extra_order_by and query.default_ordering
+
+
+def count_requested(request, param='count'):
+    return request.query_params.get(param, '').lower() in TRUE_VALUES
+
+
+class WindowPagination(BasePagination):
+    """
+    Общая схема пагинации каталога: start разбирает параметры, window строит срез
+    выборки на страницу плюс одну строку, finish раскладывает прочитанные строки.
+    Запросы к БД — только в paginate_queryset и его асинхронном варианте.
+    """
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.start(queryset, request)
+        if count_requested(request, self.count_query_param):
+            self.count = queryset.count()
+        return self.finish(list(self.window(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.start(queryset, request)
+        if count_requested(request, self.count_query_param):
+            self.count = await queryset.acount()
+        return self.finish([row async for row in self.window(queryset)])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return payload
+
+
+class KeysetPagination(WindowPagination):
+    """
+    Курсорная пагинация по ключу сортировки модели
+    (для книг — title, year, id; для авторов — name, id).
+    Позиция задаётся сравнением по ключу, поэтому не требует OFFSET и COUNT(*).
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def start(self, queryset, request):
+        self.request = request
+        self.keyset = get_keyset(queryset.model)
+        self.count = None
+        token = request.query_params.get(self.cursor_query_param)
+        self.position, self.reverse = decode_cursor(token, self.keyset) if token else (None, False)
+        return queryset
+
+    def window(self, queryset):
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(keyset_filter(self.keyset, self.position, self.reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset.order_by(*keyset_ordering(self.keyset, self.reverse))[:self.page_size + 1]
+
+    def finish(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = encode_cursor(row_key(self.page[-1], self.keyset))
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        cursor = encode_cursor(row_key(self.page[0], self.keyset), reverse=True)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+
+class UncountedPageNumberPagination(WindowPagination):
+    """
+    Постраничный режим (?page=N). Наличие следующей страницы определяется
+    выборкой page_size + 1 строк; COUNT(*) выполняется только по ?count=true.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = 'page'
+    invalid_page_message = 'Неверная страница.'
+
+    def start(self, queryset, request):
+        self.request = request
+        self.count = None
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.number < 1:
+            raise NotFound(self.invalid_page_message)
+        return queryset
+
+    def window(self, queryset):
+        offset = (self.number - 1) * self.page_size
+        return queryset[offset:offset + self.page_size + 1]
+
+    def finish(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if not self.page and self.number > 1:
+            raise NotFound(self.invalid_page_message)
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), KeysetPagination.cursor_query_param)
+        return replace_query_param(url, self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if self.number <= 1:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), KeysetPagination.cursor_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+
+class CatalogPagination(BasePagination):
+    """
+    Пагинация каталога по умолчанию: курсорная, если клиент не запросил ?page=
+    и выборка отсортирована по ключу модели. Выдачи с другой сортировкой
+    (например, по релевантности поиска) листаются постранично.
+    """
+    page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.choose(queryset, request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.choose(queryset, request)
+        return await self.paginator.apaginate_queryset(queryset, request, view)
+
+    def choose(self, queryset, request):
+        if self.page_query_param in request.query_params or not has_default_ordering(queryset):
+            return UncountedPageNumberPagination()
+        return KeysetPagination()
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_data(self, data):
+        return self.paginator.get_paginated_data(data)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': KeysetPagination.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы из ссылок next/previous.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Номер страницы (постраничный режим).',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': KeysetPagination.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Добавить в ответ общее количество записей.',
+                'schema': {'type': 'boolean'},
+            },
+        ]
@@ -0,0 +1,61 @@
+import contextlib
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Чтение через соединение только для чтения включается явно — на время list/retrieve
+_reading = contextvars.ContextVar('library_replica_read', default=False)
+
+
+@contextlib.contextmanager
+def read_replica():
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def read_alias():
+    alias = settings.LIBRARY_READ_ALIAS
+    return alias if alias and alias in settings.DATABASES else None
+
+
+class ReadReplicaRouter:
+    """
+    Чтение внутри read_replica() идёт через LIBRARY_READ_ALIAS, всё остальное — через
+    default. Внутри открытой транзакции default чтение остаётся на default, чтобы
+    видеть свои же незафиксированные изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _reading.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # обе базы — один и тот же файл
+        aliases = {DEFAULT_DB_ALIAS, read_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db == read_alias():
+            return False
+        return None
+
+
+class ReadReplicaMixin:
+    """Действия list/retrieve вьюсета читают через соединение только для чтения."""
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with read_replica():
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,91 @@
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.encoding import filepath_to_uri
+from rest_framework.exceptions import ValidationError
+
+# Быстрое чтение книг: словари ответа собираются прямо из строк values(), без полей DRF.
+# Вывод совпадает с BookSerializer байт в байт; поле ответа -> нужные колонки
+BOOK_COLUMNS = {
+    'id': ['id'],
+    'title': ['title'],
+    'author': ['author_id'],
+    'author_name': ['author__name'],
+    'year': ['year'],
+    'genre': ['genre'],
+    'category': ['category'],
+    'publisher': ['publisher'],
+    'cover_image': ['cover_image'],
+    'covers': ['cover_image', 'cover_renditions'],
+    'book_file': ['book_file'],
+    'book_type': ['book_type'],
+}
+FIELDS_PARAM = 'fields'
+
+
+def parse_fields(request):
+    # ?fields=id,title,author_name — подмножество полей в порядке BookSerializer
+    value = request.query_params.get(FIELDS_PARAM, '').strip()
+    if not value:
+        return list(BOOK_COLUMNS)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - BOOK_COLUMNS.keys()
+    if unknown:
+        raise ValidationError({FIELDS_PARAM: [f"Неизвестные поля: {', '.join(sorted(unknown))}."]})
+    return [name for name in BOOK_COLUMNS if name in requested]
+
+
+def media_url_builder(request, storage=default_storage):
+    """
+    Функция имя файла -> абсолютный URL, как у FileField/ImageField сериализатора.
+    Для файлового хранилища префикс вычисляется один раз на запрос.
+    """
+    build = request.build_absolute_uri if request is not None else str
+    if isinstance(storage, FileSystemStorage):
+        prefix = build(storage.url(''))
+        return lambda name: prefix + filepath_to_uri(name).lstrip('/')
+    return lambda name: build(storage.url(name))
+
+
+class BookRows:
+    """
+    Выборка и представление книг для list/retrieve. Колонки SQL сужаются до
+    нужных полям ответа (плюс колонки, нужные пагинации и сортировке).
+    """
+
+    def __init__(self, request, fields=None, extra_columns=()):
+        self.fields = fields if fields is not None else parse_fields(request)
+        self.media_url = media_url_builder(request)
+        columns = dict.fromkeys(extra_columns)
+        for field in self.fields:
+            columns.update(dict.fromkeys(BOOK_COLUMNS[field]))
+        self.columns = list(columns)
+
+    def values(self, queryset):
+        # сортировка по рангу поиска (extra) требует, чтобы колонка была в выборке
+        return queryset.values(*self.columns, *queryset.query.extra_select)
+
+    def represent(self, row):
+        media_url = self.media_url
+        data = {}
+        for field in self.fields:
+            if field == 'author':
+                data[field] = row['author_id']
+            elif field == 'author_name':
+                data[field] = row['author__name']
+            elif field in ('cover_image', 'book_file'):
+                data[field] = media_url(row[field]) if row[field] else None
+            elif field == 'covers':
+                data[field] = self.covers(row, media_url)
+            else:
+                data[field] = row[field]
+        return data
+
+    # то же, что thumbnails.cover_urls для экземпляра модели
+    def covers(self, row, media_url):
+        renditions = row['cover_renditions'] or {}
+        if not row['cover_image'] or renditions.get('source') != row['cover_image']:
+            return {}
+        return {
+            width: {fmt: media_url(name) for fmt, name in formats.items()}
+            for width, formats in renditions['files'].items()
+        }
+
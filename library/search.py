@@ -0,0 +1,136 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Author, Book
+from .normalize import normalize
+
+# Виртуальная таблица FTS5, rowid совпадает с id книги (см. миграцию 0003).
+# Хранит нормализованные значения (*_norm, миграция 0011), термины запроса нормализуются так же
+FTS_TABLE = 'library_book_fts'
+FTS_COLUMNS = ['title', 'genre', 'category', 'publisher', 'author_name']
+# Веса колонок для bm25: совпадение в названии важнее, чем в издательстве
+FTS_WEIGHTS = [10.0, 2.0, 2.0, 1.0, 5.0]
+RANK_ALIAS = 'search_rank'
+# Внешнее содержимое из library_author (name_norm, biography_norm), см. миграцию 0016
+AUTHOR_FTS_TABLE = 'library_author_fts'
+
+# Ограничение на число параметров в одном IN (...)
+BATCH_SIZE = 500
+
+_WORD_RE = re.compile(r'\w', re.UNICODE)
+
+
+def build_match_query(terms):
+    # Каждый термин превращается в префиксную фразу "термин"*, термины объединяются по AND
+    phrases = []
+    for term in terms:
+        term = normalize(term)
+        if not _WORD_RE.search(term):
+            continue
+        phrases.append('"{}"*'.format(term))
+    return ' '.join(phrases)
+
+
+def search_books(queryset, terms):
+    match = build_match_query(terms)
+    if not match:
+        return queryset.none()
+    book_table = queryset.model._meta.db_table
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {book_table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={RANK_ALIAS: f'bm25({FTS_TABLE}, {weights})'},
+        order_by=[RANK_ALIAS, 'title', 'year', 'id'],
+    )
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Замена SearchFilter для книг: поиск по индексу FTS5
+    с сортировкой результатов по релевантности (bm25).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_books(queryset, terms)
+
+
+def search_authors(queryset, terms):
+    match = build_match_query(terms)
+    if not match:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {AUTHOR_FTS_TABLE} WHERE {AUTHOR_FTS_TABLE} MATCH %s', [match]
+    ))
+
+
+class NormalizedSearchFilter(SearchFilter):
+    """
+    Поиск авторов по индексу FTS5 нормализованных имени и биографии:
+    совпадение с начала слова без учёта регистра и ё (подстрока в середине
+    слова не находится), каждый термин должен встретиться в одном из полей.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_authors(queryset, terms)
+
+
+def _select_rows_sql(where=''):
+    book_table = Book._meta.db_table
+    author_table = Author._meta.db_table
+    return (
+        f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) '
+        f'SELECT b.id, b.title_norm, b.genre_norm, b.category_norm, b.publisher_norm, a.name_norm '
+        f'FROM {book_table} b INNER JOIN {author_table} a ON a.id = b.author_id {where}'
+    )
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def index_books(book_ids, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        for batch in _batches(book_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(_select_rows_sql(f'WHERE b.id IN ({placeholders})'), batch)
+
+
+def remove_books(book_ids, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        for batch in _batches(book_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', batch)
+
+
+def reindex_author(author, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET author_name = %s '
+            f'WHERE rowid IN (SELECT id FROM {Book._meta.db_table} WHERE author_id = %s)',
+            [author.name_norm, author.pk],
+        )
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(_select_rows_sql())
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        # индекс авторов поддерживают триггеры; 'rebuild' перечитывает внешнее содержимое
+        cursor.execute(f"INSERT INTO {AUTHOR_FTS_TABLE} ({AUTHOR_FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
@@ -1,51 +1,86 @@
 import mimetypes
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from django.core.exceptions import ValidationError as DjangoValidationError
-from .models import Author, Book
+from . import thumbnails
+from .metrics import TimedListSerializer, TimedSerializerMixin
+from .models import Author, Book, Job, Upload
 
-def validate_book_file(file):
-    mime_type, _ = mimetypes.guess_type(file.name)
+BOOK_FILE_TYPES = ['application/pdf', 'application/epub+zip']
+MAX_BOOK_FILE_SIZE = 50 * 1024 * 1024
+
+
+def validate_book_file_name(name):
+    mime_type, _ = mimetypes.guess_type(name)
     if not mime_type:
         raise ValidationError("Не удалось определить тип файла.")
 
-    allowed_types = ['application/pdf', 'application/epub+zip']
-    if mime_type not in allowed_types:
+    if mime_type not in BOOK_FILE_TYPES:
         raise ValidationError(
             f"Недопустимый тип файла: {mime_type}. Разрешены: PDF, EPUB."
         )
 
-    if file.size > 50 * 1024 * 1024:
+
+def validate_book_file(file):
+    validate_book_file_name(file.name)
+
+    if file.size > MAX_BOOK_FILE_SIZE:
         raise ValidationError("Файл слишком большой. Максимум — 50 МБ.")
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     books = serializers.SerializerMethodField()
+    books_count = serializers.SerializerMethodField()
+    books_url = serializers.HyperlinkedIdentityField(view_name='author-books')
 
     class Meta:
         model = Author
-        fields = ['id', 'name', 'biography', 'books']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'name', 'biography', 'books', 'books_count', 'books_url']
 
+    # embedded_books и books_count подготавливает AuthorViewSet.get_queryset
     def get_books(self, obj):
+        books = getattr(obj, 'embedded_books', None)
+        if books is None:
+            books = obj.books.only('id', 'title')[:settings.LIBRARY_AUTHOR_BOOKS_LIMIT]
         return [
             {"id": book.id, "title": book.title}
-            for book in obj.books.all()
+            for book in books
         ]
 
+    def get_books_count(self, obj):
+        count = getattr(obj, 'books_count', None)
+        return obj.books.count() if count is None else count
+
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.name', read_only=True)
     cover_image = serializers.ImageField(required=False, allow_null=True)
-    book_file = serializers.FileField(validators=[validate_book_file])
+    covers = serializers.SerializerMethodField()
+    book_file = serializers.FileField(validators=[validate_book_file], required=False)
+    # вместо book_file можно передать id завершённой загрузки (/api/uploads/)
+    upload = serializers.PrimaryKeyRelatedField(
+        queryset=Upload.objects.filter(status='complete', book__isnull=True),
+        write_only=True,
+        required=False
+    )
 
     class Meta:
         model = Book
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'title', 'author', 'author_name',
             'year', 'genre', 'category', 'publisher',
-            'cover_image', 'book_file', 'book_type'
+            'cover_image', 'covers', 'book_file', 'book_type', 'upload'
         ]
 
+    # миниатюры обложки по ширине и формату: {'96': {'webp': url, 'jpeg': url}, ...}
+    def get_covers(self, obj):
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request is not None else str
+        return thumbnails.cover_urls(obj, build_url)
+
     def validate_year(self, value):
         if not (1000 <= value <= 9999):
             raise serializers.ValidationError("Год должен быть в диапазоне от 1000 до 9999.")
@@ -53,6 +88,9 @@ class BookSerializer(serializers.ModelSerializer):
 
     # уникальность
     def validate(self, data):
+        if self.instance is None and not data.get('book_file') and not data.get('upload'):
+            raise ValidationError({'book_file': ["Передайте файл книги или id загрузки."]})
+
         title = data.get('title')
         author = data.get('author')
         year = data.get('year')
@@ -68,8 +106,9 @@ class BookSerializer(serializers.ModelSerializer):
             if self.instance:
                 queryset = queryset.exclude(pk=self.instance.pk)
 
-            if queryset.exists():
-                existing = queryset.first()
+            # один запрос вместо exists() + first()
+            existing = queryset.only('id', 'book_type').first()
+            if existing is not None:
                 msg = (
                     f"Запись с таким сочетанием «{title}», автор «{author.name}», "
                     f"год «{year}», издательство «{publisher}» уже существует (ID: {existing.id})."
@@ -83,7 +122,58 @@ class BookSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
+        upload = self.take_upload(validated_data)
         try:
-            return super().create(validated_data)
+            book = super().create(validated_data)
         except DjangoValidationError as e:
-            raise ValidationError(e.message_dict)
\ No newline at end of file
+            raise ValidationError(e.message_dict)
+        self.attach_upload(upload, book)
+        return book
+
+    def update(self, instance, validated_data):
+        upload = self.take_upload(validated_data)
+        book = super().update(instance, validated_data)
+        self.attach_upload(upload, book)
+        return book
+
+    # файл загрузки уже лежит в хранилище — книга ссылается на него по имени, без повторного чтения
+    def take_upload(self, validated_data):
+        upload = validated_data.pop('upload', None)
+        if upload is not None:
+            validated_data['book_file'] = upload.stored_name
+        return upload
+
+    def attach_upload(self, upload, book):
+        if upload is not None:
+            upload.book = book
+            upload.save(update_fields=['book', 'updated_at'])
+
+
+class UploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Upload
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'filename', 'size', 'offset', 'content_type', 'sha256', 'status', 'created_at']
+        read_only_fields = ['offset', 'content_type', 'sha256', 'status', 'created_at']
+
+    def validate_filename(self, value):
+        validate_book_file_name(value)
+        return value
+
+    def validate_size(self, value):
+        if value == 0:
+            raise serializers.ValidationError("Файл пуст.")
+        if value > MAX_BOOK_FILE_SIZE:
+            raise serializers.ValidationError("Файл слишком большой. Максимум — 50 МБ.")
+        return value
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        list_serializer_class = TimedListSerializer
+        fields = [
+            'id', 'name', 'args', 'key', 'status', 'attempts', 'max_attempts',
+            'run_after', 'last_error', 'created_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, blobs, changes, content, facets, search, thumbnails
+from .models import Author, Book
+
+# Отправляется после bulk_create книг (импорт), когда post_save не срабатывает.
+# Аргументы: books — созданные экземпляры с id, using — алиас БД
+books_bulk_created = Signal()
+
+
+# Синхронизация полнотекстового индекса с книгами и авторами
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    search.index_books([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, using=None, **kwargs):
+    search.remove_books([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Author)
+def reindex_author(sender, instance, created=False, raw=False, using=None, **kwargs):
+    if raw or created:
+        return
+    search.reindex_author(instance, using=using)
+
+
+@receiver(books_bulk_created)
+def index_bulk_created_books(sender, books, using=None, **kwargs):
+    search.index_books([book.pk for book in books], using=using)
+
+
+# Лента изменений (см. library/changes.py): номер при каждом сохранении, запись об удалении.
+# Номер изменения — и версия каталога в ключах кэша ответов (library/cache.py)
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=Author)
+def stamp_change(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    instance.change_seq = changes.next_seq(using=using)
+
+
+@receiver(post_delete, sender=Book)
+def record_book_delete(sender, instance, using=None, **kwargs):
+    changes.record_delete('book', instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Author)
+def record_author_delete(sender, instance, using=None, **kwargs):
+    changes.record_delete('author', instance.pk, using=using)
+
+
+# Значения полей до сохранения — одним запросом для подсчёта ссылок на файлы и счётчиков фасетов
+@receiver(pre_save, sender=Book)
+def remember_stored_book(sender, instance, raw=False, using=None, **kwargs):
+    instance._stored_values = None
+    if instance.pk and not raw:
+        instance._stored_values = (
+            Book.objects.using(using).filter(pk=instance.pk)
+            .values(*blobs.FILE_FIELDS, *facets.FIELDS).first()
+        )
+
+
+# Подсчёт ссылок на файлы адресного хранилища (см. library/blobs.py)
+@receiver(post_save, sender=Book)
+def count_book_files(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    stored = getattr(instance, '_stored_values', None)
+    old = [stored[field] for field in blobs.FILE_FIELDS] if stored else []
+    added, removed = blobs.diff(old, blobs.book_file_names(instance))
+    blobs.acquire(added, using=using)
+    blobs.release(removed, using=using)
+
+
+@receiver(post_delete, sender=Book)
+def release_book_files(sender, instance, using=None, **kwargs):
+    blobs.release(blobs.book_file_names(instance), using=using)
+
+
+@receiver(books_bulk_created)
+def count_bulk_created_files(sender, books, using=None, **kwargs):
+    blobs.acquire([name for book in books for name in blobs.book_file_names(book)], using=using)
+
+
+# Счётчики фасетов (см. library/facets.py)
+@receiver(post_save, sender=Book)
+def count_book_facets(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    stored = getattr(instance, '_stored_values', None)
+    old = facets.book_values(stored) if stored else []
+    facets.apply(facets.diff(old, facets.book_values(instance)), using=using)
+
+
+@receiver(post_delete, sender=Book)
+def uncount_book_facets(sender, instance, using=None, **kwargs):
+    facets.apply(facets.diff(facets.book_values(instance), []), using=using)
+
+
+@receiver(books_bulk_created)
+def count_bulk_created_facets(sender, books, using=None, **kwargs):
+    facets.apply(facets.diff([], [pair for book in books for pair in facets.book_values(book)]), using=using)
+
+
+# Миниатюры обложек создаются фоновым заданием после фиксации транзакции
+@receiver(post_save, sender=Book)
+def schedule_cover_renditions(sender, instance, raw=False, using=None, **kwargs):
+    if raw or not thumbnails.needs_renditions(instance):
+        return
+    thumbnails.enqueue([instance], using=using)
+
+
+@receiver(books_bulk_created)
+def schedule_bulk_cover_renditions(sender, books, using=None, **kwargs):
+    thumbnails.enqueue([book for book in books if book.cover_image], using=using)
+
+
+# Текст файла книги для поиска по содержимому извлекается фоновым заданием
+@receiver(post_save, sender=Book)
+def schedule_content_index(sender, instance, raw=False, using=None, **kwargs):
+    if raw or not content.needs_indexing(instance):
+        return
+    content.enqueue([instance], using=using)
+
+
+@receiver(books_bulk_created)
+def schedule_bulk_content_index(sender, books, using=None, **kwargs):
+    content.enqueue([book for book in books if content.needs_indexing(book)], using=using)
+
+
+# Кэш токенов (CachedTokenAuthentication): сброс сразу и ещё раз после фиксации,
+# чтобы параллельный запрос не закэшировал состояние до изменения
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, using=None, **kwargs):
+    authentication.token_cache.invalidate(instance.key)
+    transaction.on_commit(lambda: authentication.token_cache.invalidate(instance.key), using=using)
+
+
+# любое сохранение пользователя: деактивация, смена пароля, прав
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_user_tokens(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    authentication.token_cache.invalidate_user(instance.pk)
+    transaction.on_commit(lambda: authentication.token_cache.invalidate_user(instance.pk), using=using)
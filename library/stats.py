@@ -0,0 +1,168 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import jobs
+from .models import Book, BookStat, Job
+
+logger = logging.getLogger(__name__)
+
+
+def score(views, downloads):
+    return views + settings.LIBRARY_POPULARITY_DOWNLOAD_WEIGHT * downloads
+
+
+class StatsBuffer:
+    """
+    Просмотры и скачивания книг в памяти процесса. Запрос только увеличивает
+    счётчик под блокировкой; в БД счётчики пишет фоновый поток раз в
+    LIBRARY_STATS_FLUSH_INTERVAL секунд одной транзакцией и ещё раз при выходе
+    процесса, поэтому публичный трафик не ждёт единственного писателя SQLite.
+    Запись включает enable() в точке входа сервера (wsgi.py, asgi.py); без неё
+    (тесты, команды manage.py) счётчики только копятся до явного flush().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._enabled = False
+        self._pid = None
+
+    def enable(self):
+        if not self._enabled:
+            self._enabled = True
+            # недописанные счётчики — при остановке процесса
+            atexit.register(self.flush)
+
+    def add(self, book_id, kind):
+        key = (book_id, timezone.localdate(), kind)
+        with self._lock:
+            self._pending[key] += 1
+        # поток запускается при первом событии в процессе, в том числе в каждом рабочем после fork
+        if self._enabled and self._pid != os.getpid():
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self.run, name='library-stats', daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.LIBRARY_STATS_FLUSH_INTERVAL)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать счётчики книг, повтор при следующей записи')
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        return pending
+
+    def flush(self, using=DEFAULT_DB_ALIAS):
+        """Записывает накопленные счётчики; при ошибке они возвращаются в буфер. Возвращает число строк."""
+        pending = self.take()
+        if not pending:
+            return 0
+        try:
+            return self.write(pending, using)
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+    def write(self, pending, using):
+        rows = defaultdict(Counter)
+        for (book_id, day, kind), count in pending.items():
+            rows[book_id, day][kind] += count
+
+        with transaction.atomic(using=using):
+            # книга могла быть удалена, пока счётчик копился
+            existing = set(
+                Book.objects.using(using).filter(pk__in={book_id for book_id, _ in rows}).order_by().values_list('id', flat=True)
+            )
+            rows = [
+                (book_id, day.isoformat(), counts['views'], counts['downloads'])
+                for (book_id, day), counts in rows.items() if book_id in existing
+            ]
+            with connections[using].cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {BookStat._meta.db_table} (book_id, day, views, downloads) VALUES (%s, %s, %s, %s) '
+                    'ON CONFLICT (book_id, day) DO UPDATE SET '
+                    'views = views + excluded.views, downloads = downloads + excluded.downloads',
+                    rows,
+                )
+
+            # популярность растёт сразу; выбывание старых дней — в ежедневном stats.rollup.
+            # Номер изменения каталога не выдаётся: выдачи ?ordering=-popularity не кэшируются
+            deltas = Counter()
+            for book_id, _, views, downloads in rows:
+                deltas[book_id] += score(views, downloads)
+            groups = defaultdict(list)
+            for book_id, delta in deltas.items():
+                groups[delta].append(book_id)
+            # один UPDATE на каждое различное приращение, а не на каждую книгу
+            for delta, book_ids in groups.items():
+                Book.objects.using(using).filter(pk__in=book_ids).update(popularity=F('popularity') + delta)
+        return len(rows)
+
+
+buffer = StatsBuffer()
+
+
+def record(book_id, kind):
+    # только память процесса: безопасно и из асинхронных представлений
+    buffer.add(book_id, kind)
+
+
+def is_full_download(request, response):
+    # докачка (Range не с начала файла) и HEAD не считаются отдельным скачиванием
+    if request.method != 'GET':
+        return False
+    if response.status_code == 200:
+        return True
+    return response.status_code == 206 and response.get('Content-Range', '').startswith('bytes 0-')
+
+
+def schedule_rollup(using=DEFAULT_DB_ALIAS):
+    """
+    Ставит stats.rollup на текущий день, если он ещё не ставился.
+    Вызывается периодически процессом обработчиков (run_workers).
+    """
+    key = f'stats.rollup:{timezone.localdate().isoformat()}'
+    if Job.objects.using(using).filter(name='stats.rollup', key=key).exists():
+        return None
+    return jobs.enqueue('stats.rollup', key=key, using=using)
+
+
+@jobs.task('stats.rollup')
+def rollup(using=DEFAULT_DB_ALIAS):
+    """Пересчитывает Book.popularity по BookStat за последние LIBRARY_POPULARITY_DAYS дней."""
+    since = timezone.localdate() - timedelta(days=settings.LIBRARY_POPULARITY_DAYS - 1)
+    recent = BookStat.objects.using(using).filter(day__gte=since).order_by()
+    scores = (
+        recent.filter(book=OuterRef('pk'))
+        .values('book')
+        .annotate(score=Sum(F('views') + settings.LIBRARY_POPULARITY_DOWNLOAD_WEIGHT * F('downloads')))
+        .values('score')
+    )
+    with transaction.atomic(using=using):
+        return (
+            Book.objects.using(using)
+            .filter(Q(popularity__gt=0) | Q(pk__in=recent.values('book')))
+            .update(popularity=Coalesce(Subquery(scores), 0))
+        )
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# books/ab/abcdef…(64).pdf
+HASHED_NAME_RE = re.compile(r'^(?:.+/)?([0-9a-f]{2})/(\1[0-9a-f]{62})(?:\.[\w-]+)?$')
+
+
+def hashed_digest(name):
+    # SHA-256 из адресного имени файла или None для обычного имени
+    match = HASHED_NAME_RE.match(name or '')
+    return match.group(2) if match else None
+
+
+@deconstructible(path='library.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, адресующее файлы по SHA-256 содержимого: upload_to/ab/<sha256>.<ext>.
+    Одинаковые файлы хранятся один раз, имя никогда не указывает на другое содержимое.
+    Удалением файлов управляет подсчёт ссылок (library/blobs.py), а не FileField.
+    """
+
+    def hashed_name(self, name, digest):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        ext = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + ext)
+
+    def get_available_name(self, name, max_length=None):
+        # итоговое имя определяется содержимым в _save, суффиксы не нужны
+        return name
+
+    def _save(self, name, content):
+        # хэш считается при записи во временный файл — содержимое читается один раз
+        incoming = self.path(posixpath.join(posixpath.dirname(name), f'.incoming-{uuid.uuid4().hex}'))
+        os.makedirs(os.path.dirname(incoming), exist_ok=True)
+        hasher = hashlib.sha256()
+        fd = os.open(incoming, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    f.write(chunk)
+            return self.store_hashed(incoming, name, hasher.hexdigest())
+        finally:
+            if os.path.exists(incoming):
+                os.remove(incoming)
+
+    def store_hashed(self, path, name, digest):
+        """
+        Перемещает локальный файл с уже известным SHA-256 на его адресное место.
+        Если такое содержимое уже хранится, файл просто удаляется.
+        Имя сначала закрепляется строкой Blob, чтобы сборка сирот (blobs.delete_orphans)
+        не удалила файл между проверкой и появлением ссылки на него.
+        """
+        from .blobs import pin
+
+        hashed = self.hashed_name(name, digest)
+        pin(hashed)
+        target = self.path(hashed)
+        if os.path.exists(target):
+            os.remove(path)
+            return hashed
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(os.path.dirname(target), self.directory_permissions_mode)
+        os.replace(path, target)
+        if self.file_permissions_mode is not None:
+            os.chmod(target, self.file_permissions_mode)
+        return hashed
@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from library import bench
+from library.admin import AuthorAdmin, BookAdmin
+from library.models import Author, Book
+
+CHANGELIST = '/admin/library/book/'
+
+
+class BookAdminTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def test_changelist_query_count_does_not_grow_with_catalog(self):
+        bench.seed_catalog(5, 10)
+        _, small = self.get(CHANGELIST)
+        bench.seed_catalog(40, 90, seed=1)
+        response, large = self.get(CHANGELIST)
+        self.assertEqual(response.context['cl'].result_count, 100)
+        self.assertEqual(len(large), len(small))
+        self.assertLessEqual(len(large), 6)
+        # ни DISTINCT для фильтров, ни отдельных запросов авторов по строкам
+        self.assertFalse([sql for sql in large if 'DISTINCT' in sql])
+        self.assertFalse([sql for sql in large if sql.startswith('SELECT') and 'FROM "library_author"' in sql])
+
+    def test_filters_from_facet_counts(self):
+        books = bench.seed_catalog(10, 50)
+        genre = books[0].genre
+        response, _ = self.get(CHANGELIST)
+        self.assertContains(response, f'{genre} ({Book.objects.filter(genre=genre).count()})')
+
+        response, _ = self.get(CHANGELIST, {'genre': genre, 'year': books[0].year})
+        expected = Book.objects.filter(genre=genre, year=books[0].year).count()
+        self.assertEqual(response.context['cl'].result_count, expected)
+
+    @override_settings(LIBRARY_ADMIN_COUNT_LIMIT=20)
+    def test_count_estimated_above_limit(self):
+        bench.seed_catalog(10, 50)
+        response, queries = self.get(CHANGELIST)
+        # без фильтров — точный размер из счётчиков фасетов, без COUNT(*) по всей таблице
+        self.assertEqual(response.context['cl'].result_count, 50)
+        self.assertTrue([sql for sql in queries if 'LIMIT 21' in sql and 'COUNT(*)' in sql])
+
+        # с поиском — оценка сверху по наибольшему id: все страницы остаются доступны
+        response, _ = self.get(CHANGELIST, {'q': 'а'})
+        cl = response.context['cl']
+        found = cl.queryset.count()
+        self.assertGreater(found, 20)
+        self.assertGreaterEqual(cl.result_count, found)
+        with mock.patch.object(BookAdmin, 'list_per_page', 10):
+            last = -(-found // 10)
+            response, _ = self.get(CHANGELIST, {'q': 'а', 'p': last})
+            self.assertEqual(len(response.context['cl'].result_list), found - (last - 1) * 10)
+
+    @override_settings(LIBRARY_ADMIN_COUNT_LIMIT=20)
+    def test_last_page_reachable_without_estimate_source(self):
+        bench.seed_catalog(45, 1)
+        with mock.patch.object(AuthorAdmin, 'list_per_page', 10):
+            response, _ = self.get('/admin/library/author/', {'p': 5})
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+
+    def test_change_form_does_not_list_all_authors(self):
+        books = bench.seed_catalog(60, 5)
+        response, queries = self.get(f'/admin/library/book/{books[0].pk}/change/')
+        self.assertLessEqual(len(queries), 6)
+        self.assertContains(response, books[0].author.name)
+        other = Author.objects.exclude(pk=books[0].author_id).first()
+        self.assertNotContains(response, other.name)
+
+        response, _ = self.get('/admin/autocomplete/', {
+            'app_label': 'library', 'model_name': 'book', 'field_name': 'author', 'term': other.name,
+        })
+        self.assertIn(other.name, [item['text'] for item in response.json()['results']])
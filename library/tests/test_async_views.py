@@ -0,0 +1,85 @@
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TestCase
+from rest_framework.test import APIClient
+
+from library.models import Author, Book
+from library.pagination import KeysetPagination
+from library.tests.mixins import TemporaryMediaMixin
+
+CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 40
+
+
+class AsyncReadAPITest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.client = AsyncClient()
+        self.author = Author.objects.create(name="Антуан де Сент-Экзюпери")
+        self.books = [
+            Book.objects.create(
+                title=title, author=self.author, year=year, genre="повесть",
+                category="художественная литература", publisher="Gallimard",
+                book_file=SimpleUploadedFile("prince.pdf", CONTENT),
+            )
+            for title, year in [("Маленький принц", 1943), ("Планета людей", 1939), ("Ночной полёт", 1931)]
+        ]
+
+    # синхронный API для сравнения вызывается в потоке, как под WSGI
+    async def sync_get(self, url, params=None):
+        return await sync_to_async(APIClient().get)(url, params or {})
+
+    async def sync_data(self, url, params=None):
+        return (await self.sync_get(url, params)).json()
+
+    async def test_book_list_matches_sync_api(self):
+        for params in [{}, {'search': "принц"}, {'year__gte': 1935}, {'page': 1}, {'fields': 'id,title'}]:
+            response = await self.client.get('/api/async/books/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content)['results'], (await self.sync_data('/api/books/', params))['results'])
+
+    async def test_book_list_cursor_pagination(self):
+        with mock.patch.object(KeysetPagination, 'page_size', 2):
+            first = json.loads((await self.client.get('/api/async/books/', {'count': 'true'})).content)
+            self.assertEqual(first['count'], 3)
+            self.assertIn('/api/async/books/', first['next'])
+            second = json.loads((await self.client.get(first['next'])).content)
+        titles = [book['title'] for book in first['results'] + second['results']]
+        self.assertEqual(titles, ["Маленький принц", "Ночной полёт", "Планета людей"])
+        self.assertIsNone(second['next'])
+
+    async def test_book_detail_and_errors(self):
+        book = self.books[0]
+        response = await self.client.get(f'/api/async/books/{book.pk}/')
+        self.assertEqual(response.content, (await self.sync_get(f'/api/books/{book.pk}/')).content)
+        self.assertEqual((await self.client.get('/api/async/books/999/')).status_code, 404)
+        response = await self.client.get('/api/async/books/', {'year': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('year', json.loads(response.content))
+        self.assertEqual((await self.client.post('/api/async/books/')).status_code, 405)
+
+    async def test_authors(self):
+        response = await self.client.get('/api/async/authors/', {'search': "экзюпери"})
+        self.assertEqual(json.loads(response.content)['results'],
+                         (await self.sync_data('/api/authors/', {'search': "экзюпери"}))['results'])
+        response = await self.client.get(f'/api/async/authors/{self.author.pk}/')
+        self.assertEqual(json.loads(response.content)['books_count'], 3)
+
+    async def test_download_streams_asynchronously(self):
+        url = f'/api/async/books/{self.books[0].pk}/download/'
+        response = await self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+
+        response = await self.client.get(url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), CONTENT[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+
+        response = await self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from library.authentication import token_cache
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.admin = User.objects.create_superuser(username='admin', password='admin123')
+        self.token = Token.objects.get(user=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_jobs(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/jobs/')
+        return response, queries
+
+    def test_token_resolved_once(self):
+        first, first_queries = self.get_jobs()
+        second, second_queries = self.get_jobs()
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(len(second_queries), len(first_queries) - 1)
+        self.assertNotIn('authtoken_token', ' '.join(query['sql'] for query in second_queries))
+
+    def test_invalid_token_same_error(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token missing')
+        response = self.client.get('/api/jobs/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(str(response.data['detail']), 'Недопустимый токен.')
+
+    def test_deactivation_invalidates(self):
+        self.get_jobs()
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.get_jobs()[0].status_code, 401)
+
+    def test_password_change_invalidates(self):
+        self.get_jobs()
+        self.admin.set_password('new-password')
+        self.admin.save()
+        self.assertEqual(len(token_cache._items), 0)
+
+    def test_token_delete_invalidates(self):
+        self.get_jobs()
+        self.token.delete()
+        self.assertEqual(self.get_jobs()[0].status_code, 401)
+
+    def test_returns_copy_of_user(self):
+        self.get_jobs()
+        response = self.client.get('/api/jobs/')
+        cached_user = token_cache.get(self.token.key)[0]
+        self.assertEqual(response.wsgi_request.user, cached_user)
+        self.assertIsNot(response.wsgi_request.user, cached_user)
+
+    @override_settings(LIBRARY_AUTH_CACHE_SIZE=1)
+    def test_lru_is_bounded(self):
+        other = User.objects.create_superuser(username='other', password='other123')
+        self.get_jobs()
+        APIClient(HTTP_AUTHORIZATION=f'Token {Token.objects.get(user=other).key}').get('/api/jobs/')
+        self.assertEqual(len(token_cache._items), 1)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(LIBRARY_AUTH_CACHE_TTL=60)
+    def test_entries_expire(self):
+        self.get_jobs()
+        with mock.patch('library.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(LIBRARY_AUTH_CACHE_TTL=300, LIBRARY_AUTH_CACHE_LOCAL_TTL=5)
+    def test_short_ttl_without_shared_cache(self):
+        # удаление токена в другом процессе без общего кэша видно через LOCAL_TTL секунд
+        with mock.patch('library.authentication.time.monotonic', return_value=1000):
+            self.get_jobs()
+        with mock.patch('library.authentication.time.monotonic', return_value=1006):
+            self.assertIsNone(token_cache.get(self.token.key))
+        with override_settings(LIBRARY_AUTH_CACHE_ALIAS='default'):
+            with mock.patch('library.authentication.time.monotonic', return_value=1000):
+                self.get_jobs()
+            with mock.patch('library.authentication.time.monotonic', return_value=1006):
+                self.assertIsNotNone(token_cache.get(self.token.key))
+
+    @override_settings(LIBRARY_AUTH_CACHE_ALIAS='default')
+    def test_shared_cache(self):
+        self.addCleanup(cache.clear)
+        self.get_jobs()
+        # другой процесс: локального LRU нет, запись берётся из общего кэша
+        token_cache._items.clear()
+        self.assertEqual(token_cache.get(self.token.key)[0].pk, self.admin.pk)
+        # инвалидация меняет общую версию — запись не видна ни одному процессу
+        token_cache.invalidate_user(12345)
+        token_cache._items.clear()
+        self.assertIsNone(token_cache.get(self.token.key))
@@ -0,0 +1,94 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library import cache, changes
+from library.autocomplete import PrefixIndex, autocomplete
+from library.models import Author, Book
+
+
+class PrefixIndexTest(TransactionTestCase):
+    def test_matches_word_starts_once_per_item(self):
+        index = PrefixIndex([
+            ('book', 1, "Маленький принц", "маленький принц"),
+            ('book', 2, "Принц и нищий", "принц и нищий"),
+            ('author', 3, "Фёдор Достоевский", "федор достоевский"),
+            ('book', 4, "Принц принцев", "принц принцев"),
+        ])
+        self.assertEqual([pk for _, pk, _ in index.lookup("принц")], [1, 2, 4])
+        self.assertEqual(index.lookup("ФЁДОР"), [('author', 3, "Фёдор Достоевский")])
+        self.assertEqual(index.lookup("маленький при"), [('book', 1, "Маленький принц")])
+        self.assertEqual(index.lookup("принц", limit=1), [('book', 1, "Маленький принц")])
+        self.assertEqual(index.lookup("  «»"), [])
+        self.assertGreater(index.memory(), 0)
+
+
+# Индекс сохраняется только вне транзакции, поэтому тесты работают в режиме autocommit
+class AutocompleteAPITest(TransactionTestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        # очистка таблиц между тестами сбрасывает счётчик изменений — версии повторяются
+        autocomplete.index = PrefixIndex()
+        self.client = APIClient()
+        self.author = Author.objects.create(name="Антуан де Сент-Экзюпери")
+        self.book = Book.objects.create(
+            title="Маленький принц", author=self.author, year=1943, genre="повесть",
+            category="художественная литература", publisher="Gallimard", book_file='books/book.pdf',
+        )
+
+    def tearDown(self):
+        cache.get_cache().clear()
+
+    def labels(self, q, **params):
+        response = self.client.get('/api/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['label']) for item in response.data['results']]
+
+    def test_books_and_authors(self):
+        self.assertEqual(self.labels("мален"), [('book', "Маленький принц")])
+        self.assertEqual(self.labels("экзюп"), [('author', "Антуан де Сент-Экзюпери")])
+        self.assertEqual(self.labels(""), [])
+
+    def test_index_is_reused_until_catalog_changes(self):
+        self.labels("мален")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.labels("принц"), [('book', "Маленький принц")])
+        # только чтение версии каталога, индекс не перестраивается
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('library_sequence', ctx.captured_queries[0]['sql'])
+
+        self.book.title = "Планета людей"
+        self.book.save()
+        self.assertEqual(self.labels("принц"), [])
+        self.assertEqual(self.labels("планета"), [('book', "Планета людей")])
+
+    def test_change_from_other_process_rebuilds_index(self):
+        self.assertEqual(self.labels("мален"), [('book', "Маленький принц")])
+        # так пишет другой процесс: строка и номер изменения в БД, локальный кэш не трогается
+        Book.objects.filter(pk=self.book.pk).update(
+            title="Планета людей", title_norm="планета людей", change_seq=changes.next_seq()
+        )
+        self.assertEqual(autocomplete.lookup("мален"), [])
+        self.assertEqual(autocomplete.lookup("планета"), [('book', self.book.pk, "Планета людей")])
+
+    def test_lookup_on_large_catalog(self):
+        Author.objects.bulk_create([Author(name=f"Автор {i}", name_norm=f"автор {i}") for i in range(5000)])
+        cache.bump_catalog_version()
+        results = autocomplete.lookup("автор 12", limit=10)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(label.startswith("Автор 12") for _, _, label in results))
+        self.assertEqual(autocomplete.stats()['items'], 5002)
+        # время построения только сообщается в статистике, порог не проверяется
+        self.assertIsNotNone(autocomplete.stats()['build_ms'])
+
+    def test_stats_for_admin_only(self):
+        self.labels("мален")
+        self.assertEqual(self.client.get('/api/autocomplete/stats/').status_code, 401)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/autocomplete/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items'], 2)
+        self.assertGreater(response.data['memory_bytes'], 0)
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+
+from library import bench, content, facets, search
+from library.models import Author, Book, BookPage, FacetCount, Job
+from library.tests.mixins import TemporaryMediaMixin
+
+
+class SeedCatalogTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+    def test_catalog_consistent_with_indexes(self):
+        out = StringIO()
+        call_command('seed_catalog', authors=30, books=200, files=3, seed=7, stdout=out)
+        self.assertIn('добавлено книг: 200', out.getvalue())
+        self.assertEqual(Author.objects.count(), 30)
+        self.assertEqual(Book.objects.count(), 200)
+        self.assertTrue(all(author.biography.startswith('Родил') for author in Author.objects.all()))
+
+        # файлы из пула с уже извлечённым текстом: заданий извлечения нет
+        books = list(Book.objects.all())
+        self.assertEqual(len({book.book_file.name for book in books}), 3)
+        self.assertTrue(all(content.is_indexed(book) for book in books))
+        self.assertEqual(BookPage.objects.count(), sum(book.content_index['pages'] for book in books))
+        self.assertFalse(Job.objects.exists())
+
+        # полнотекстовый индекс и счётчики фасетов обновлены без пересборки
+        found = search.search_books(Book.objects.all(), books[0].title.split()).values_list('id', flat=True)
+        self.assertIn(books[0].pk, list(found))
+        stored = set(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'))
+        facets.rebuild()
+        self.assertEqual(set(FacetCount.objects.values_list('facet', 'value', 'count')), stored)
+
+    def test_same_seed_same_catalog_and_rerun_adds_books(self):
+        first = [(book.title, book.author.name, book.year) for book in bench.seed_catalog(5, 20, seed=3)]
+        second = bench.seed_catalog(5, 20, seed=3)
+        self.assertEqual(Author.objects.count(), 5)
+        self.assertEqual(Book.objects.count(), 40)
+        # то же зерно — те же названия; совпадения разводятся годом
+        self.assertEqual([book.title for book in second], [title for title, _, _ in first])
+
+
+class BenchAPITest(TestCase):
+    # замер читает через алиас для чтения, как сервер
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.baseline = os.path.join(directory, 'baseline.json')
+
+    def bench(self, **options):
+        out = StringIO()
+        options = {'authors': 5, 'books': 30, **options}
+        call_command('bench_api', requests=5, warmup=1, stdout=out, stderr=StringIO(), **options)
+        return json.loads(out.getvalue())
+
+    def test_reports_all_scenarios_on_throwaway_database(self):
+        result = self.bench(save_baseline=self.baseline)
+        self.assertEqual(set(result['scenarios']), {'book_list', 'book_search', 'book_retrieve', 'author_list', 'book_create'})
+        for stats in result['scenarios'].values():
+            self.assertLessEqual(stats['p50'], stats['p95'])
+            self.assertLessEqual(stats['p95'], stats['p99'])
+            self.assertGreater(stats['rps'], 0)
+        # вне транзакции, как на сервере: повторный список отдаётся из кэша ответов,
+        # из SQL — только чтение версии каталога
+        self.assertEqual(result['scenarios']['book_list']['queries'], 1)
+        self.assertGreater(result['scenarios']['book_retrieve']['queries'], 0)
+        self.assertGreater(result['scenarios']['book_create']['queries'], 0)
+        with open(self.baseline, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), result)
+        self.assertFalse(Book.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_regression_against_baseline_fails(self):
+        result = self.bench(scenario=['book_retrieve'])
+        result['scenarios']['book_retrieve'].update(p50=0.0, p95=0.0, queries=0)
+        with open(self.baseline, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        with self.assertRaisesMessage(CommandError, 'book_retrieve: SQL-запросов'):
+            self.bench(scenario=['book_retrieve'], baseline=self.baseline)
+
+        result['scenarios']['book_retrieve'].update(p50=1e6, p95=1e6, queries=100)
+        with open(self.baseline, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        self.bench(scenario=['book_retrieve'], baseline=self.baseline)
+
+
+class BenchAPICopyTest(TransactionTestCase):
+    # копируется зафиксированный каталог: тест без общей транзакции
+    databases = {'default', 'replica'}
+
+    def test_current_catalog_measured_on_copy(self):
+        bench.seed_catalog(3, 7)
+        out = StringIO()
+        call_command('bench_api', books=0, requests=3, warmup=1, scenario=['book_list', 'book_create'],
+                     stdout=out, stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue())['catalog'], {'authors': 3, 'books': 7})
+        # книги из сценария book_create остались в копии
+        self.assertEqual(Book.objects.count(), 7)
@@ -0,0 +1,107 @@
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library import cache, changes
+from library.models import Author, Book
+
+
+# Кэш обходит запросы внутри транзакции, поэтому тесты работают в режиме autocommit
+class ResponseCacheTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.get_cache().clear()
+        cache.stats.reset()
+        self.client = APIClient()
+        self.author = Author.objects.create(name="Лев Толстой")
+        self.book = Book.objects.create(
+            title="Война и мир",
+            author=self.author,
+            year=1869,
+            genre="роман",
+            category="художественная литература",
+            publisher="Русский вестник",
+            book_file='books/book.pdf',
+        )
+
+    def tearDown(self):
+        cache.get_cache().clear()
+
+    def version_query_only(self, ctx, replica_ctx):
+        # при попадании — только чтение версии каталога (номера изменения) из БД
+        queries = [query['sql'] for query in ctx.captured_queries + replica_ctx.captured_queries]
+        self.assertEqual(len(queries), 1)
+        self.assertIn('library_sequence', queries[0])
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/books/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connections['default']) as ctx, \
+                CaptureQueriesContext(connections['replica']) as replica_ctx:
+            second = self.client.get('/api/books/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.version_query_only(ctx, replica_ctx)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(cache.stats.snapshot(), {'hits': 1, 'misses': 1, 'not_modified': 0})
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(f'/api/books/{self.book.id}/')['ETag']
+        with CaptureQueriesContext(connections['default']) as ctx, \
+                CaptureQueriesContext(connections['replica']) as replica_ctx:
+            response = self.client.get(f'/api/books/{self.book.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.version_query_only(ctx, replica_ctx)
+        self.assertEqual(cache.stats.snapshot()['not_modified'], 1)
+
+    def test_query_params_are_normalized(self):
+        self.client.get('/api/books/?search=война&count=1')
+        response = self.client.get('/api/books/?count=1&search=война&cursor=')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.client.get('/api/books/?search=мир')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_changes_invalidate_cached_responses(self):
+        etag = self.client.get('/api/books/')['ETag']
+        self.book.title = "Анна Каренина"
+        self.book.save()
+
+        response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], "Анна Каренина")
+
+        self.client.get('/api/authors/')
+        self.author.delete()
+        response = self.client.get('/api/authors/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'], [])
+
+    def test_change_in_another_process_invalidates(self):
+        # другой воркер или команда: кэш ответов этого процесса не трогается, меняется только БД
+        self.client.get('/api/books/')
+        Book.objects.filter(pk=self.book.pk).update(title="Анна Каренина", change_seq=changes.next_seq())
+        response = self.client.get('/api/books/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], "Анна Каренина")
+
+    def test_popularity_ordering_is_not_cached(self):
+        # популярность пишется пачками без номера изменения (library/stats.py)
+        self.client.get('/api/books/', {'ordering': '-popularity'})
+        response = self.client.get('/api/books/', {'ordering': '-popularity'})
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(self.client.get('/api/books/')['X-Cache'], 'MISS')
+
+    def test_browsable_api_is_not_cached(self):
+        self.client.get('/api/books/', HTTP_ACCEPT='text/html')
+        response = self.client.get('/api/books/', HTTP_ACCEPT='text/html')
+        self.assertNotIn('X-Cache', response)
+
+    @override_settings(LIBRARY_RESPONSE_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        self.client.get('/api/books/')
+        response = self.client.get('/api/books/')
+        self.assertNotIn('X-Cache', response)
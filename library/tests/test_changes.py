@@ -0,0 +1,87 @@
+import io
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from library import changes
+from library.importers import BookImporter, read_rows
+from library.models import Author, Book, Tombstone
+
+
+class ChangeFeedTest(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name="Лев Толстой")
+        self.book = self.create_book("Война и мир")
+
+    def create_book(self, title):
+        return Book.objects.create(
+            title=title, author=self.author, year=1869, genre="роман",
+            category="художественная литература", publisher="Русский вестник", book_file='books/x.pdf',
+        )
+
+    def ops(self, since=0, **kwargs):
+        return [(c['type'], c['op'], c['id']) for c in changes.feed(since, **kwargs)['changes']]
+
+    def test_saves_get_increasing_numbers_and_timestamps(self):
+        self.assertLess(self.author.change_seq, self.book.change_seq)
+        self.assertIsNotNone(self.book.created_at)
+        before = self.book.change_seq
+        self.book.title = "Анна Каренина"
+        self.book.save(update_fields=['title'])
+        self.book.refresh_from_db()
+        self.assertGreater(self.book.change_seq, before)
+        self.assertGreaterEqual(self.book.updated_at, self.book.created_at)
+
+    def test_feed_in_commit_order_with_latest_state(self):
+        cursor = changes.feed()['cursor']
+        second = self.create_book("Анна Каренина")
+        self.book.year = 1868
+        self.book.save()
+        self.assertEqual(self.ops(cursor), [('book', 'upsert', second.pk), ('book', 'upsert', self.book.pk)])
+        self.assertEqual(changes.feed(cursor)['changes'][1]['data']['year'], 1868)
+
+    def test_deletes_leave_tombstones(self):
+        cursor = changes.feed()['cursor']
+        book_id, author_id = self.book.pk, self.author.pk
+        self.author.delete()
+        self.assertEqual(self.ops(cursor), [('book', 'delete', book_id), ('author', 'delete', author_id)])
+        self.assertEqual(Tombstone.objects.count(), 2)
+
+    def test_cursor_pages_through_all_changes(self):
+        for i in range(5):
+            self.create_book(f"Книга {i}")
+        seen = []
+        cursor = 0
+        while True:
+            page = changes.feed(cursor, limit=2)
+            seen += [change['seq'] for change in page['changes']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(changes.feed(cursor)['changes'], [])
+        self.assertEqual(changes.feed(cursor)['cursor'], cursor)
+
+    def test_bulk_import_is_numbered(self):
+        cursor = changes.feed()['cursor']
+        content = (
+            'title,author,year,genre,category,publisher,book_type,book_file\n'
+            'Бесы,Фёдор Достоевский,1872,роман,классика,Эксмо,fiction,books/1.pdf\n'
+        )
+        BookImporter().run(read_rows(io.BytesIO(content.encode('utf-8')), 'csv'))
+        self.assertEqual([(kind, op) for kind, op, _ in self.ops(cursor)], [('author', 'upsert'), ('book', 'upsert')])
+
+    def test_api(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/changes/').status_code, 401)
+        client.force_authenticate(User.objects.create_user('mirror', password='password'))
+        self.assertEqual(client.get('/api/changes/', {'since': 'abc'}).status_code, 400)
+        response = client.get('/api/changes/', {'since': 0, 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changes'][0]['data']['name'], "Лев Толстой")
+        self.assertTrue(response.data['has_more'])
+        response = client.get('/api/changes/', {'since': response.data['cursor']})
+        self.assertEqual(response.data['changes'][0]['data']['title'], "Война и мир")
+        self.assertFalse(response.data['has_more'])
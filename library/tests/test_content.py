@@ -0,0 +1,227 @@
+import io
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from library import content, extraction
+from library.models import Author, Book, BookPage
+from library.pagination import UncountedPageNumberPagination
+from library.tests.mixins import TemporaryMediaMixin
+
+
+def epub(chapters):
+    # минимальный EPUB: главы — тела XHTML в порядке spine
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip')
+        archive.writestr('META-INF/container.xml', (
+            '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>'
+        ))
+        items = ''.join(
+            f'<item id="c{i}" href="text/c{i}.xhtml" media-type="application/xhtml+xml"/>' for i in range(len(chapters))
+        )
+        # порядок чтения задаёт spine, а не manifest
+        spine = ''.join(f'<itemref idref="c{i}"/>' for i in range(len(chapters)))
+        archive.writestr('OEBPS/content.opf', (
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            f'<manifest>{items}<item id="css" href="style.css" media-type="text/css"/></manifest>'
+            f'<spine>{spine}</spine></package>'
+        ))
+        for i, body in enumerate(chapters):
+            archive.writestr(f'OEBPS/text/c{i}.xhtml', (
+                '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Глава</title>'
+                f'<style>p {{ margin: 0 }}</style></head><body>{body}</body></html>'
+            ))
+    return buffer.getvalue()
+
+
+def pdf(pages):
+    # минимальный PDF со стандартным шрифтом Helvetica (только латиница)
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in pages:
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1')
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream.decode("latin-1")}\nendstream')
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>'
+        )
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+    output = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    output += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    output += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    return output
+
+
+class ExtractionTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, data):
+        path = f'{self.directory}/{name}'
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_pdf_pages(self):
+        path = self.write('book.pdf', pdf(['First page text', 'Second page about dragons']))
+        self.assertEqual(extraction.extract_pages(path), ['First page text', 'Second page about dragons'])
+
+    def test_epub_chapters_split_into_pages(self):
+        long_chapter = ''.join(f'<p>Абзац {i} {"текст " * 60}</p>' for i in range(20))
+        path = self.write('book.epub', epub([
+            '<h1>Глава первая</h1><p>Ёлка &amp; <b>лес</b></p><script>var x = 1;</script>',
+            long_chapter,
+        ]))
+        pages = extraction.extract_pages(path)
+        self.assertEqual(pages[0], 'Глава первая\n\nЁлка & лес')
+        self.assertGreater(len(pages), 3)
+        self.assertTrue(all(len(page) <= extraction.EPUB_PAGE_CHARS for page in pages[1:]))
+        self.assertTrue(pages[1].startswith('Абзац 0 текст'))
+
+    def test_broken_and_unsupported_files(self):
+        with self.assertRaises(extraction.ExtractionError):
+            extraction.extract_pages(self.write('broken.pdf', b'%PDF-1.4 broken'))
+        with self.assertRaises(extraction.ExtractionError):
+            extraction.extract_pages(self.write('broken.epub', b'not a zip'))
+        with self.assertRaises(extraction.ExtractionError):
+            extraction.extract_pages(self.write('book.txt', b'text'))
+
+    def test_snippet_marks_normalized_matches_and_escapes(self):
+        text = 'Начало. ' + 'слово ' * 40 + 'Зелёная <ёлка> стояла, ЁЛКИ росли. ' + 'конец ' * 40
+        result = content.snippet(text, content.search_terms('елк'))
+        self.assertIn('&lt;<mark>ёлка</mark>&gt; стояла, <mark>ЁЛКИ</mark> росли', result)
+        self.assertTrue(result.startswith('…') and result.endswith('…'))
+        self.assertEqual(len(result.replace('<mark>', '').replace('</mark>', '').split()), content.SNIPPET_WORDS)
+
+
+@override_settings(LIBRARY_JOBS_EAGER=True, LIBRARY_CONTENT_WORKERS=0)
+class ContentSearchTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.author = Author.objects.create(name="Фёдор Достоевский")
+
+    def create_book(self, title, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Book.objects.create(
+                title=title, author=self.author, year=1866, genre="роман",
+                category="художественная литература", publisher="Русский вестник", book_file=file,
+            )
+
+    def search(self, q, **params):
+        response = self.client.get('/api/books/content-search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_indexed_after_upload_and_found_with_snippets(self):
+        book = self.create_book("Преступление и наказание", SimpleUploadedFile('crime.epub', epub([
+            '<p>Раскольников вышел на улицу.</p>',
+            '<p>' + 'Прошло время. ' * 200 + '</p><p>Старуха-процентщица жила на четвёртом этаже.</p>',
+        ])))
+        book.refresh_from_db()
+        self.assertEqual(book.content_index, {'source': book.book_file.name, 'pages': 3})
+        self.create_book("Двойник", SimpleUploadedFile('double.pdf', pdf(['Golyadkin', 'Nothing here'])))
+
+        data = self.search('четвертом этаже')
+        self.assertEqual(len(data['results']), 1)
+        hit = data['results'][0]
+        self.assertEqual((hit['id'], hit['title'], hit['author_name']), (book.pk, "Преступление и наказание", "Фёдор Достоевский"))
+        self.assertEqual([page['page'] for page in hit['pages']], [3])
+        self.assertIn('на <mark>четвёртом</mark> <mark>этаже</mark>', hit['pages'][0]['snippet'])
+
+        self.assertEqual([hit['title'] for hit in self.search('golyadkin')['results']], ["Двойник"])
+        self.assertEqual(self.search('бесы')['results'], [])
+
+    def test_books_ranked_and_paginated(self):
+        for title, mentions in [("Бедные люди", 1), ("Игрок", 5), ("Идиот", 3)]:
+            self.create_book(title, SimpleUploadedFile(f'{mentions}.epub', epub([
+                '<p>' + 'рулетка ' * mentions + 'и прочее ' * 20 + '</p>',
+            ])))
+        data = self.search('рулетка', count='true')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([hit['title'] for hit in data['results']], ["Игрок", "Идиот", "Бедные люди"])
+        self.assertIsNone(data['next'])
+        with mock.patch.object(UncountedPageNumberPagination, 'page_size', 2):
+            first = self.search('рулетка')
+            self.assertEqual(len(first['results']), 2)
+            second = self.client.get(first['next']).json()
+        self.assertEqual([hit['title'] for hit in second['results']], ["Бедные люди"])
+        self.assertEqual(self.client.get('/api/books/content-search/').status_code, 400)
+
+    def test_reupload_updates_changed_pages_only(self):
+        chapters = ['<p>Глава один.</p>', '<p>Глава два.</p>', '<p>Глава три, черновик.</p>']
+        book = self.create_book("Записки из подполья", SimpleUploadedFile('notes.epub', epub(chapters)))
+        before = dict(BookPage.objects.filter(book=book).values_list('number', 'id'))
+        self.assertEqual(len(before), 3)
+
+        book.book_file = SimpleUploadedFile('notes.epub', epub(chapters[:2] + ['<p>Глава три, окончательная.</p>']))
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        after = dict(BookPage.objects.filter(book=book).values_list('number', 'id'))
+        self.assertEqual(after, before)
+        self.assertEqual(BookPage.objects.get(book=book, number=3).text, 'Глава три, окончательная.')
+        self.assertEqual(self.search('черновик')['results'], [])
+        self.assertEqual(len(self.search('окончательная')['results']), 1)
+
+        book.delete()
+        self.assertEqual(self.search('глава')['results'], [])
+
+    def test_broken_file_recorded_without_retries(self):
+        book = self.create_book("Бесы", SimpleUploadedFile('demons.pdf', b'%PDF-1.4 broken'))
+        book.refresh_from_db()
+        self.assertEqual(book.content_index['pages'], 0)
+        self.assertIn('PDF', book.content_index['error'])
+
+    def test_backfill_command(self):
+        book = self.create_book("Подросток", SimpleUploadedFile('teen.pdf', pdf(['Arkady Dolgoruky'])))
+        Book.objects.filter(pk=book.pk).update(content_index={})
+        BookPage.objects.all().delete()
+
+        out = StringIO()
+        call_command('backfill_content', stdout=out, stderr=StringIO())
+        self.assertIn('Обработано книг: 1, изменено страниц: 1', out.getvalue())
+        self.assertEqual([hit['id'] for hit in self.search('dolgoruky')['results']], [book.pk])
+
+        out = StringIO()
+        call_command('backfill_content', stdout=out)
+        self.assertIn('Обработано книг: 0', out.getvalue())
+
+    def test_backfill_continues_after_unexpected_error(self):
+        broken = self.create_book("Бесы", SimpleUploadedFile('demons.pdf', pdf(['Stavrogin'])))
+        book = self.create_book("Подросток", SimpleUploadedFile('teen.pdf', pdf(['Arkady Dolgoruky'])))
+        Book.objects.update(content_index={})
+        BookPage.objects.all().delete()
+        extract_pages = extraction.extract_pages
+
+        def extract(path):
+            if path == broken.book_file.path:
+                raise ValueError('неожиданная ошибка')
+            return extract_pages(path)
+
+        out, err = StringIO(), StringIO()
+        with mock.patch.object(extraction, 'extract_pages', extract), \
+                self.assertLogs('library.management.commands.backfill_content', 'ERROR'):
+            call_command('backfill_content', workers=0, stdout=out, stderr=err)
+        self.assertIn('Обработано книг: 1, изменено страниц: 1, ошибок: 1', out.getvalue())
+        self.assertIn('неожиданная ошибка', err.getvalue())
+        broken.refresh_from_db()
+        self.assertEqual(broken.content_index['error'], 'ValueError: неожиданная ошибка')
+        self.assertEqual([hit['id'] for hit in self.search('dolgoruky')['results']], [book.pk])
@@ -0,0 +1,102 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library import routers
+from library.management.commands.stress_db import connect, profile_settings
+from library.models import Author, Book
+
+
+class SQLiteProfileTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_setup_applies_pragmas(self):
+        write_db, read_db = profile_settings('settings', self.path)
+        connection = connect(write_db)
+        self.addCleanup(connection.close)
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 10000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x integer)')
+
+        reader = connect(read_db)
+        self.addCleanup(reader.close)
+        self.assertEqual(self.pragma(reader, 'query_only'), 1)
+        self.assertEqual(self.pragma(reader, 'journal_mode'), 'wal')
+        with self.assertRaises(OperationalError), reader.cursor() as cursor:
+            cursor.execute('INSERT INTO t VALUES (1)')
+
+    def test_development_profile_by_default(self):
+        # тесты и команды manage.py без LIBRARY_DB_PROFILE=production: соединение на запрос
+        for alias in ('default', 'replica'):
+            self.assertEqual(connections[alias].settings_dict['CONN_MAX_AGE'], 0)
+        self.assertNotIn('transaction_mode', connections['default'].settings_dict['OPTIONS'])
+        # режим журнала хранится в файле базы: без профиля production он не меняется
+        for alias in ('default', 'replica'):
+            self.assertNotIn('journal_mode', connections[alias].settings_dict['OPTIONS']['init_command'])
+
+    def test_concurrent_writers_and_readers_without_lock_errors(self):
+        out = io.StringIO()
+        call_command(
+            'stress_db', profile='settings', writers=4, readers=8, duration=1.0, stdout=out,
+        )
+        row = out.getvalue().splitlines()[-1].split()
+        self.assertEqual(row[0], 'settings')
+        self.assertGreater(float(row[1]), 0)
+        self.assertEqual(row[-1], '0')
+
+
+class ReadReplicaRouterTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.client = APIClient()
+        author = Author.objects.create(name="Лев Толстой")
+        self.book = Book.objects.create(title="Война и мир", author=author, year=1869, book_file='books/book.pdf')
+
+    def queries(self, func):
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            func()
+        return len(default.captured_queries), len(replica.captured_queries)
+
+    def test_list_and_retrieve_read_through_replica(self):
+        for url in ['/api/books/', f'/api/books/{self.book.pk}/', '/api/authors/']:
+            default, replica = self.queries(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+            self.assertEqual(default, 0, url)
+            self.assertGreater(replica, 0, url)
+
+    def test_other_reads_and_writes_use_default(self):
+        default, replica = self.queries(lambda: list(Book.objects.all()))
+        self.assertEqual((default > 0, replica), (True, 0))
+        with routers.read_replica():
+            self.assertEqual(Book.objects.db_manager().all().db, 'replica')
+            book = Book.objects.get(pk=self.book.pk)
+            book.title = "Анна Каренина"
+            default, replica = self.queries(book.save)
+            self.assertEqual((default > 0, replica), (True, 0))
+            # внутри транзакции чтение видит свои незафиксированные изменения
+            with transaction.atomic():
+                Book.objects.filter(pk=self.book.pk).update(year=1877)
+                self.assertEqual(Book.objects.get(pk=self.book.pk).year, 1877)
+
+    def test_replica_is_not_migrated(self):
+        router = routers.ReadReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'library'))
+        self.assertIsNone(router.allow_migrate('default', 'library'))
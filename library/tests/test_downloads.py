@@ -0,0 +1,84 @@
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from library.models import Author, Book
+from library.tests.mixins import TemporaryMediaMixin
+
+CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 40
+
+
+class BookDownloadTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.client = APIClient()
+        author = Author.objects.create(name="Антуан де Сент-Экзюпери")
+        self.book = Book.objects.create(
+            title="Маленький принц",
+            author=author,
+            year=1943,
+            genre="повесть",
+            category="художественная литература",
+            publisher="Gallimard",
+            book_file=SimpleUploadedFile("prince.pdf", CONTENT),
+        )
+        self.url = f'/api/books/{self.book.id}/download/'
+
+    def test_full_download(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+        self.assertEqual(response['Content-Length'], '100')
+
+    def test_open_and_suffix_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-10:])
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT) - 5}-')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_multiple_ranges_fall_back_to_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    @override_settings(LIBRARY_DOWNLOAD_OFFLOAD='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.book.book_file.name)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(LIBRARY_DOWNLOAD_OFFLOAD='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.book.book_file.path)
+
+    def test_missing_book(self):
+        self.assertEqual(self.client.get('/api/books/999/download/').status_code, 404)
@@ -0,0 +1,87 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library import exporters
+from library.importers import BookImporter, read_rows
+from library.models import Author, Book
+
+
+class CatalogExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name="Лев Толстой")
+        for i in range(5):
+            Book.objects.create(
+                title=f"Книга, «{i}»", author=author, year=1900 + i, genre="роман",
+                category="художественная литература", publisher="Эксмо", book_file=f'books/{i}.pdf',
+            )
+        cls.user = User.objects.create_user('partner', password='password')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ndjson_rows_from_a_single_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            content = b''.join(exporters.export_catalog('ndjson', chunk_size=2))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        rows = [json.loads(line) for line in content.decode('utf-8').splitlines()]
+        self.assertEqual([row['title'] for row in rows], [f"Книга, «{i}»" for i in range(5)])
+        self.assertEqual(rows[0]['author'], "Лев Толстой")
+        self.assertEqual(list(rows[0]), exporters.FIELDS)
+
+    def test_csv_streamed_in_small_chunks(self):
+        original = exporters.BUFFER_SIZE
+        exporters.BUFFER_SIZE = 100
+        try:
+            chunks = list(exporters.export_catalog('csv'))
+        finally:
+            exporters.BUFFER_SIZE = original
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[4]['title'], "Книга, «4»")
+
+    def test_export_can_be_imported(self):
+        content = b''.join(exporters.export_catalog('csv'))
+        Book.objects.all().delete()
+        report = BookImporter().run(read_rows(io.BytesIO(content), 'csv'))
+        self.assertEqual((report['created'], report['failed']), (5, 0))
+
+    def test_api_export_gzip(self):
+        response = self.client.get('/api/books/export/', {'as': 'csv'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(len(content.splitlines()), 6)
+
+    def test_api_export_plain_ndjson(self):
+        response = self.client.get('/api/books/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+
+    def test_api_export_requires_authentication_and_known_format(self):
+        self.assertEqual(self.client.get('/api/books/export/', {'as': 'xml'}).status_code, 400)
+        self.assertEqual(APIClient().get('/api/books/export/').status_code, 401)
+
+    def test_command_writes_gzip_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'catalog.ndjson.gz')
+            call_command('export_catalog', '--gzip', '-o', path, stderr=StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8') as stream:
+                self.assertEqual(len(stream.readlines()), 5)
@@ -0,0 +1,95 @@
+import io
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from library import facets
+from library.importers import BookImporter, read_rows
+from library.models import Author, Book, FacetCount
+
+
+class FacetCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tolstoy = Author.objects.create(name="Лев Толстой")
+        self.chekhov = Author.objects.create(name="Антон Чехов")
+
+    def create_book(self, title, author, year, genre="роман", book_type='fiction', publisher="Эксмо"):
+        return Book.objects.create(
+            title=title, author=author, year=year, genre=genre, category="художественная литература",
+            publisher=publisher, book_type=book_type, book_file='books/x.pdf',
+        )
+
+    def stored(self, facet):
+        return dict(FacetCount.objects.filter(facet=facet).values_list('value', 'count'))
+
+    def test_counts_follow_save_and_delete(self):
+        war = self.create_book("Война и мир", self.tolstoy, 1869)
+        self.create_book("Анна Каренина", self.tolstoy, 1877)
+        cherry = self.create_book("Вишнёвый сад", self.chekhov, 1904, genre="пьеса")
+        self.assertEqual(self.stored('genre'), {'роман': 2, 'пьеса': 1})
+        self.assertEqual(self.stored('author'), {str(self.tolstoy.id): 2, str(self.chekhov.id): 1})
+
+        war.genre = "эпопея"
+        war.save()
+        self.assertEqual(self.stored('genre'), {'роман': 1, 'пьеса': 1, 'эпопея': 1})
+
+        cherry.delete()
+        self.assertEqual(self.stored('genre'), {'роман': 1, 'эпопея': 1})
+        self.assertNotIn(str(self.chekhov.id), self.stored('author'))
+
+    def test_author_delete_cascades(self):
+        self.create_book("Вишнёвый сад", self.chekhov, 1904)
+        self.chekhov.delete()
+        self.assertFalse(FacetCount.objects.exists())
+
+    def test_bulk_import_updates_counts(self):
+        content = 'title,author,year,genre,category,publisher,book_type,book_file\n' + ''.join(
+            f'Книга {i},Лев Толстой,{2000 + i % 2},роман,учебник,Эксмо,textbook,books/{i}.pdf\n' for i in range(5)
+        )
+        BookImporter().run(read_rows(io.BytesIO(content.encode('utf-8')), 'csv'))
+        self.assertEqual(self.stored('year'), {'2000': 3, '2001': 2})
+        self.assertEqual(self.stored('book_type'), {'textbook': 5})
+
+    def test_rebuild_matches_incremental(self):
+        self.create_book("Война и мир", self.tolstoy, 1869)
+        self.create_book("Каштанка", self.chekhov, 1887, genre="рассказ", book_type='textbook')
+        incremental = sorted(FacetCount.objects.values_list('facet', 'value', 'count'))
+        FacetCount.objects.all().delete()
+        call_command('rebuild_facets', stdout=StringIO())
+        self.assertEqual(sorted(FacetCount.objects.values_list('facet', 'value', 'count')), incremental)
+
+    def test_endpoint_reads_counter_table(self):
+        self.create_book("Война и мир", self.tolstoy, 1869)
+        self.create_book("Анна Каренина", self.tolstoy, 1877)
+        self.create_book("Вишнёвый сад", self.chekhov, 1904, genre="пьеса")
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/books/facets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['facets']['genre'][0], {'value': 'роман', 'count': 2})
+        self.assertEqual(response.data['facets']['author'][0],
+                         {'value': self.tolstoy.id, 'count': 2, 'name': "Лев Толстой"})
+        self.assertEqual(response.data['facets']['year'][0]['value'], 1869)
+
+    def test_search_narrows_counts(self):
+        self.create_book("Война и мир", self.tolstoy, 1869)
+        self.create_book("Анна Каренина", self.tolstoy, 1877)
+        self.create_book("Вишнёвый сад", self.chekhov, 1904, genre="пьеса")
+        response = self.client.get('/api/books/facets/', {'search': 'сад'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['facets']['genre'], [{'value': 'пьеса', 'count': 1}])
+        self.assertEqual([item['name'] for item in response.data['facets']['author']], ["Антон Чехов"])
+
+    def test_limit(self):
+        for year in range(1900, 1905):
+            self.create_book(f"Книга {year}", self.tolstoy, year)
+        response = self.client.get('/api/books/facets/', {'limit': 2})
+        self.assertEqual(len(response.data['facets']['year']), 2)
+        self.assertEqual(self.client.get('/api/books/facets/', {'limit': 'x'}).status_code, 400)
+
+    def test_apply_batches_many_values(self):
+        facets.apply({('year', str(year)): 1 for year in range(1000, 1600)})
+        self.assertEqual(FacetCount.objects.filter(count=1).count(), 600)
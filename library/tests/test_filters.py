@@ -0,0 +1,87 @@
+import re
+
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from library.filters import BookFilter
+from library.models import Author, Book
+from library.pagination import get_keyset, keyset_ordering
+
+FULL_SCAN_RE = re.compile(r'\bSCAN library_book\b(?!_)')
+
+
+class BookFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolstoy = Author.objects.create(name="Лев Толстой")
+        cls.chekhov = Author.objects.create(name="Антон Чехов")
+        rows = [
+            ("Война и мир", cls.tolstoy, 1869, "роман", 'fiction', "Русский вестник"),
+            ("Анна Каренина", cls.tolstoy, 1877, "роман", 'fiction', "Русский вестник"),
+            ("Азбука", cls.tolstoy, 1872, "учебное пособие", 'textbook', "Типография"),
+            ("Вишнёвый сад", cls.chekhov, 1904, "пьеса", 'fiction', "Знание"),
+            ("Остров Сахалин", cls.chekhov, 1895, "очерк", 'fiction', "Русская мысль"),
+        ]
+        for title, author, year, genre, book_type, publisher in rows:
+            Book.objects.create(
+                title=title, author=author, year=year, genre=genre, book_type=book_type,
+                category="учебник" if book_type == 'textbook' else "художественная литература",
+                publisher=publisher, book_file='books/x.pdf',
+            )
+
+    def titles(self, **params):
+        response = APIClient().get('/api/books/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(book['title'] for book in response.data['results'])
+
+    def test_exact_filters(self):
+        self.assertEqual(self.titles(book_type='textbook'), ["Азбука"])
+        self.assertEqual(self.titles(genre="роман"), ["Анна Каренина", "Война и мир"])
+        self.assertEqual(self.titles(publisher="Знание"), ["Вишнёвый сад"])
+        self.assertEqual(self.titles(category="учебник"), ["Азбука"])
+        self.assertEqual(self.titles(author=self.chekhov.id), ["Вишнёвый сад", "Остров Сахалин"])
+        self.assertEqual(self.titles(year=1877), ["Анна Каренина"])
+
+    def test_text_filters_ignore_case_and_yo(self):
+        self.assertEqual(self.titles(genre="РОМАН"), ["Анна Каренина", "Война и мир"])
+        self.assertEqual(self.titles(publisher="русский  вестник"), ["Анна Каренина", "Война и мир"])
+        self.assertEqual(self.titles(category="Учебник"), ["Азбука"])
+
+    def test_year_range_combined(self):
+        self.assertEqual(self.titles(year__gte=1870, year__lte=1900), ["Азбука", "Анна Каренина", "Остров Сахалин"])
+        self.assertEqual(self.titles(year__gte=1870, year__lte=1900, book_type='fiction', author=self.tolstoy.id),
+                         ["Анна Каренина"])
+
+    def test_filters_combine_with_search(self):
+        self.assertEqual(self.titles(search="сад", year__gte=1900), ["Вишнёвый сад"])
+        self.assertEqual(self.titles(search="сад", year__lte=1900), [])
+
+    def test_invalid_values(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/books/', {'year__gte': 'abc'}).status_code, 400)
+        self.assertEqual(client.get('/api/books/', {'year': '99999'}).status_code, 400)
+        self.assertEqual(client.get('/api/books/', {'book_type': 'comics'}).status_code, 400)
+
+    def test_filters_narrow_facets(self):
+        response = APIClient().get('/api/books/facets/', {'book_type': 'textbook'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_every_filter_uses_an_index(self):
+        values = {
+            'year': 1877, 'year__gte': 1870, 'year__lte': 1900, 'book_type': 'fiction',
+            'genre': "роман", 'category': "учебник", 'publisher': "Знание", 'author': self.tolstoy.id,
+        }
+        combinations = [{param: value} for param, value in values.items()]
+        combinations.append({'year__gte': 1870, 'year__lte': 1900})
+        combinations.append({'book_type': 'textbook', 'year__gte': 2015, 'year__lte': 2020})
+        combinations.append({'genre': "роман", 'year__gte': 1870})
+        self.assertEqual(set(values), set(BookFilter.params))
+
+        ordering = keyset_ordering(get_keyset(Book))
+        for params in combinations:
+            request = Request(APIRequestFactory().get('/api/books/', params))
+            queryset = BookFilter().filter_queryset(request, Book.objects.select_related('author'), None)
+            plan = queryset.order_by(*ordering)[:21].explain()
+            with self.subTest(params=params):
+                self.assertIsNone(FULL_SCAN_RE.search(plan), plan)
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library.importers import BookImporter, read_rows
+from library.models import Author, Book
+
+HEADER = 'title,author,year,genre,category,publisher,book_type,book_file\n'
+
+
+def csv_rows(count, start=0, author="Лев Толстой"):
+    return ''.join(
+        f'Книга {i},{author},{1900 + i % 100},роман,художественная литература,Эксмо,fiction,books/{i}.pdf\n'
+        for i in range(start, start + count)
+    )
+
+
+class BookImporterTest(TestCase):
+    def run_import(self, content, fmt='csv', **kwargs):
+        return BookImporter(**kwargs).run(read_rows(io.BytesIO(content.encode('utf-8')), fmt))
+
+    def test_csv_import_creates_books_and_authors(self):
+        report = self.run_import(HEADER + csv_rows(3) + csv_rows(2, author="Фёдор Достоевский"))
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(report['failed'], 0)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Book.objects.filter(author__name="Фёдор Достоевский").count(), 2)
+
+    def test_ndjson_import_with_errors(self):
+        lines = [
+            {'title': 'Анна Каренина', 'author': 'Лев Толстой', 'year': 1877, 'genre': 'роман',
+             'category': 'художественная литература', 'publisher': 'Русский вестник',
+             'book_file': 'books/anna.pdf'},
+            {'title': 'Без года', 'author': 'Лев Толстой'},
+            {'title': 'Плохой год', 'author': 'Лев Толстой', 'year': 999, 'genre': 'роман',
+             'category': 'роман', 'publisher': 'Эксмо', 'book_file': 'books/x.pdf'},
+            {'title': 'Плохой файл', 'author': 'Лев Толстой', 'year': 2000, 'genre': 'роман',
+             'category': 'роман', 'publisher': 'Эксмо', 'book_file': 'books/x.exe'},
+        ]
+        content = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines) + '\n{broken\n'
+        report = self.run_import(content, fmt='ndjson')
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['failed'], 4)
+        errors = {error['row']: error['errors'] for error in report['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5])
+        self.assertIn('year', errors[2])
+        self.assertIn('Год должен быть', str(errors[3]))
+        self.assertIn('Недопустимый тип файла', str(errors[4]))
+        self.assertIn('Некорректный JSON', str(errors[5]))
+
+    def test_duplicates_rejected_against_database_and_within_file(self):
+        self.run_import(HEADER + csv_rows(2))
+        report = self.run_import(HEADER + csv_rows(3) + csv_rows(1, start=2), batch_size=2)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['failed'], 3)
+        self.assertIn('уже существует', str(report['errors']))
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_queries_per_batch_do_not_depend_on_rows(self):
+        Author.objects.create(name="Лев Толстой")
+        with CaptureQueriesContext(connection) as small:
+            self.run_import(HEADER + csv_rows(5), batch_size=500)
+        with CaptureQueriesContext(connection) as large:
+            self.run_import(HEADER + csv_rows(200, start=5), batch_size=500)
+
+        # INSERT делится Django на части по лимиту параметров SQLite, остальные запросы — по одному на пачку
+        def lookups(ctx):
+            return [query for query in ctx.captured_queries if not query['sql'].startswith('INSERT')]
+        self.assertEqual(len(lookups(small)), len(lookups(large)))
+
+    def test_imported_books_are_searchable(self):
+        self.run_import(HEADER + csv_rows(1))
+        response = APIClient().get('/api/books/', {'search': 'толстой'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_error_report_is_capped(self):
+        content = HEADER + ''.join(f'Книга {i},,,,,,,\n' for i in range(10))
+        report = self.run_import(content, max_errors=3)
+        self.assertEqual(report['failed'], 10)
+        self.assertEqual(len(report['errors']), 3)
+        self.assertTrue(report['errors_truncated'])
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write(HEADER + csv_rows(4))
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command('import_books', f.name, stdout=out, stderr=StringIO())
+        self.assertIn('Создано книг: 4', out.getvalue())
+
+
+class BookImportAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', password='admin123')
+
+    def upload(self, name='books.csv', content=HEADER + csv_rows(3)):
+        return SimpleUploadedFile(name, content.encode('utf-8'), content_type='text/csv')
+
+    def test_admin_can_import(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post('/api/books/import/', {'file': self.upload()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 3)
+
+    def test_regular_user_cannot_import(self):
+        user = User.objects.create_user(username='user', password='user123')
+        self.client.force_authenticate(user=user)
+        response = self.client.post('/api/books/import/', {'file': self.upload()})
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_format_rejected(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post('/api/books/import/', {'file': self.upload('books.xlsx')})
+        self.assertEqual(response.status_code, 400)
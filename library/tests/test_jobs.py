@@ -0,0 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from library import jobs
+from library.models import Job
+
+calls = []
+
+
+@jobs.task('tests.record', max_attempts=3)
+def record_call(value):
+    calls.append(value)
+
+
+@jobs.task('tests.flaky', max_attempts=2)
+def flaky(fail_times):
+    calls.append('flaky')
+    if calls.count('flaky') <= fail_times:
+        raise RuntimeError('временная ошибка')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_due(self):
+        return [jobs.run(job) for job in jobs.claim('test', limit=10)]
+
+    def test_enqueue_and_run(self):
+        job = jobs.enqueue('tests.record', args={'value': 1})
+        self.assertEqual(job.status, 'queued')
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(calls, [1])
+
+    def test_idempotency_key(self):
+        first = jobs.enqueue('tests.record', args={'value': 1}, key='k')
+        second = jobs.enqueue('tests.record', args={'value': 2}, key='k')
+        self.assertEqual(first.pk, second.pk)
+        self.run_due()
+        # после завершения тот же ключ можно поставить снова
+        third = jobs.enqueue('tests.record', args={'value': 3}, key='k')
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_enqueue_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            jobs.enqueue_on_commit('tests.record', args={'value': 1})
+            self.assertFalse(Job.objects.exists())
+        callbacks[0]()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue('tests.flaky', args={'fail_times': 5})
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('временная ошибка', job.last_error)
+        # до истечения задержки задание не выдаётся
+        self.assertEqual(self.run_due(), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_claim_is_exclusive(self):
+        jobs.enqueue('tests.record', args={'value': 1})
+        self.assertEqual(len(jobs.claim('a', limit=5)), 1)
+        self.assertEqual(jobs.claim('b', limit=5), [])
+
+    def test_stale_running_job_requeued(self):
+        job = jobs.enqueue('tests.record', args={'value': 1})
+        jobs.claim('crashed')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual([claimed.pk for claimed in jobs.claim('alive')], [job.pk])
+
+    def test_job_crashing_workers_fails_after_max_attempts(self):
+        job = jobs.enqueue('tests.record', args={'value': 1})
+        for attempt in range(1, 4):
+            claimed = jobs.claim(f'crashed-{attempt}')
+            # попытка засчитывается при захвате, до выполнения
+            self.assertEqual([(c.pk, c.attempts) for c in claimed], [(job.pk, attempt)])
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.claim('alive'), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn('LIBRARY_JOB_TIMEOUT', job.last_error)
+
+    @override_settings(LIBRARY_JOBS_EAGER=True)
+    def test_eager_mode(self):
+        job = jobs.enqueue('tests.record', args={'value': 7})
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(calls, [7])
+
+    def test_unknown_task_rejected(self):
+        with self.assertRaises(jobs.UnknownTask):
+            jobs.enqueue('tests.missing')
+
+
+class JobAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='admin123'))
+
+    def test_list_filter_and_retry(self):
+        failed = Job.objects.create(name='tests.record', status='failed', attempts=3, run_after=timezone.now())
+        Job.objects.create(name='tests.record', run_after=timezone.now())
+
+        response = self.client.get('/api/jobs/', {'status': 'failed'})
+        self.assertEqual([job['id'] for job in response.data['results']], [failed.id])
+
+        response = self.client.post(f'/api/jobs/{failed.id}/retry/')
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(response.data['attempts'], 0)
+
+    def test_anonymous_forbidden(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(APIClient().get('/api/jobs/').status_code, 401)
+
+
+class RunWorkersCommandTest(TransactionTestCase):
+    def test_threads_drain_queue(self):
+        calls.clear()
+        for value in range(5):
+            jobs.enqueue('tests.record', args={'value': value})
+        call_command('run_workers', '--once', '--concurrency=1', stdout=StringIO())
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertEqual(Job.objects.filter(name='tests.record', status='done').count(), 5)
+        # ежедневный пересчёт популярности ставят сами обработчики — один раз в день
+        self.assertEqual(Job.objects.get(name='stats.rollup').status, 'done')
+        call_command('run_workers', '--once', '--concurrency=1', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(name='stats.rollup').count(), 1)
@@ -0,0 +1,120 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library import metrics
+from library.models import Author, Book
+
+
+def server_timing(response):
+    return {
+        name: dict(part.split('=', 1) for part in params)
+        for name, *params in (entry.strip().split(';') for entry in response['Server-Timing'].split(','))
+    }
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+        for name in ["Иван Тургенев", "Иван Гончаров"]:
+            author = Author.objects.create(name=name)
+            Book.objects.create(
+                title=f"Роман — {name}", author=author, year=1859, genre="роман",
+                category="художественная литература", publisher="Современник",
+            )
+
+    def test_server_timing_reports_queries_and_durations(self):
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = self.client.get('/api/authors/')
+        self.assertEqual(response.status_code, 200)
+        timing = server_timing(response)
+        self.assertEqual(timing['db']['desc'], f'"SQL: {len(ctx.captured_queries)}"')
+        self.assertGreaterEqual(float(timing['total']['dur']), float(timing['db']['dur']))
+        self.assertIn('serialize', timing)
+
+    @override_settings(LIBRARY_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/authors/'))
+
+    @override_settings(LIBRARY_METRICS=False)
+    def test_middleware_disabled(self):
+        response = APIClient().get('/api/authors/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('AuthorViewSet', metrics.render_prometheus())
+
+    def test_prometheus_endpoint_is_admin_only(self):
+        self.client.get('/api/authors/')
+        self.client.get('/api/books/1/')
+        self.client.get('/no-such-page/')
+        self.assertIn(self.client.get('/metrics').status_code, (401, 403))
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE library_request_duration_seconds histogram', body)
+        self.assertIn('library_request_duration_seconds_count{view="AuthorViewSet.list",method="GET"} 1', body)
+        self.assertIn('library_request_queries_bucket{view="AuthorViewSet.list",le="+Inf"} 1', body)
+        self.assertIn('library_responses_total{view="BookViewSet.retrieve",status="200"} 1', body)
+        self.assertIn('library_responses_total{view="unresolved",status="404"} 1', body)
+        # функция с @api_view — по своему имени, а не по классу-обёртке DRF
+        self.assertRegex(body, r'library_responses_total\{view="library\.views\.metrics_view",status="40[13]"\} 1')
+        self.assertRegex(body, r'library_response_cache_total\{result="hits"\} \d+')
+
+    @override_settings(LIBRARY_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged_with_sql_and_stack(self):
+        with self.assertLogs('library.slow', 'WARNING') as logs:
+            self.client.get('/api/authors/', {'search': 'Иван'})
+        output = logs.output[0]
+        self.assertIn('GET /api/authors/?search=', output)
+        self.assertIn('(AuthorViewSet.list)', output)
+        self.assertIn('SELECT', output)
+        self.assertRegex(output, r'library/\S+\.py:\d+ in \w+')
+        # параметры запросов в журнал не попадают
+        self.assertNotIn('Иван', output.split('\n', 1)[1])
+
+    def test_slow_log_off_by_default(self):
+        with self.assertNoLogs('library.slow'):
+            self.client.get('/api/authors/')
+
+    async def test_async_views_measured(self):
+        response = await AsyncClient().get('/api/async/authors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(re.search(r'SQL: (\d+)', response['Server-Timing']).group(1)), 0)
+        self.assertIn('view="library.async_views.author_list"', metrics.render_prometheus())
+
+
+class HistogramTest(SimpleTestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Тест.', [0.1, 1.0], ['view'])
+        for value in [0.05, 0.1, 0.5, 3.0]:
+            histogram.observe(('a"b',), value)
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Тест.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a\\"b",le="0.1"} 2',
+            'test_seconds_bucket{view="a\\"b",le="1.0"} 3',
+            'test_seconds_bucket{view="a\\"b",le="+Inf"} 4',
+            'test_seconds_sum{view="a\\"b"} 3.650000',
+            'test_seconds_count{view="a\\"b"} 4',
+        ])
+
+    def test_nested_timing_counted_once(self):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics._current.set(request_metrics)
+        try:
+            with metrics.timed():
+                with metrics.timed():
+                    pass
+                inner = request_metrics.serialize_time
+            self.assertEqual(inner, 0.0)
+            self.assertGreater(request_metrics.serialize_time, 0.0)
+        finally:
+            metrics._current.reset(token)
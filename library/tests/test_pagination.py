@@ -0,0 +1,95 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from library.models import Author, Book
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name="Лев Толстой")
+        # повторяющиеся названия и годы проверяют разрешение ничьих по id
+        for i in range(45):
+            Book.objects.create(
+                title=f"Книга {i % 7}",
+                author=cls.author,
+                year=1900 + i % 3,
+                genre="роман",
+                category="художественная литература",
+                publisher=f"Издательство {i}",
+                book_file='books/book.pdf',
+            )
+        for i in range(25):
+            Author.objects.create(name=f"Автор {i:02d}")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_cursor_walk_returns_every_book_once_in_order(self):
+        pages = self.walk('/api/books/')
+        self.assertEqual([len(page['results']) for page in pages], [20, 20, 5])
+        ids = [book['id'] for page in pages for book in page['results']]
+        expected = list(Book.objects.order_by('title', 'year', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+    def test_previous_link_returns_previous_page(self):
+        pages = self.walk('/api/books/')
+        response = self.client.get(pages[2]['previous'])
+        self.assertEqual(
+            [book['id'] for book in response.data['results']],
+            [book['id'] for book in pages[1]['results']],
+        )
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [book['id'] for book in response.data['results']],
+            [book['id'] for book in pages[0]['results']],
+        )
+        self.assertIsNone(response.data['previous'])
+
+    def test_authors_paginated_by_name(self):
+        pages = self.walk('/api/authors/')
+        names = [author['name'] for page in pages for author in page['results']]
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(len(names), 26)
+
+    def test_no_count_query_unless_requested(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/books/')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in ctx.captured_queries))
+
+        response = self.client.get('/api/books/', {'count': 'true'})
+        self.assertEqual(response.data['count'], 45)
+
+    def test_page_number_mode(self):
+        response = self.client.get('/api/books/', {'page': 3})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertIn('page=2', response.data['previous'])
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get('/api/books/', {'page': 2, 'count': '1'})
+        self.assertEqual(response.data['count'], 45)
+        self.assertIn('page=3', response.data['next'])
+
+    def test_invalid_cursor_and_page(self):
+        self.assertEqual(self.client.get('/api/books/', {'cursor': 'мусор'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/books/', {'page': 0}).status_code, 404)
+        self.assertEqual(self.client.get('/api/books/', {'page': 99}).status_code, 404)
+
+    def test_search_results_use_page_numbers(self):
+        response = self.client.get('/api/books/', {'search': 'книга'})
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIn('page=2', response.data['next'])
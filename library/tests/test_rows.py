@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from library import thumbnails
+from library.models import Author, Book
+from library.serializers import BookSerializer
+
+
+class BookRowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name="Антуан де Сент-Экзюпери")
+        cover = 'covers/ab/' + 'ab' * 32 + '.jpg'
+        files = {
+            str(width): {fmt: thumbnails.rendition_name(cover, 'ab' * 32, width, fmt) for fmt in thumbnails.FORMATS}
+            for width in thumbnails.SIZES
+        }
+        cls.with_cover = Book.objects.create(
+            title="Маленький принц", author=author, year=1943, genre="повесть", category="проза",
+            publisher="Gallimard", book_file='books/Маленький принц.pdf', cover_image=cover,
+            cover_renditions={'source': cover, 'sha256': 'ab' * 32, 'files': files},
+        )
+        cls.plain = Book.objects.create(
+            title="Планета людей", author=author, year=1939, genre="эссе", category="проза",
+            publisher="Gallimard", book_file='books/planet.epub', book_type='textbook',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def serialized(self, response, books):
+        context = {'request': response.wsgi_request}
+        return JSONRenderer().render(BookSerializer(books, many=True, context=context).data)
+
+    def test_list_matches_book_serializer_byte_for_byte(self):
+        response = self.client.get('/api/books/')
+        self.assertEqual(
+            JSONRenderer().render(response.data['results']),
+            self.serialized(response, [self.with_cover, self.plain]),
+        )
+        self.assertTrue(response.data['results'][0]['covers'])
+
+    def test_retrieve_matches_book_serializer_byte_for_byte(self):
+        for book in [self.with_cover, self.plain]:
+            response = self.client.get(f'/api/books/{book.pk}/')
+            context = {'request': response.wsgi_request}
+            self.assertEqual(response.content, JSONRenderer().render(BookSerializer(book, context=context).data))
+        self.assertEqual(self.client.get('/api/books/999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/books/abc/').status_code, 404)
+
+    def test_search_results_match(self):
+        response = self.client.get('/api/books/', {'search': "принц"})
+        self.assertEqual(JSONRenderer().render(response.data['results']), self.serialized(response, [self.with_cover]))
+
+    def test_sparse_fieldset_narrows_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/books/', {'fields': 'title,id,author_name'})
+        self.assertEqual(response.data['results'][0], {'id': self.with_cover.pk, 'title': "Маленький принц",
+                                                       'author_name': "Антуан де Сент-Экзюпери"})
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('cover_renditions', sql)
+        self.assertNotIn('book_file', sql)
+
+        response = self.client.get(f'/api/books/{self.plain.pk}/', {'fields': 'book_type'})
+        self.assertEqual(response.data, {'book_type': 'textbook'})
+        self.assertEqual(self.client.get('/api/books/', {'fields': 'title,secret'}).status_code, 400)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_serializers', books=20, repeat=2, stdout=out, stderr=StringIO())
+        self.assertIn('ускорение', out.getvalue())
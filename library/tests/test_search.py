@@ -0,0 +1,159 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from library import normalize, search
+from library.models import Author, Book
+from library.views import AuthorViewSet
+
+
+def indexed_titles():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT title FROM {search.FTS_TABLE} ORDER BY title')
+        return [row[0] for row in cursor.fetchall()]
+
+
+class FullTextSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = Author.objects.create(name="Антуан де Сент-Экзюпери")
+
+    def create_book(self, title, **kwargs):
+        data = {
+            'author': self.author,
+            'year': 1943,
+            'genre': 'повесть',
+            'category': 'художественная литература',
+            'publisher': 'Gallimard',
+            'book_file': 'books/book.pdf',
+        }
+        data.update(kwargs)
+        return Book.objects.create(title=title, **data)
+
+    def search(self, term):
+        response = self.client.get('/api/books/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [book['title'] for book in response.data['results']]
+
+    def test_index_follows_saves_and_deletes(self):
+        book = self.create_book("Маленький принц")
+        self.assertEqual(indexed_titles(), ["маленький принц"])
+
+        book.title = "Планета людей"
+        book.save()
+        self.assertEqual(indexed_titles(), ["планета людей"])
+
+        book.delete()
+        self.assertEqual(indexed_titles(), [])
+
+    def test_author_rename_updates_index(self):
+        self.create_book("Маленький принц")
+        self.author.name = "Экзюпери"
+        self.author.save()
+        self.assertEqual(self.search("Экзюпери"), ["Маленький принц"])
+
+    def test_search_is_case_insensitive_for_cyrillic(self):
+        self.create_book("Маленький принц")
+        self.assertEqual(self.search("маленький"), ["Маленький принц"])
+        self.assertEqual(self.search("ПРИН"), ["Маленький принц"])
+
+    def test_search_folds_yo_and_punctuation(self):
+        self.create_book("Ёлка и «Зелёный» шум")
+        self.assertEqual(self.search("елка"), ["Ёлка и «Зелёный» шум"])
+        self.assertEqual(self.search("зеленый"), ["Ёлка и «Зелёный» шум"])
+        self.assertEqual(self.search("ЁЛКА"), ["Ёлка и «Зелёный» шум"])
+        self.assertEqual(self.search("сент-экзюпери"), ["Ёлка и «Зелёный» шум"])
+
+    def test_all_terms_must_match(self):
+        self.create_book("Маленький принц")
+        self.create_book("Маленькие трагедии")
+        self.assertEqual(self.search("маленьк принц"), ["Маленький принц"])
+
+    def test_results_ranked_by_relevance(self):
+        self.create_book("Ночной полёт", publisher="Принц и Ко")
+        self.create_book("Принц")
+        self.assertEqual(self.search("принц"), ["Принц", "Ночной полёт"])
+
+    def test_punctuation_only_search_returns_nothing(self):
+        self.create_book("Маленький принц")
+        self.assertEqual(self.search("«»"), [])
+
+    def test_rebuild_command(self):
+        self.create_book("Маленький принц")
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(indexed_titles(), ["маленький принц"])
+
+
+class NormalizeTest(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize.normalize("«Ёлка — зелёная!»"), "елка зеленая")
+        self.assertEqual(normalize.normalize("  МАЛЕНЬКИЙ\tпринц, "), "маленький принц")
+        self.assertEqual(normalize.normalize("За\u0301мок"), "замок")
+        self.assertEqual(normalize.normalize(""), "")
+
+    def test_shadow_columns_follow_saves(self):
+        author = Author.objects.create(name="Фёдор ДОСТОЕВСКИЙ")
+        self.assertEqual(author.name_norm, "федор достоевский")
+        book = Book.objects.create(
+            title="Бесы", author=author, year=1872, genre="Роман", category="Классика",
+            publisher="Русский Вестник", book_file='books/x.pdf',
+        )
+        book.title = "Идиот"
+        book.save(update_fields=['title'])
+        book.refresh_from_db()
+        self.assertEqual(
+            (book.title_norm, book.genre_norm, book.category_norm, book.publisher_norm),
+            ("идиот", "роман", "классика", "русский вестник"),
+        )
+
+
+class AuthorSearchTest(TestCase):
+    def setUp(self):
+        Author.objects.create(name="Фёдор Достоевский", biography="Родился в Москве")
+        Author.objects.create(name="Лев Толстой")
+
+    def search(self, term):
+        response = APIClient().get('/api/authors/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [author['name'] for author in response.data['results']]
+
+    def test_case_and_yo_insensitive_word_prefix(self):
+        self.assertEqual(self.search("федор"), ["Фёдор Достоевский"])
+        self.assertEqual(self.search("ДОСТОЕВ"), ["Фёдор Достоевский"])
+        self.assertEqual(self.search("толстой лев"), ["Лев Толстой"])
+        self.assertEqual(self.search("оевский"), [])
+
+    def test_search_uses_fts_index(self):
+        request = APIRequestFactory().get('/api/authors/', {'search': "фед москв"})
+        view = AuthorViewSet(request=Request(request), format_kwarg=None)
+        queryset = search.NormalizedSearchFilter().filter_queryset(view.request, Author.objects.all(), view)
+        self.assertEqual([author.name for author in queryset], ["Фёдор Достоевский"])
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # авторы выбираются по rowid из индекса FTS5, без просмотра всей таблицы
+        self.assertIn(f'SCAN {search.AUTHOR_FTS_TABLE} VIRTUAL TABLE INDEX 0:M', ' '.join(plan))
+        self.assertNotIn('SCAN library_author', plan)
+
+    def test_bulk_created_and_updated_authors_indexed(self):
+        # индекс поддерживают триггеры, сигналы для bulk_create и update() не нужны
+        def found(term):
+            return [author.name for author in search.search_authors(Author.objects.all(), [term])]
+
+        author = Author.objects.bulk_create([normalize.fill(Author(name="Иван Бунин", biography="Жил в Орле"))])[0]
+        self.assertEqual(found("бунин"), ["Иван Бунин"])
+        Author.objects.filter(pk=author.pk).update(biography_norm=normalize.normalize("Жил в Ельце"))
+        self.assertEqual(found("орле"), [])
+        self.assertEqual(found("ЕЛЬЦ"), ["Иван Бунин"])
+        author.delete()
+        self.assertEqual(found("ельц"), [])
+
+    def test_biography_still_searched(self):
+        self.assertEqual(self.search("Москве"), ["Фёдор Достоевский"])
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from library import stats
+from library.models import Author, Book, BookStat, Job
+from library.tests.mixins import TemporaryMediaMixin
+
+CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 8
+
+
+@override_settings(LIBRARY_POPULARITY_DOWNLOAD_WEIGHT=5, LIBRARY_POPULARITY_DAYS=30)
+class PopularityTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # счётчики других тестов не должны попасть в эти книги
+        stats.buffer.take()
+        self.addCleanup(stats.buffer.take)
+
+        self.client = APIClient()
+        self.author = Author.objects.create(name="Николай Гоголь")
+        self.books = [
+            Book.objects.create(
+                title=title, author=self.author, year=year, genre="повесть",
+                category="художественная литература", publisher="Современник",
+                book_file=SimpleUploadedFile("book.pdf", CONTENT),
+            )
+            for title, year in [("Нос", 1836), ("Шинель", 1842), ("Вий", 1835)]
+        ]
+
+    def flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return stats.buffer.flush()
+
+    def test_counters_written_in_batches(self):
+        nose, overcoat, viy = self.books
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'/api/books/{nose.pk}/').status_code, 200)
+        self.client.get(f'/api/books/{overcoat.pk}/download/')
+        self.client.get('/api/books/999999/')
+        # до записи в БД — только память процесса
+        self.assertFalse(BookStat.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # точка сохранения, SELECT книг, вставка статистики одним executemany, UPDATE на каждое приращение
+            with self.assertNumQueries(6):
+                stats.buffer.flush()
+        today = timezone.localdate()
+        self.assertEqual(
+            set(BookStat.objects.values_list('book_id', 'day', 'views', 'downloads')),
+            {(nose.pk, today, 3, 0), (overcoat.pk, today, 0, 1)},
+        )
+        self.assertEqual(Book.objects.get(pk=nose.pk).popularity, 3)
+        self.assertEqual(Book.objects.get(pk=overcoat.pk).popularity, 5)
+        # пересчёт ставит run_workers по расписанию, а не запись счётчиков
+        self.assertFalse(Job.objects.filter(name='stats.rollup').exists())
+
+        # повторная запись добавляет к строке дня, а не создаёт новую
+        self.client.get(f'/api/books/{nose.pk}/')
+        self.flush()
+        self.assertEqual(BookStat.objects.get(book=nose).views, 4)
+        self.assertEqual(Book.objects.get(pk=nose.pk).popularity, 4)
+        self.assertEqual(self.flush(), 0)
+
+    def test_partial_downloads_and_head_not_counted(self):
+        book = self.books[0]
+        self.client.get(f'/api/books/{book.pk}/download/', HTTP_RANGE='bytes=0-99')
+        self.client.get(f'/api/books/{book.pk}/download/', HTTP_RANGE='bytes=100-')
+        self.client.head(f'/api/books/{book.pk}/download/')
+        self.flush()
+        self.assertEqual(BookStat.objects.get(book=book).downloads, 1)
+
+    def test_deleted_book_counters_dropped_and_failed_write_kept(self):
+        nose, overcoat, _ = self.books
+        stats.record(nose.pk, 'views')
+        stats.record(overcoat.pk, 'views')
+        overcoat.delete()
+        with mock.patch.object(stats.StatsBuffer, 'write', side_effect=DatabaseError('database is locked')):
+            with self.assertRaises(DatabaseError):
+                stats.buffer.flush()
+        self.assertEqual(self.flush(), 1)
+        self.assertEqual(list(BookStat.objects.values_list('book_id', 'views')), [(nose.pk, 1)])
+
+    def test_rollup_drops_old_days(self):
+        nose, overcoat, viy = self.books
+        today = timezone.localdate()
+        BookStat.objects.bulk_create([
+            BookStat(book=nose, day=today, views=2, downloads=1),
+            BookStat(book=nose, day=today - timedelta(days=29), views=1),
+            BookStat(book=overcoat, day=today - timedelta(days=30), views=100),
+        ])
+        Book.objects.filter(pk=overcoat.pk).update(popularity=100)
+        out = StringIO()
+        call_command('rebuild_popularity', stdout=out)
+        self.assertIn('Обновлено книг: 2', out.getvalue())
+        self.assertEqual(dict(Book.objects.values_list('id', 'popularity')), {nose.pk: 8, overcoat.pk: 0, viy.pk: 0})
+
+    def test_schedule_rollup_once_a_day(self):
+        job = stats.schedule_rollup()
+        self.assertEqual(job.key, f'stats.rollup:{timezone.localdate().isoformat()}')
+        Job.objects.filter(pk=job.pk).update(status='done')
+        self.assertIsNone(stats.schedule_rollup())
+        self.assertEqual(Job.objects.filter(name='stats.rollup').count(), 1)
+
+    def test_ordering_by_popularity(self):
+        nose, overcoat, viy = self.books
+        for book, popularity in [(nose, 2), (overcoat, 7), (viy, 2)]:
+            Book.objects.filter(pk=book.pk).update(popularity=popularity)
+        data = self.client.get('/api/books/', {'ordering': '-popularity', 'fields': 'id'}).json()
+        self.assertEqual([item['id'] for item in data['results']], [overcoat.pk, nose.pk, viy.pk])
+
+        with mock.patch('library.pagination.UncountedPageNumberPagination.page_size', 2):
+            data = self.client.get('/api/books/', {'ordering': '-popularity', 'fields': 'id'}).json()
+            self.assertIn('page=2', data['next'])
+            second = self.client.get(data['next']).json()
+        self.assertEqual([item['id'] for item in second['results']], [viy.pk])
+
+        response = self.client.get('/api/books/', {'ordering': 'title'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.json())
+
+    async def test_async_views_counted(self):
+        book = self.books[0]
+        client = AsyncClient()
+        self.assertEqual((await client.get(f'/api/async/books/{book.pk}/')).status_code, 200)
+        self.assertEqual((await client.get(f'/api/async/books/{book.pk}/download/')).status_code, 200)
+        self.assertEqual(stats.buffer.take(), {
+            (book.pk, timezone.localdate(), 'views'): 1,
+            (book.pk, timezone.localdate(), 'downloads'): 1,
+        })
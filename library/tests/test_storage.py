@@ -0,0 +1,129 @@
+import hashlib
+import os
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from library import cache
+from library.models import Author, Blob, Book, Job
+from library.storage import hashed_digest
+from library.tests.mixins import TemporaryMediaMixin
+
+CONTENT = b'%PDF-1.4\n' + b'content-addressed' * 100
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+class ContentAddressedStorageTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = Author.objects.create(name="Михаил Булгаков")
+
+    def create_book(self, title, content=CONTENT, **kwargs):
+        return Book.objects.create(
+            title=title, author=self.author, year=1966, genre="роман",
+            category="художественная литература", publisher=kwargs.pop('publisher', "Москва"),
+            book_file=SimpleUploadedFile('master.pdf', content), **kwargs
+        )
+
+    def test_same_content_stored_once(self):
+        first = self.create_book("Мастер и Маргарита")
+        second = self.create_book("Мастер и Маргарита", publisher="АСТ")
+        self.assertEqual(first.book_file.name, f'books/{DIGEST[:2]}/{DIGEST}.pdf')
+        self.assertEqual(first.book_file.name, second.book_file.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'books', DIGEST[:2])), [f'{DIGEST}.pdf'])
+        self.assertEqual(Blob.objects.get(name=first.book_file.name).refcount, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create_book("Мастер и Маргарита")
+        second = self.create_book("Мастер и Маргарита", publisher="АСТ")
+        name = first.book_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(Blob.objects.get(name=name).refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_orphan_kept_when_same_content_stored_again(self):
+        book = self.create_book("Мастер и Маргарита")
+        name = book.book_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+            # тот же файл загружают снова, пока сборка сирот ещё не запущена
+            self.assertEqual(default_storage.save('books/master.pdf', ContentFile(CONTENT)), name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(Blob.objects.get(name=name).refcount, 0)
+
+    def test_replacing_file_releases_old_one(self):
+        book = self.create_book("Мастер и Маргарита")
+        old_name = book.book_file.name
+        book.book_file = SimpleUploadedFile('new.pdf', CONTENT + b'v2')
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertEqual(list(Blob.objects.values_list('name', 'refcount')), [(book.book_file.name, 1)])
+
+    def test_saving_without_changes_keeps_refcount(self):
+        book = self.create_book("Мастер и Маргарита")
+        book.genre = "мистика"
+        book.save()
+        self.assertEqual(Blob.objects.get().refcount, 1)
+
+    def test_download_uses_digest_etag_and_title(self):
+        book = self.create_book("Мастер и Маргарита")
+        response = APIClient().get(f'/api/books/{book.id}/download/')
+        self.assertEqual(response['ETag'], f'"{DIGEST}"')
+        self.assertIn('.pdf', response['Content-Disposition'])
+        self.assertNotIn(DIGEST, response['Content-Disposition'])
+
+    def test_rehash_media_moves_legacy_files(self):
+        legacy = default_storage.path('books/legacy.pdf')
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, 'wb') as f:
+            f.write(CONTENT)
+        book = self.create_book("Мастер и Маргарита")
+        Book.objects.filter(pk=book.pk).update(book_file='books/legacy.pdf')
+        Blob.objects.all().delete()
+
+        Job.objects.all().delete()
+        version = cache.get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rehash_media', stdout=StringIO(), stderr=StringIO())
+        book.refresh_from_db()
+        self.assertEqual(hashed_digest(book.book_file.name), DIGEST)
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        self.assertFalse(os.path.exists(legacy))
+        # кэшированные ответы со старым URL файла устарели, текст извлекается по новому имени
+        self.assertNotEqual(cache.get_catalog_version(), version)
+        self.assertEqual(
+            list(Job.objects.values_list('key', flat=True)), [f'content.index:{book.pk}:{book.book_file.name}']
+        )
+
+    def test_rehash_media_deletes_legacy_cover_renditions(self):
+        cover = b'legacy-cover'
+        digest = hashlib.sha256(cover).hexdigest()
+        os.makedirs(default_storage.path('covers'))
+        for name in ['covers/legacy.jpg', f'covers/{digest}-96.webp', f'covers/{digest}-256.jpg']:
+            with open(default_storage.path(name), 'wb') as f:
+                f.write(cover)
+        book = self.create_book("Мастер и Маргарита")
+        Book.objects.filter(pk=book.pk).update(cover_image='covers/legacy.jpg')
+
+        call_command('rehash_media', stdout=StringIO(), stderr=StringIO())
+        # остался только перенесённый оригинал covers/ab/<sha256>.jpg
+        self.assertEqual(os.listdir(default_storage.path('covers')), [digest[:2]])
+
+    def test_storage_save_returns_hashed_name(self):
+        name = default_storage.save('covers/Cover.JPG', ContentFile(b'jpeg'))
+        digest = hashlib.sha256(b'jpeg').hexdigest()
+        self.assertEqual(name, f'covers/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(hashed_digest(name), digest)
+        self.assertIsNone(hashed_digest('covers/cover.jpg'))
@@ -0,0 +1,97 @@
+import io
+from io import StringIO
+
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from library import thumbnails
+from library.models import Author, Book, Job
+from library.tests.mixins import TemporaryMediaMixin
+
+
+def png(width=800, height=1200, color=(200, 30, 30, 128)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(LIBRARY_THUMBNAIL_WORKERS=0, LIBRARY_JOBS_EAGER=True)
+class CoverRenditionsTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = Author.objects.create(name="Александр Пушкин")
+
+    def create_book(self, cover=None, publisher="Эксмо"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Book.objects.create(
+                title="Евгений Онегин", author=self.author, year=1833, genre="роман в стихах",
+                category="художественная литература", publisher=publisher,
+                book_file=SimpleUploadedFile('onegin.pdf', b'%PDF-1.4 onegin'),
+                cover_image=SimpleUploadedFile('cover.png', cover or png()),
+            )
+
+    def test_renditions_generated_after_commit(self):
+        book = self.create_book()
+        book.refresh_from_db()
+        self.assertTrue(thumbnails.renditions_are_current(book))
+        files = book.cover_renditions['files']
+        self.assertEqual(sorted(files, key=int), ['96', '256', '512'])
+        with default_storage.open(files['256']['webp']) as f, Image.open(f) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (256, 384))
+        with default_storage.open(files['96']['jpeg']) as f, Image.open(f) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.mode, 'RGB')
+
+    def test_small_cover_not_upscaled(self):
+        book = self.create_book(cover=png(200, 300))
+        book.refresh_from_db()
+        with default_storage.open(book.cover_renditions['files']['512']['webp']) as f, Image.open(f) as image:
+            self.assertEqual(image.size, (200, 300))
+
+    def test_serializer_exposes_covers(self):
+        book = self.create_book()
+        data = APIClient().get(f'/api/books/{book.id}/').data
+        self.assertEqual(set(data['covers']), {'96', '256', '512'})
+        self.assertTrue(data['covers']['96']['webp'].startswith('http://testserver/media/covers/'))
+        self.assertTrue(data['covers']['96']['jpeg'].endswith('-96.jpg'))
+
+    def test_shared_cover_rendered_once(self):
+        first = self.create_book()
+        first.refresh_from_db()
+        name = first.cover_renditions['files']['96']['webp']
+        modified = default_storage.get_modified_time(name)
+        second = self.create_book(publisher="АСТ")
+        second.refresh_from_db()
+        self.assertEqual(second.cover_renditions['files'], first.cover_renditions['files'])
+        self.assertEqual(default_storage.get_modified_time(name), modified)
+
+    def test_unchanged_cover_not_rescheduled(self):
+        book = self.create_book()
+        book.refresh_from_db()
+        book.genre = "роман"
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        self.assertEqual(list(Job.objects.filter(name='covers.render').values_list('status', flat=True)), ['done'])
+
+    def test_renditions_served_as_immutable(self):
+        book = self.create_book()
+        data = APIClient().get(f'/api/books/{book.id}/').data
+        response = self.client.get(data['covers']['256']['webp'].replace('http://testserver', ''))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(self.client.get('/media/covers/../books/x.pdf').status_code, 404)
+
+    def test_backfill_command(self):
+        book = self.create_book()
+        Book.objects.filter(pk=book.pk).update(cover_renditions={})
+        out = StringIO()
+        call_command('backfill_covers', stdout=out, stderr=StringIO())
+        self.assertIn('Обработано обложек: 1', out.getvalue())
+        book.refresh_from_db()
+        self.assertTrue(thumbnails.renditions_are_current(book))
@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from library import uploads
+from library.models import Author, Blob, Book, Upload
+from library.tests.mixins import TemporaryMediaMixin
+
+CONTENT = b'%PDF-1.7\n' + bytes(range(256)) * 100
+
+
+class ChunkedUploadTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(uploads.hashers.clear)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='admin123'))
+        self.author = Author.objects.create(name="Николай Гоголь")
+
+    def start(self, filename='nose.pdf', size=len(CONTENT)):
+        return self.client.post('/api/uploads/', {'filename': filename, 'size': size}, format='json')
+
+    def put_part(self, upload_id, start, end, content=CONTENT):
+        return self.client.generic(
+            'PUT', f'/api/uploads/{upload_id}/part/', content[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(content)}',
+        )
+
+    def upload(self, content=CONTENT, chunk=7000):
+        upload_id = self.start(size=len(content)).data['id']
+        for start in range(0, len(content), chunk):
+            response = self.put_part(upload_id, start, min(start + chunk, len(content)) - 1, content)
+            self.assertEqual(response.status_code, 200)
+        return upload_id
+
+    def test_full_flow_creates_book(self):
+        upload_id = self.upload()
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'complete')
+        self.assertEqual(response.data['content_type'], 'application/pdf')
+        self.assertEqual(response.data['sha256'], hashlib.sha256(CONTENT).hexdigest())
+
+        response = self.client.post('/api/books/', {
+            'title': "Нос", 'author': self.author.id, 'year': 1836, 'genre': "повесть",
+            'category': "художественная литература", 'publisher': "Современник", 'upload': upload_id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        book = Book.objects.get(pk=response.data['id'])
+        with book.book_file.open('rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.assertEqual(Upload.objects.get(pk=upload_id).book, book)
+        # имя в адресном хранилище выбрано по хэшу, посчитанному при загрузке
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        self.assertEqual(book.book_file.name, f'books/{digest[:2]}/{digest}.pdf')
+        self.assertEqual(Blob.objects.get(name=book.book_file.name).refcount, 1)
+
+    def test_book_requires_file_or_upload(self):
+        response = self.client.post('/api/books/', {
+            'title': "Нос", 'author': self.author.id, 'year': 1836, 'genre': "повесть",
+            'category': "художественная литература", 'publisher': "Современник",
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('book_file', response.data)
+
+    def test_bad_magic_bytes_rejected_on_first_part(self):
+        content = b'MZ' + CONTENT[2:]
+        upload_id = self.start().data['id']
+        response = self.put_part(upload_id, 0, 999, content)
+        self.assertEqual(response.status_code, 400)
+        upload = Upload.objects.get(pk=upload_id)
+        self.assertEqual(upload.status, 'failed')
+        self.assertFalse(os.path.exists(uploads.part_path(upload)))
+        self.assertIsNone(upload.writing_until)
+
+    def test_sniff_epub(self):
+        head = b'PK\x03\x04' + b'\x00' * 26 + b'mimetypeapplication/epub+zip'
+        self.assertEqual(uploads.sniff_book_type(head), 'application/epub+zip')
+        self.assertIsNone(uploads.sniff_book_type(b'PK\x03\x04' + b'\x00' * 60))
+
+    def test_offset_mismatch_conflict(self):
+        upload_id = self.start().data['id']
+        self.put_part(upload_id, 0, 999)
+        response = self.put_part(upload_id, 2000, 2999)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1000)
+        # отклонённая часть не оставляет захват записи
+        self.assertIsNone(Upload.objects.get(pk=upload_id).writing_until)
+
+    def test_concurrent_part_from_other_worker_conflicts(self):
+        upload_id = self.start().data['id']
+        upload = Upload.objects.get(pk=upload_id)
+        competing = []
+
+        class RacingStream(io.BytesIO):
+            # посреди записи ту же часть присылает другой воркер: захват в БД
+            # виден ему так же, как был бы виден другому процессу
+            def read(stream, size=-1):
+                if not competing:
+                    competing.append(self.put_part(upload_id, 0, 999, b'%PDF-' + b'x' * (len(CONTENT) - 5)))
+                return super().read(size)
+
+        uploads.append_part(upload, RacingStream(CONTENT[:1000]), f'bytes 0-999/{len(CONTENT)}')
+        self.assertEqual(competing[0].status_code, 409)
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 1000)
+        self.assertIsNone(upload.writing_until)
+
+        self.put_part(upload_id, 1000, len(CONTENT) - 1)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.data['sha256'], hashlib.sha256(CONTENT).hexdigest())
+
+    def test_stale_claim_expires(self):
+        upload_id = self.start().data['id']
+        # воркер упал, не сняв захват
+        Upload.objects.filter(pk=upload_id).update(writing_until=timezone.now() + timedelta(seconds=60))
+        self.assertEqual(self.put_part(upload_id, 0, 999).status_code, 409)
+        Upload.objects.filter(pk=upload_id).update(writing_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.put_part(upload_id, 0, 999).status_code, 200)
+        self.assertEqual(Upload.objects.get(pk=upload_id).offset, 1000)
+
+    def test_resume_after_restart(self):
+        upload_id = self.start().data['id']
+        self.put_part(upload_id, 0, 9999)
+        # состояние хэша потеряно (перезапуск процесса) — дочитывается из принятой части
+        uploads.hashers.clear()
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').data['offset'], 10000)
+        self.put_part(upload_id, 10000, len(CONTENT) - 1)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.data['sha256'], hashlib.sha256(CONTENT).hexdigest())
+
+    def test_incomplete_upload_cannot_complete(self):
+        upload_id = self.start().data['id']
+        self.put_part(upload_id, 0, 999)
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/complete/').status_code, 400)
+
+    def test_declared_file_validated(self):
+        self.assertEqual(self.start(filename='virus.exe').status_code, 400)
+        self.assertEqual(self.start(size=100 * 1024 * 1024).status_code, 400)
+
+    def test_regular_user_forbidden(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='user', password='user123'))
+        self.assertEqual(self.start().status_code, 403)
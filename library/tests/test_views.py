@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -162,4 +164,53 @@ class BookAPITest(TestCase):
         })
         self.assertEqual(response4.status_code, 201)
 
-        self.assertEqual(Book.objects.filter(title='Физика. 10 кл.').count(), 3)
\ No newline at end of file
+        self.assertEqual(Book.objects.filter(title='Физика. 10 кл.').count(), 3)
+
+class AuthorAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_authors(self, count, books_per_author=3):
+        for i in range(count):
+            author = Author.objects.create(name=f"Автор {Author.objects.count():03d}")
+            for j in range(books_per_author):
+                Book.objects.create(
+                    title=f"Книга {j}",
+                    author=author,
+                    year=2000 + j,
+                    genre="роман",
+                    category="художественная литература",
+                    publisher="Эксмо",
+                    book_file='books/book.pdf',
+                )
+
+    def test_author_list_query_count_is_constant(self):
+        self.create_authors(2)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get('/api/authors/')
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.create_authors(15)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/authors/')
+        self.assertEqual(len(response.data['results']), 17)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertLessEqual(len(large.captured_queries), 2)
+
+    def test_embedded_books_are_capped(self):
+        self.create_authors(1, books_per_author=4)
+        author = Author.objects.get()
+        with self.settings(LIBRARY_AUTHOR_BOOKS_LIMIT=2):
+            response = self.client.get(f'/api/authors/{author.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book['title'] for book in response.data['books']], ["Книга 0", "Книга 1"])
+        self.assertEqual(response.data['books_count'], 4)
+        self.assertTrue(response.data['books_url'].endswith(f'/api/authors/{author.id}/books/'))
+
+    def test_author_books_lists_all_books(self):
+        self.create_authors(1, books_per_author=4)
+        author = Author.objects.get()
+        response = self.client.get(f'/api/authors/{author.id}/books/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['results'][0]['author_name'], author.name)
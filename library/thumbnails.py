@@ -0,0 +1,118 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import cache, imaging, jobs
+from .models import Book
+from .storage import hashed_digest
+
+SIZES = (96, 256, 512)
+FORMATS = ('webp', 'jpeg')
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+# covers/ab/<sha256>-256.webp
+RENDITION_RE = re.compile(r'(?:^|/)[0-9a-f]{64}-\d+\.(?:webp|jpg)$')
+
+
+def rendition_name(source_name, digest, width, fmt):
+    # рядом с оригиналом; имя определяется хэшем источника, поэтому неизменно
+    return posixpath.join(posixpath.dirname(source_name), f'{digest}-{width}.{EXTENSIONS[fmt]}')
+
+
+def is_rendition(name):
+    return bool(RENDITION_RE.search(name or ''))
+
+
+def renditions_are_current(book):
+    return (book.cover_renditions or {}).get('source') == book.cover_image.name
+
+
+def needs_renditions(book):
+    return bool(book.cover_image) and not renditions_are_current(book)
+
+
+def source_digest(name):
+    digest = hashed_digest(name)
+    if digest:
+        return digest
+    # обложка со старым именем: хэш считается по содержимому
+    hasher = hashlib.sha256()
+    with default_storage.open(name, 'rb') as f:
+        for chunk in f.chunks():
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def delete_renditions(source_name, digest=None):
+    # у обложки со старым именем хэш содержимого передаёт вызывающий (rehash_media)
+    digest = digest or hashed_digest(source_name)
+    if not digest:
+        return
+    for width in SIZES:
+        for fmt in FORMATS:
+            default_storage.delete(rendition_name(source_name, digest, width, fmt))
+
+
+def plan(source_name, force=False):
+    """
+    Возвращает (хэш, задание для imaging.render, карта миниатюр для cover_renditions).
+    Уже существующие файлы не пересоздаются: одна обложка у нескольких книг обрабатывается один раз.
+    """
+    digest = source_digest(source_name)
+    outputs = {}
+    files = {}
+    for width in SIZES:
+        for fmt in FORMATS:
+            name = rendition_name(source_name, digest, width, fmt)
+            files.setdefault(str(width), {})[fmt] = name
+            if force or not default_storage.exists(name):
+                outputs.setdefault(width, []).append((fmt, default_storage.path(name)))
+    return digest, outputs, files
+
+
+def record(book_id, source_name, digest, files, using=DEFAULT_DB_ALIAS):
+    # update() не вызывает post_save; обложка могла смениться, пока шла обработка
+    with transaction.atomic(using=using):
+        updated = Book.objects.using(using).filter(pk=book_id, cover_image=source_name).update(
+            cover_renditions={'source': source_name, 'sha256': digest, 'files': files}
+        )
+        if updated:
+            cache.bump_catalog_version(using=using)
+    return updated
+
+
+def enqueue(books, using=DEFAULT_DB_ALIAS):
+    # ключ включает имя обложки: смена обложки во время обработки ставит новое задание
+    for book in books:
+        jobs.enqueue_on_commit(
+            'covers.render',
+            args={'book_id': book.pk, 'using': using},
+            key=f'covers.render:{book.pk}:{book.cover_image.name}',
+            using=using,
+        )
+
+
+@jobs.task('covers.render')
+def render_cover(book_id, using=DEFAULT_DB_ALIAS, force=False):
+    book = Book.objects.using(using).filter(pk=book_id).only('id', 'cover_image', 'cover_renditions').first()
+    if book is None or not book.cover_image:
+        return
+    if not force and renditions_are_current(book):
+        return
+    source_name = book.cover_image.name
+    digest, outputs, files = plan(source_name, force=force)
+    if outputs:
+        imaging.render(default_storage.path(source_name), outputs)
+    record(book_id, source_name, digest, files, using=using)
+
+
+def cover_urls(book, build_url):
+    # {'96': {'webp': url, 'jpeg': url}, ...}; пусто, пока миниатюры не готовы
+    if not book.cover_image or not renditions_are_current(book):
+        return {}
+    return {
+        width: {fmt: build_url(default_storage.url(name)) for fmt, name in formats.items()}
+        for width, formats in book.cover_renditions['files'].items()
+    }
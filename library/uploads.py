@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Upload
+
+READ_SIZE = 64 * 1024
+# Сколько байт начала файла нужно, чтобы распознать формат
+SNIFF_SIZE = 58
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    pass
+
+
+def sniff_book_type(head):
+    # PDF начинается с %PDF-; EPUB — ZIP, первая запись которого — файл mimetype
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if head.startswith(b'PK\x03\x04') and head[30:38] == b'mimetype' and head[38:58] == b'application/epub+zip':
+        return 'application/epub+zip'
+    return None
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        raise UploadError("Ожидается заголовок Content-Range: bytes начало-конец/размер.")
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        raise UploadError("Некорректный диапазон Content-Range.")
+    return start, end, total
+
+
+def part_path(upload):
+    return default_storage.path(f'uploads/{upload.pk}.part')
+
+
+class HasherCache:
+    """
+    Состояние SHA-256 незавершённых загрузок в памяти процесса. Если состояния нет
+    (перезапуск, другой воркер), оно восстанавливается чтением уже принятой части файла.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, upload):
+        with self._lock:
+            item = self._items.pop(upload.pk, None)
+        if item is not None and item[0] == upload.offset:
+            return item[1]
+        return self._rehash(upload)
+
+    def put(self, upload, hasher):
+        with self._lock:
+            self._items[upload.pk] = (upload.offset, hasher)
+            self._items.move_to_end(upload.pk)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, upload):
+        with self._lock:
+            self._items.pop(upload.pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def _rehash(self, upload):
+        hasher = hashlib.sha256()
+        if upload.offset:
+            with open(part_path(upload), 'rb') as f:
+                remaining = upload.offset
+                while remaining:
+                    data = f.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    hasher.update(data)
+                    remaining -= len(data)
+        return hasher
+
+
+hashers = HasherCache()
+
+
+def _claim_range(upload, start):
+    """
+    Захватывает запись части с байта start. Захват — условный UPDATE строки
+    загрузки: он проходит, только если offset всё ещё равен start и никто
+    другой (в том числе другой воркер) не держит аренду. Аренда ограничена
+    LIBRARY_UPLOAD_PART_LEASE секундами, чтобы упавший воркер не запер загрузку.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.LIBRARY_UPLOAD_PART_LEASE)
+    claimed = Upload.objects.filter(
+        Q(writing_until__isnull=True) | Q(writing_until__lt=now),
+        pk=upload.pk, status='pending', offset=start,
+    ).update(writing_until=lease, updated_at=now)
+    if not claimed:
+        upload.refresh_from_db(fields=['offset', 'status'])
+        if upload.status != 'pending':
+            raise UploadError("Загрузка уже завершена.")
+        # offset сдвинулся или ту же часть сейчас пишет другой запрос
+        raise OffsetMismatch(upload.offset)
+    return lease
+
+
+def _release_range(upload, lease, **fields):
+    # Снимает только свою аренду: если она истекла и перехвачена, результат не сохраняется
+    return Upload.objects.filter(pk=upload.pk, writing_until=lease).update(
+        writing_until=None, updated_at=timezone.now(), **fields
+    )
+
+
+def fail(upload):
+    upload.status = 'failed'
+    upload.save(update_fields=['status', 'updated_at'])
+    hashers.discard(upload)
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def append_part(upload, stream, content_range):
+    """
+    Дописывает часть файла из потока запроса прямо на диск, обновляя SHA-256.
+    Первая часть проверяется по сигнатуре PDF/EPUB до записи остальных данных.
+    """
+    start, end, total = parse_content_range(content_range)
+    if upload.status != 'pending':
+        raise UploadError("Загрузка уже завершена.")
+    if total != upload.size or end >= upload.size:
+        raise UploadError("Диапазон выходит за объявленный размер файла.")
+    if end - start + 1 > settings.LIBRARY_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError("Часть файла слишком большая.")
+
+    lease = _claim_range(upload, start)
+    upload.offset = start
+    try:
+        hasher = hashers.get(upload)
+        remaining = end - start + 1
+        path = part_path(upload)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'r+b' if start else 'wb') as f:
+            f.seek(start)
+            if start == 0:
+                head = _read_exactly(stream, min(SNIFF_SIZE, remaining))
+                content_type = sniff_book_type(head)
+                if content_type is None:
+                    f.close()
+                    _release_range(upload, lease)
+                    fail(upload)
+                    raise UploadError("Содержимое файла не похоже на PDF или EPUB.")
+                upload.content_type = content_type
+                f.write(head)
+                hasher.update(head)
+                remaining -= len(head)
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                hasher.update(data)
+                remaining -= len(data)
+            f.truncate()
+            offset = f.tell()
+    except BaseException:
+        _release_range(upload, lease)
+        raise
+
+    if not _release_range(upload, lease, offset=offset, content_type=upload.content_type):
+        upload.refresh_from_db(fields=['offset', 'status'])
+        raise OffsetMismatch(upload.offset)
+    upload.offset = offset
+    hashers.put(upload, hasher)
+    return upload
+
+
+def _read_exactly(stream, size):
+    chunks = []
+    while size:
+        data = stream.read(size)
+        if not data:
+            break
+        chunks.append(data)
+        size -= len(data)
+    return b''.join(chunks)
+
+
+def complete(upload):
+    # Хэш уже посчитан по мере получения частей — файл не перечитывается
+    if upload.status != 'pending':
+        raise UploadError("Загрузка уже завершена.")
+    if upload.offset != upload.size:
+        raise UploadError(f"Получено {upload.offset} из {upload.size} байт.")
+
+    digest = hashers.get(upload).hexdigest()
+    name = f'books/{os.path.basename(upload.filename)}'
+    store_hashed = getattr(default_storage, 'store_hashed', None)
+    if store_hashed is not None:
+        # адресное хранилище: имя по уже известному хэшу, дубликат не сохраняется
+        name = store_hashed(part_path(upload), name, digest)
+    else:
+        name = default_storage.get_available_name(name)
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(part_path(upload), target)
+
+    upload.sha256 = digest
+    upload.stored_name = name
+    upload.status = 'complete'
+    upload.save(update_fields=['sha256', 'stored_name', 'status', 'updated_at'])
+    hashers.discard(upload)
+    return upload
@@ -1,11 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'authors', views.AuthorViewSet)
 router.register(r'books', views.BookViewSet)
+router.register(r'uploads', views.UploadViewSet)
+router.register(r'jobs', views.JobViewSet)
+router.register(r'changes', views.ChangeFeedViewSet, basename='changes')
+router.register(r'autocomplete', views.AutocompleteViewSet, basename='autocomplete')
 
 urlpatterns = [
     path('', include(router.urls)),
+    # асинхронное чтение каталога для запуска под ASGI (library/async_views.py)
+    path('async/books/', async_views.book_list, name='async-book-list'),
+    path('async/books/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('async/books/<int:pk>/download/', async_views.book_download, name='async-book-download'),
+    path('async/authors/', async_views.author_list, name='async-author-list'),
+    path('async/authors/<int:pk>/', async_views.author_detail, name='async-author-detail'),
 ]
\ No newline at end of file
@@ -1,30 +1,302 @@
-from rest_framework import viewsets, permissions
-from rest_framework.filters import SearchFilter
-from .models import Author, Book
-from .serializers import AuthorSerializer, BookSerializer
+import io
+import os
+import re
 
-class AuthorViewSet(viewsets.ModelViewSet):
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import content_disposition_header
+from django.db import IntegrityError, router
+from django.db.models import Count, Prefetch
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from . import changes, content, downloads, exporters, jobs, metrics, stats, thumbnails, uploads
+from .autocomplete import autocomplete
+from .importers import BookImporter, detect_format, read_rows
+from .cache import CachedResponseMixin
+from .facets import facet_counts
+from .filters import BookFilter, BookOrdering, parse_int
+from .models import Author, Book, BookPage, Job, Upload
+from .pagination import UncountedPageNumberPagination, get_keyset
+from .routers import ReadReplicaMixin
+from .rows import BookRows
+from .search import FullTextSearchFilter, NormalizedSearchFilter
+from .serializers import AuthorSerializer, BookSerializer, JobSerializer, UploadSerializer
+from .storage import hashed_digest
+
+ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
+
+class AuthorViewSet(ReadReplicaMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [permissions.IsAdminUser]
-    filter_backends = [SearchFilter]
+    filter_backends = [NormalizedSearchFilter]
     search_fields = ['name', 'biography']
+    replica_actions = ('list', 'retrieve', 'books')
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'books']:
             return [permissions.AllowAny()]
         return super().get_permissions()
 
+    # книги автора одним запросом: только id и title, не больше LIBRARY_AUTHOR_BOOKS_LIMIT на автора
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            embedded = Book.objects.only('id', 'title', 'author_id')[:settings.LIBRARY_AUTHOR_BOOKS_LIMIT]
+            queryset = queryset.annotate(books_count=Count('books')).prefetch_related(
+                Prefetch('books', queryset=embedded, to_attr='embedded_books')
+            )
+        return queryset
+
+    # полный список книг автора (ссылка books_url)
+    @action(detail=True, methods=['get'])
+    def books(self, request, pk=None):
+        author = self.get_object()
+        book_rows = BookRows(request, extra_columns=[name for name, _ in get_keyset(Book)])
+        page = self.paginate_queryset(book_rows.values(Book.objects.filter(author=author)))
+        with metrics.timed():
+            data = [book_rows.represent(row) for row in page]
+        return self.get_paginated_response(data)
+
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ReadReplicaMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Book.objects.select_related('author').all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAdminUser]
-    filter_backends = [SearchFilter]
+    filter_backends = [BookFilter, FullTextSearchFilter, BookOrdering]
     search_fields = ['title', 'genre', 'category', 'publisher', 'author__name']
+    cached_actions = ['list', 'retrieve', 'facets', 'content_search']
+    # популярность копится пачками StatsBuffer без номера изменения каталога (library/stats.py)
+    uncached_params = {'ordering': {'-popularity'}}
+    replica_actions = ('list', 'retrieve', 'content_search')
+    # параметры, сужающие набор книг для фасетов
+    facet_narrowing_params = [api_settings.SEARCH_PARAM, *BookFilter.params]
 
-    # доступно всем 'list', 'retrieve'
+    # чтение без BookSerializer: словари из values() (library/rows.py), ?fields= сужает ответ и SQL
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.list_rows, request)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.cached_response(self.retrieve_row, request, *args, **kwargs)
+        # просмотр считается и для ответа из кэша
+        if response.status_code in (200, 304):
+            stats.record(int(kwargs['pk']), 'views')
+        return response
+
+    def list_rows(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        book_rows = BookRows(request, extra_columns=[name for name, _ in get_keyset(Book)])
+        page = self.paginate_queryset(book_rows.values(queryset))
+        with metrics.timed():
+            data = [book_rows.represent(row) for row in page]
+        return self.get_paginated_response(data)
+
+    def retrieve_row(self, request, pk=None):
+        queryset = self.filter_queryset(self.get_queryset())
+        book_rows = BookRows(request)
+        row = get_object_or_404(book_rows.values(queryset), pk=pk)
+        with metrics.timed():
+            return Response(book_rows.represent(row))
+
+    # доступно всем 'list', 'retrieve', 'download', 'facets', 'content_search'
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'download', 'facets', 'content_search']:
             return [permissions.AllowAny()]
-        return super().get_permissions()
\ No newline at end of file
+        return super().get_permissions()
+
+    # счётчики книг по жанру, категории, типу, году и автору; с поиском — по найденным книгам
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return self.cached_response(self.get_facets, request)
+
+    def get_facets(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            raise ValidationError({'limit': ["Ожидается целое число."]})
+        limit = max(1, min(limit, 100))
+        if any(request.query_params.get(param) for param in self.facet_narrowing_params):
+            return Response(facet_counts(self.filter_queryset(self.get_queryset()), limit=limit))
+        return Response(facet_counts(limit=limit))
+
+    # поиск по тексту файлов книг: книги по релевантности, в каждой — страницы с фрагментами
+    @action(detail=False, methods=['get'], url_path='content-search')
+    def content_search(self, request):
+        return self.cached_response(self.get_content_hits, request)
+
+    def get_content_hits(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ["Обязательный параметр."]})
+        paginator = UncountedPageNumberPagination()
+        hits = content.ContentHits(query, using=router.db_for_read(BookPage))
+        page = paginator.paginate_queryset(hits, request, self)
+        return paginator.get_paginated_response(page)
+
+    # файл книги по частям, с поддержкой Range для дочитывания и перехода по страницам
+    @action(detail=True, methods=['get'],
+            content_negotiation_class=downloads.IgnoreClientContentNegotiation)
+    def download(self, request, pk=None):
+        book = self.get_object()
+        # в хранилище файл назван по хэшу — клиенту отдаётся имя по названию книги
+        filename = book.title + os.path.splitext(book.book_file.name or '')[1]
+        response = downloads.serve_file(request, book.book_file, filename=filename)
+        if stats.is_full_download(request, response):
+            stats.record(book.pk, 'downloads')
+        return response
+
+    # весь каталог одним потоком: ?as=ndjson (по умолчанию) или ?as=csv, в формате импорта;
+    # сжимается gzip, если клиент его принимает. Память не зависит от размера каталога
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated],
+            content_negotiation_class=downloads.IgnoreClientContentNegotiation)
+    def export(self, request):
+        fmt = request.query_params.get('as', 'ndjson')
+        if fmt not in exporters.RENDERERS:
+            raise ValidationError({'as': ["Поддерживаются форматы csv и ndjson."]})
+        compress = bool(ACCEPTS_GZIP_RE.search(request.headers.get('Accept-Encoding', '')))
+        response = StreamingHttpResponse(
+            exporters.export_catalog(fmt, compress=compress),
+            content_type=exporters.CONTENT_TYPES[fmt],
+        )
+        response['Content-Disposition'] = content_disposition_header(True, f'catalog.{fmt}')
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    # массовый импорт CSV/NDJSON, только для администратора
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_books(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ["Файл не передан."]})
+        fmt = request.data.get('format') or detect_format(upload.name)
+        if fmt not in ('csv', 'ndjson'):
+            raise ValidationError({'format': ["Поддерживаются форматы csv и ndjson."]})
+
+        report = BookImporter().run(read_rows(upload.file, fmt))
+        return Response(report, status=status.HTTP_200_OK)
+
+
+# загрузка файла книги по частям: POST — начать, PUT part — часть с Content-Range, POST complete — завершить
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = Upload.objects.all()
+    serializer_class = UploadSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    # тело не проходит через парсеры: request.stream читается кусками прямо в файл
+    @action(detail=True, methods=['put'])
+    def part(self, request, pk=None):
+        upload = self.get_object()
+        stream = request.stream or io.BytesIO()
+        try:
+            uploads.append_part(upload, stream, request.headers.get('Content-Range'))
+        except uploads.OffsetMismatch:
+            return Response(
+                {'detail': "Смещение части не совпадает с полученными данными.", 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        except uploads.UploadError as exc:
+            raise ValidationError({'detail': str(exc)})
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            uploads.complete(upload)
+        except uploads.UploadError as exc:
+            raise ValidationError({'detail': str(exc)})
+        return Response(self.get_serializer(upload).data)
+
+
+# состояние фоновых заданий, только для администратора; фильтры ?status= и ?name=
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = []
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for field in ['status', 'name']:
+            value = self.request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+    # повторный запуск задания, завершившегося ошибкой
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'failed':
+            raise ValidationError({'status': ["Повторить можно только задание с ошибкой."]})
+        try:
+            jobs.retry(job)
+        except IntegrityError:
+            raise ValidationError({'key': ["Задание с тем же ключом уже в очереди."]})
+        return Response(self.get_serializer(job).data)
+
+# лента изменений каталога для зеркал: ?since=<cursor>&limit=; следующий запрос — с cursor из ответа
+class ChangeFeedViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        params = request.query_params
+        since = parse_int('since', params.get('since', 0), minimum=0)
+        limit = parse_int('limit', params.get('limit', 100), minimum=1, maximum=1000)
+        return Response(changes.feed(since=since, limit=limit))
+
+
+# подсказки для строки поиска: ?q= — начало названия книги или имени автора (с начала любого слова)
+class AutocompleteViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.AllowAny]
+
+    def get_permissions(self):
+        if self.action == 'stats':
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+    def list(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.LIBRARY_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': ["Ожидается целое число."]})
+        limit = max(1, min(limit, 50))
+        results = autocomplete.lookup(request.query_params.get('q', ''), limit)
+        return Response({'results': [
+            {'type': kind, 'id': pk, 'label': label} for kind, pk, label in results
+        ]})
+
+    # размер индекса в памяти процесса и время последней перестройки
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(autocomplete.stats())
+
+
+# обложки и их миниатюры; имена по хэшу содержимого не меняются, поэтому кэшируются навсегда
+def cover_file(request, path):
+    if path.startswith('/') or '..' in path.split('/'):
+        raise Http404
+    name = 'covers/' + path
+    response = downloads.serve_name(request, default_storage, name)
+    if hashed_digest(name) or thumbnails.is_rendition(name):
+        patch_cache_control(response, public=True, max_age=settings.LIBRARY_IMMUTABLE_MAX_AGE, immutable=True)
+    return response
+
+
+# гистограммы запросов в текстовом формате Prometheus (library/metrics.py)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')